@@ -1,18 +1,15 @@
 # app.py
 import os, argparse
-from ragcore.ingest import ingest_dir
-from ragcore.embed import VectorIndex
-from ragcore.retrieve import HybridRetriever
 from ragcore.rerank import Reranker
-from ragcore.orchestrate import detect_intent, rewrite_query, compress_context
+from ragcore.orchestrate import detect_intent, rewrite_query, pack_context
 from ragcore.generate import call_llm
 from ragcore.verify import self_check
+from ragcore.snapshot import load_or_build
+from ragcore import metrics
 
-def bootstrap_index(data_dir="data/raw"):
-    chunks = ingest_dir(data_dir)
-    vec = VectorIndex("intfloat/e5-base")         # swap to text-embedding-3-large if you want
-    vec.build(chunks)
-    retriever = HybridRetriever(chunks, vec)
+def bootstrap_index(data_dir="data/raw", index_dir="data/index"):
+    # loads the persisted snapshot; re-embeds only if data_dir or the model changed
+    retriever = load_or_build(data_dir, index_dir, "intfloat/e5-base")  # swap to text-embedding-3-large if you want
     reranker = Reranker("BAAI/bge-reranker-base")
     return retriever, reranker
 
@@ -21,7 +18,7 @@ def answer(query: str, retriever, reranker, top_k=8):
     q2 = rewrite_query(query, intent)
     candidates = retriever.retrieve(q2, top_k=40)
     ranked = reranker.rerank(q2, candidates, top_k=top_k)
-    ctx = compress_context(ranked, max_chars=3500)
+    ctx = pack_context(ranked, max_tokens=int(os.getenv("RAG_CONTEXT_TOKENS", "2200")), query=query)
     ans = call_llm(query, ctx, model=os.getenv("RAG_LLM", "gpt-4o-mini"))
     issues = self_check(ans, query)
     return ans, issues
@@ -30,10 +27,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--query", required=True)
     parser.add_argument("--data_dir", default="data/raw")
+    parser.add_argument("--index_dir", default="data/index")
+    parser.add_argument("--trace", action="store_true", help="print per-stage timings")
     args = parser.parse_args()
 
-    retriever, reranker = bootstrap_index(args.data_dir)
+    retriever, reranker = bootstrap_index(args.data_dir, args.index_dir)
+    token = metrics.start_trace() if args.trace else None
     ans, issues = answer(args.query, retriever, reranker)
+    if token is not None:
+        print("\n=== TIMINGS ===")
+        for e in metrics.end_trace(token):
+            print(f"- {e['stage']}: {e['ms']:.1f} ms" if "stage" in e else f"- {e['count']}: {e['n']} candidates")
     print("\n=== ANSWER ===\n", ans)
     if issues:
         print("\n=== CHECKS ===")
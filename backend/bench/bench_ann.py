@@ -0,0 +1,94 @@
+# bench/bench_ann.py
+"""Recall@k vs latency for the VectorIndex FAISS backends, measured against
+the exact flat index. Uses vectors from a saved snapshot when available,
+otherwise clustered synthetic unit vectors.
+
+    cd backend && python bench/bench_ann.py --n 200000 --k 20
+    cd backend && python bench/bench_ann.py --snapshot data/index/index.faiss
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.embed import index_vectors, set_search_params, train_faiss_index  # noqa: E402
+
+SWEEPS = {
+    "hnsw": ("ef_search", [16, 32, 64, 128, 256]),
+    "ivf": ("nprobe", [1, 4, 8, 16, 32, 64]),
+    "ivfpq": ("nprobe", [1, 4, 8, 16, 32, 64]),
+    "ivfsq": ("nprobe", [1, 4, 8, 16, 32, 64]),
+}
+
+
+def synthetic(n: int, dim: int, rng, n_clusters: int = 256) -> np.ndarray:
+    centers = rng.standard_normal((n_clusters, dim)).astype("float32")
+    x = centers[rng.integers(0, n_clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def per_query_ms(index, queries: np.ndarray, k: int):
+    times, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        times.append((time.perf_counter() - t0) * 1000)
+        found.append(ids[0])
+    return np.array(found), np.percentile(times, 50), np.percentile(times, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshot", help="FAISS index file to take corpus vectors from")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--types", nargs="+", default=list(SWEEPS))
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    if args.snapshot:
+        _, xb = index_vectors(faiss.read_index(args.snapshot))
+    else:
+        xb = synthetic(args.n, args.dim, rng)
+    # queries: perturbed corpus vectors, like paraphrased questions
+    xq = xb[rng.choice(len(xb), args.queries)] + 0.05 * rng.standard_normal((args.queries, xb.shape[1])).astype("float32")
+    faiss.normalize_L2(xq)
+
+    flat = faiss.IndexFlatIP(xb.shape[1])
+    flat.add(xb)
+    truth, f50, f95 = per_query_ms(flat, xq, args.k)
+    print(f"{len(xb)} vectors, dim {xb.shape[1]}, recall@{args.k} against flat")
+    print(f"{'index':>8} {'param':>14} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'MB':>8} {'build s':>8}")
+    print(f"{'flat':>8} {'-':>14} {1.0:>7.3f} {f50:>7.2f} {f95:>7.2f} "
+          f"{len(faiss.serialize_index(flat)) / 2**20:>8.1f} {'-':>8}")
+
+    for index_type in args.types:
+        t0 = time.perf_counter()
+        sample = xb[rng.choice(len(xb), min(len(xb), 64 * args.nlist), replace=False)]
+        index = train_faiss_index(index_type, sample, **({"nlist": args.nlist} if index_type.startswith("ivf") else {}))
+        index.add(xb)
+        build_s = time.perf_counter() - t0
+        mb = len(faiss.serialize_index(index)) / 2**20
+        name, values = SWEEPS[index_type]
+        for v in values:
+            set_search_params(index, **{name: v})
+            found, p50, p95 = per_query_ms(index, xq, args.k)
+            print(f"{index_type:>8} {f'{name}={v}':>14} {recall_at_k(found, truth):>7.3f} "
+                  f"{p50:>7.2f} {p95:>7.2f} {mb:>8.1f} {build_s:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
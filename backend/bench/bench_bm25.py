@@ -0,0 +1,73 @@
+# bench/bench_bm25.py
+"""Lexical retrieval scaling: BM25Index (CSR postings + argpartition) vs
+rank_bm25.BM25Okapi full scans, on synthetic Zipf-distributed chunks.
+
+    cd backend && python bench/bench_bm25.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.retrieve import BM25Index  # noqa: E402
+
+
+def synthetic_corpus(n_docs: int, vocab_size: int, doc_len: int, rng):
+    vocab = np.array([f"t{i}" for i in range(vocab_size)])
+    # Zipf-ish term frequencies, like natural text
+    p = 1.0 / np.arange(1, vocab_size + 1)
+    p /= p.sum()
+    lens = rng.integers(doc_len // 2, doc_len * 3 // 2, size=n_docs)
+    flat = vocab[rng.choice(vocab_size, size=int(lens.sum()), p=p)].tolist()
+    out, pos = [], 0
+    for n in lens:
+        out.append(flat[pos:pos + n])
+        pos += n
+    return out, vocab, p
+
+
+def latency_ms(fn, queries):
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        times.append((time.perf_counter() - t0) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--doc_len", type=int, default=120)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=30)
+    parser.add_argument("--rank_bm25_max", type=int, default=100_000,
+                        help="skip the rank_bm25 baseline above this corpus size")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'chunks':>9} {'build_s':>8} {'csr p50':>8} {'csr p95':>8} {'scan p50':>9} {'scan p95':>9}  (ms)")
+    for n in args.sizes:
+        docs, vocab, p = synthetic_corpus(n, args.vocab, args.doc_len, rng)
+        queries = [vocab[rng.choice(args.vocab, size=rng.integers(3, 9), p=p)].tolist()
+                   for _ in range(args.queries)]
+        t0 = time.perf_counter()
+        idx = BM25Index(docs)
+        build_s = time.perf_counter() - t0
+        c50, c95 = latency_ms(lambda q: idx.top_k(q, args.k), queries)
+
+        s50 = s95 = float("nan")
+        if n <= args.rank_bm25_max:
+            from rank_bm25 import BM25Okapi
+            ref = BM25Okapi(docs)
+            s50, s95 = latency_ms(lambda q: np.argsort(ref.get_scores(q))[::-1][:args.k],
+                                  queries[: max(10, args.queries // 10)])
+        print(f"{n:>9} {build_s:>8.2f} {c50:>8.2f} {c95:>8.2f} {s50:>9.2f} {s95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench/bench_chunkstore.py
+"""Memory of the chunk representations at growing corpus sizes:
+
+    dicts      list of {"text", "meta"} dicts, as the old chunks.jsonl loaded
+    store      ChunkStore built in memory
+    mmap       ChunkStore.load(..., mmap=True) of a saved store
+
+Each case runs in a fresh process and reports the heap it retains after
+loading (tracemalloc; NumPy buffers included), the load peak, and the mean
+time to materialize a random chunk. Memory-mapped pages are file-backed and
+shared between workers, so they do not show up as heap.
+
+    cd backend && python bench/bench_chunkstore.py --sizes 10000 50000 200000
+"""
+import argparse
+import json
+import multiprocessing as mp
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+WORDS = ("customer service staff greet listen apologise refund complaint policy manager "
+         "escalate empathy tone calm resolve follow up feedback queue wait time").split()
+
+
+def synthetic(n: int, seed: int = 0):
+    from ragcore.dedup import minhash_hex
+    from ragcore.tokens import count_tokens
+
+    rng = random.Random(seed)
+    for i in range(n):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(250, 500)))
+        yield {"text": text, "meta": {"source_path": f"/data/raw/manual{i % 40}.pdf", "filename": f"manual{i % 40}.pdf",
+                                      "minhash": minhash_hex(text), "n_tokens": count_tokens(text)}}
+
+
+def measure(case: str, n: int, path: str) -> dict:
+    from ragcore.chunkstore import ChunkStore
+
+    tracemalloc.start()
+    if case == "dicts":
+        with open(path, encoding="utf-8") as f:
+            chunks = [json.loads(line) for line in f]
+        get = chunks.__getitem__
+    elif case == "store":
+        with open(path, encoding="utf-8") as f:
+            chunks = ChunkStore(json.loads(line) for line in f)
+        chunks.text(0)  # merge the pending text buffer
+        get = chunks.__getitem__
+    else:
+        chunks = ChunkStore.load(path, mmap=True)
+        get = chunks.__getitem__
+    held, peak = (b / 2**20 for b in tracemalloc.get_traced_memory())
+    tracemalloc.stop()
+    rng = random.Random(1)
+    rows = [rng.randrange(n) for _ in range(2000)]
+    t0 = time.perf_counter()
+    for r in rows:
+        get(r)["text"]
+    us = (time.perf_counter() - t0) / len(rows) * 1e6
+    return {"case": case, "n": n, "held_mb": held, "peak_mb": peak, "get_us": us}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    args = parser.parse_args()
+
+    from ragcore.chunkstore import ChunkStore
+
+    ctx = mp.get_context("spawn")
+    print(f"{'chunks':>8} {'case':>6} {'held MB':>8} {'peak MB':>8} {'get us':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            jsonl, store_dir = Path(tmp) / f"{n}.jsonl", Path(tmp) / f"{n}.store"
+            with open(jsonl, "w", encoding="utf-8") as f:
+                for c in synthetic(n):
+                    f.write(json.dumps(c) + "\n")
+            with open(jsonl, encoding="utf-8") as f:
+                ChunkStore(json.loads(line) for line in f).save(str(store_dir))
+            for case, path in (("dicts", jsonl), ("store", jsonl), ("mmap", store_dir)):
+                with ctx.Pool(1) as pool:
+                    res = pool.apply(measure, (case, n, str(path)))
+                print(f"{n:>8} {case:>6} {res['held_mb']:>8.1f} {res['peak_mb']:>8.1f} {res['get_us']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
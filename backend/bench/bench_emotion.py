@@ -0,0 +1,107 @@
+# bench/bench_emotion.py
+"""Frames per second of /process-image's emotion recognition at several
+client concurrency levels:
+
+    deepface  DeepFace.analyze on the full-resolution frame (the old path)
+    direct    EmotionAnalyzer without batching: downscaled, one frame per pass
+    batched   EmotionAnalyzer with micro-batching across clients
+
+Frames come from --frames (a directory of .jpg/.png webcam captures); without
+it, synthetic 640x480 frames are used, which contain no face and so exercise
+the whole-frame fallback rather than a real detection.
+
+    cd backend && python bench/bench_emotion.py --frames ~/captures --concurrency 1 4 8
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from report import summarize
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.emotion import EmotionAnalyzer  # noqa: E402
+
+
+def load_frames(directory: str | None, n: int) -> list[np.ndarray]:
+    if directory:
+        paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        frames = [f for f in (cv2.imread(str(p)) for p in paths[:n]) if f is not None]
+        if not frames:
+            raise SystemExit(f"no readable images in {directory}")
+        return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def run(analyze, frames: list[np.ndarray], concurrency: int, frames_per_client: int) -> dict:
+    latencies, lock = [], threading.Lock()
+
+    def client(cid: int):
+        for i in range(frames_per_client):
+            frame = frames[(cid * frames_per_client + i) % len(frames)]
+            t0 = time.perf_counter()
+            analyze(frame)
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", default=None, help="directory of webcam captures")
+    parser.add_argument("--n_frames", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--per_client", type=int, default=20, help="frames per client")
+    parser.add_argument("--detector", default="opencv")
+    parser.add_argument("--max_side", type=int, default=320)
+    parser.add_argument("--max_batch", type=int, default=16)
+    parser.add_argument("--max_wait_ms", type=float, default=10.0)
+    parser.add_argument("--modes", nargs="+", choices=("deepface", "direct", "batched"),
+                        default=["deepface", "direct", "batched"])
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.n_frames)
+    print(f"{len(frames)} frames, {frames[0].shape[1]}x{frames[0].shape[0]}")
+    modes = {}
+    if "deepface" in args.modes:
+        from deepface import DeepFace
+
+        def deepface(img):
+            return DeepFace.analyze(img, actions=["emotion"], detector_backend=args.detector,
+                                    enforce_detection=False)
+        t0 = time.perf_counter()
+        deepface(frames[0])
+        print(f"deepface first call (model load): {time.perf_counter() - t0:.2f}s")
+        modes["deepface"] = deepface
+    for name in ("direct", "batched"):
+        if name in args.modes:
+            an = EmotionAnalyzer(args.detector, max_side=args.max_side, batching=name == "batched",
+                                 max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+            t0 = time.perf_counter()
+            an.load()
+            print(f"{name} load + warmup: {time.perf_counter() - t0:.2f}s")
+            modes[name] = an
+
+    print(f"{'clients':>7} {'mode':>9} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for c in args.concurrency:
+        for name, m in modes.items():
+            res = run(m.analyze if isinstance(m, EmotionAnalyzer) else m, frames, c, args.per_client)
+            print(f"{c:>7} {name:>9} {res['throughput']:>8.1f} {res['p50_ms']:>8.1f} {res['p95_ms']:>8.1f}")
+    if "batched" in modes:
+        print("batcher:", modes["batched"].stats())
+
+
+if __name__ == "__main__":
+    main()
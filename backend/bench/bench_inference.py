@@ -0,0 +1,120 @@
+# bench/bench_inference.py
+"""Parity, latency and memory of the inference backends (ragcore.inference)
+for the embedding and rerank models.
+
+Each backend loads in a fresh process so RSS numbers are not polluted by the
+others. Outputs are compared with torch: embeddings by the minimum cosine
+similarity, rerank scores by the maximum absolute difference plus the share
+of queries whose top-3 is the same. Exits non-zero when a backend is
+outside --min_cosine / --max_score_diff, so it can gate a backend switch.
+
+    cd backend && python bench/bench_inference.py --backends torch onnx onnx-int8 --threads 4
+"""
+import argparse
+import multiprocessing as mp
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+WORDS = ("customer service staff greet listen apologise refund complaint policy manager "
+         "escalate empathy tone calm resolve follow up feedback queue wait time").split()
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def workload(n_passages: int, n_queries: int, seed: int = 0):
+    rng = random.Random(seed)
+    passages = [" ".join(rng.choices(WORDS, k=rng.randint(40, 300))) for _ in range(n_passages)]
+    queries = [" ".join(rng.choices(WORDS, k=8)) for _ in range(n_queries)]
+    return passages, queries
+
+
+def run_backend(backend: str, args) -> dict:
+    from ragcore.embed import VectorIndex
+    from ragcore.rerank import Reranker
+
+    passages, queries = workload(args.passages, args.queries)
+    base = rss_mb()
+    vec = VectorIndex(args.embed_model, backend=backend, threads=args.threads)
+    rr = Reranker(args.rerank_model, backend=backend, threads=args.threads)
+    loaded = rss_mb()
+
+    chunks = [{"text": p} for p in passages]
+    vec.encode_passages(chunks[:8])  # warm up
+    t0 = time.perf_counter()
+    emb = vec.encode_passages(chunks)
+    embed_s = time.perf_counter() - t0
+
+    query_ms = []
+    for q in queries:
+        vec.query_cache.clear()
+        t0 = time.perf_counter()
+        vec.embed_query(q)
+        query_ms.append((time.perf_counter() - t0) * 1000)
+
+    pairs = [(q, p) for q in queries for p in passages[:args.candidates]]
+    rr._predict(pairs[:8])  # warm up
+    rerank_ms, scores = [], []
+    for i in range(0, len(pairs), args.candidates):
+        t0 = time.perf_counter()
+        scores.extend(rr._predict(pairs[i:i + args.candidates]))
+        rerank_ms.append((time.perf_counter() - t0) * 1000)
+
+    return {"backend": backend, "load_mb": loaded - base, "peak_mb": rss_mb(),
+            "embed_pps": len(passages) / embed_s, "query_p50": float(np.percentile(query_ms, 50)),
+            "rerank_p50": float(np.percentile(rerank_ms, 50)), "rerank_p95": float(np.percentile(rerank_ms, 95)),
+            "emb": emb, "scores": np.asarray(scores).reshape(len(queries), args.candidates)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--embed_model", default="intfloat/e5-base")
+    parser.add_argument("--rerank_model", default="BAAI/bge-reranker-base")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--passages", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=10, help="passages reranked per query")
+    parser.add_argument("--min_cosine", type=float, default=0.99)
+    parser.add_argument("--max_score_diff", type=float, default=0.05)
+    args = parser.parse_args()
+    if "torch" not in args.backends:
+        args.backends.insert(0, "torch")  # the parity reference
+
+    ctx = mp.get_context("spawn")
+    results = {}
+    for backend in args.backends:
+        with ctx.Pool(1) as pool:
+            results[backend] = pool.apply(run_backend, (backend, args))
+
+    ref = results["torch"]
+    ok = True
+    print(f"{'backend':>10} {'load MB':>8} {'peak MB':>8} {'emb/s':>7} {'q p50':>7} {'rr p50':>7} {'rr p95':>7} "
+          f"{'min cos':>8} {'max |d|':>8} {'top3 eq':>8}")
+    for backend, res in results.items():
+        cos = float(np.min(np.sum(res["emb"] * ref["emb"], axis=1)))
+        diff = float(np.max(np.abs(res["scores"] - ref["scores"])))
+        top3 = float(np.mean([set(np.argsort(-a)[:3]) == set(np.argsort(-b)[:3])
+                              for a, b in zip(res["scores"], ref["scores"])]))
+        passed = cos >= args.min_cosine and diff <= args.max_score_diff
+        ok &= passed
+        print(f"{backend:>10} {res['load_mb']:>8.0f} {res['peak_mb']:>8.0f} {res['embed_pps']:>7.1f} "
+              f"{res['query_p50']:>7.1f} {res['rerank_p50']:>7.1f} {res['rerank_p95']:>7.1f} "
+              f"{cos:>8.4f} {diff:>8.4f} {top3:>8.2f}{'' if passed else '  PARITY FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
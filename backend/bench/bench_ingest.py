@@ -0,0 +1,38 @@
+# bench/bench_ingest.py
+"""Serial vs process-pool ingest_dir on the bundled PDFs.
+
+    cd backend && python bench/bench_ingest.py --workers 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.ingest import ingest_dir  # noqa: E402
+
+
+def timed_ingest(raw_dir: str, workers: int):
+    t0 = time.perf_counter()
+    docs = ingest_dir(raw_dir, workers=workers)
+    return docs, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_dir", default=str(Path(__file__).resolve().parents[1] / "data" / "raw"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    base_docs, base_dt = min((timed_ingest(args.data_dir, 1) for _ in range(args.repeat)), key=lambda x: x[1])
+    print(f"{'workers':>8} {'seconds':>9} {'chunks':>7} {'speedup':>8}  same_output")
+    print(f"{1:>8} {base_dt:>9.2f} {len(base_docs):>7} {1.0:>8.2f}  -")
+    for w in args.workers:
+        docs, dt = min((timed_ingest(args.data_dir, w) for _ in range(args.repeat)), key=lambda x: x[1])
+        print(f"{w:>8} {dt:>9.2f} {len(docs):>7} {base_dt / dt:>8.2f}  {docs == base_docs}")
+
+
+if __name__ == "__main__":
+    main()
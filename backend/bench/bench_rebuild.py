@@ -0,0 +1,70 @@
+# bench/bench_rebuild.py
+"""Peak memory of a full rebuild: load_or_build over generated .txt files
+with no snapshot, i.e. parse -> chunk -> embed -> FAISS + BM25 -> save.
+
+Each corpus size runs in a fresh process and reports the chunk text size,
+the traced heap peak across the whole load_or_build call (tracemalloc;
+Python objects and NumPy buffers, not FAISS or model weights) and the
+process's peak RSS. The streaming pipeline should keep the traced peak a
+small multiple of the chunk text, not of the corpus's token lists.
+
+    cd backend && python bench/bench_rebuild.py --sizes 10000 50000
+"""
+import argparse
+import multiprocessing as mp
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from report import peak_rss_mb
+
+
+def write_corpus(raw: Path, size: int, per_doc: int = 20, seed: int = 0):
+    # a large random vocabulary, so near-duplicate removal keeps every chunk
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(50_000)]
+    for d in range(0, size, per_doc):
+        paras = (" ".join(rng.choices(vocab, k=rng.randint(80, 220))) + "." for _ in range(min(per_doc, size - d)))
+        (raw / f"doc{d // per_doc}.txt").write_text("\n\n".join(paras), encoding="utf-8")
+
+
+def rebuild(raw_dir: str, index_dir: str, embed_model: str) -> dict:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from ragcore.snapshot import load_or_build
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    retriever = load_or_build(raw_dir, index_dir, embed_model=embed_model)
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    chunks = retriever.chunks
+    return {"chunks": len(chunks), "text_mb": int(chunks.offsets[-1]) / 2**20, "peak_mb": peak / 2**20,
+            "rss_mb": peak_rss_mb(), "seconds": dt}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--embed_model", default="intfloat/e5-base")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    print(f"{'chunks':>8} {'text MB':>8} {'peak MB':>8} {'x text':>7} {'RSS MB':>8} {'seconds':>8}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw, index = Path(tmp) / "raw", Path(tmp) / "index"
+            raw.mkdir()
+            write_corpus(raw, size)
+            with ctx.Pool(1) as pool:
+                res = pool.apply(rebuild, (str(raw), str(index), args.embed_model))
+        print(f"{res['chunks']:>8} {res['text_mb']:>8.1f} {res['peak_mb']:>8.1f} "
+              f"{res['peak_mb'] / (res['text_mb'] or 1):>7.1f} {res['rss_mb']:>8.1f} {res['seconds']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench/bench_rerank_batching.py
+"""Throughput vs latency of Reranker with and without dynamic micro-batching,
+at several client concurrency levels.
+
+    cd backend && python bench/bench_rerank_batching.py --concurrency 1 4 16 32
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.rerank import Reranker  # noqa: E402
+
+WORDS = ("customer service staff greet listen apologise refund complaint policy manager "
+         "escalate empathy tone calm resolve follow up feedback queue wait time").split()
+
+
+def fake_candidates(rng: random.Random, n: int) -> list[dict]:
+    return [{"chunk": {"text": " ".join(rng.choices(WORDS, k=rng.randint(40, 300))), "meta": {}}}
+            for _ in range(n)]
+
+
+def run(reranker: Reranker, concurrency: int, requests_per_client: int, n_cands: int):
+    latencies, lock = [], threading.Lock()
+
+    def client(seed: int):
+        rng = random.Random(seed)
+        for r in range(requests_per_client):
+            # unique query per request so the score cache never short-circuits the model
+            query = f"q{seed}-{r} " + " ".join(rng.choices(WORDS, k=8))
+            cands = fake_candidates(rng, n_cands)
+            t0 = time.perf_counter()
+            reranker.rerank(query, cands, top_k=3)
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    return len(latencies) / wall, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="BAAI/bge-reranker-base")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--max_batch", type=int, default=64)
+    parser.add_argument("--max_wait_ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    plain = Reranker(args.model)
+    batched = Reranker(args.model, batching=True, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+    batched.model = plain.model  # same weights, one copy in memory
+    plain.rerank("warm up", fake_candidates(random.Random(0), 4))
+
+    print(f"{'clients':>7} {'mode':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for c in args.concurrency:
+        for name, rr in (("direct", plain), ("batched", batched)):
+            rr.score_cache.clear()
+            rps, p50, p95 = run(rr, c, args.requests, args.candidates)
+            print(f"{c:>7} {name:>8} {rps:>8.1f} {p50:>8.1f} {p95:>8.1f}")
+    print("batcher:", batched.batcher.stats())
+
+
+if __name__ == "__main__":
+    main()
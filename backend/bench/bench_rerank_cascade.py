@@ -0,0 +1,114 @@
+# bench/bench_rerank_cascade.py
+"""Quality vs speed of the reranker fast path and cascades on a held-out
+query set.
+
+Queries come from --queries (JSONL with "query" and "text", the passage that
+should rank first) or are sampled from the indexed corpus: a sentence from a
+random chunk becomes the query and that chunk the gold passage. For every
+configuration we report mean rerank latency, gold recall@k and MRR@k, and
+overlap@k with the full bge ranking (1.0 = identical top-k).
+
+    cd backend && python bench/bench_rerank_cascade.py --keep 5 10 --small_model cross-encoder/ms-marco-MiniLM-L-6-v2
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.chunkstore import ChunkStore  # noqa: E402
+from ragcore.rerank import Reranker  # noqa: E402
+from ragcore.snapshot import load_or_build  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def held_out_queries(chunks: ChunkStore, n: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    out = []
+    for row in rng.sample(range(len(chunks)), min(len(chunks), n * 3)):
+        c = chunks[row]
+        sents = [s for s in re.split(r"(?<=[.!?])\s+", c["text"]) if 6 <= len(s.split()) <= 30]
+        if sents:
+            out.append({"query": rng.choice(sents), "text": c["text"]})
+        if len(out) == n:
+            break
+    return out
+
+
+def evaluate(reranker: Reranker, items: list[dict], reference: list[list[str]] | None, top_k: int):
+    reranker.score_cache.clear()
+    latencies, recall, rr, overlap, ranked_texts = [], [], [], [], []
+    for i, it in enumerate(items):
+        cands = [dict(c) for c in it["candidates"]]
+        t0 = time.perf_counter()
+        ranked = reranker.rerank(it["query"], cands, top_k=top_k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        texts = [c["chunk"]["text"] for c in ranked]
+        ranked_texts.append(texts)
+        rank = texts.index(it["text"]) + 1 if it["text"] in texts else None
+        recall.append(rank is not None)
+        rr.append(1 / rank if rank else 0.0)
+        if reference is not None:
+            overlap.append(len(set(texts) & set(reference[i])) / max(1, len(reference[i])))
+    return {"ms": float(np.mean(latencies)), "p95_ms": float(np.percentile(latencies, 95)),
+            "recall": float(np.mean(recall)), "mrr": float(np.mean(rr)),
+            "overlap": float(np.mean(overlap)) if overlap else 1.0}, ranked_texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_dir", default=str(ROOT / "data" / "raw"))
+    parser.add_argument("--index_dir", default=str(ROOT / "data" / "index"))
+    parser.add_argument("--queries", help="JSONL with query/text; default samples the corpus")
+    parser.add_argument("--n", type=int, default=100, help="sampled queries")
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--top_k", type=int, default=3)
+    parser.add_argument("--keep", type=int, nargs="+", default=[5, 10], help="cascade survivor counts")
+    parser.add_argument("--model", default="BAAI/bge-reranker-base")
+    parser.add_argument("--small_model", help="optional first-stage CrossEncoder")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    retriever = load_or_build(args.data_dir, args.index_dir, "intfloat/e5-base")
+    if retriever is None:
+        sys.exit(f"no documents under {args.data_dir}")
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            items = [json.loads(line) for line in f if line.strip()]
+    else:
+        items = held_out_queries(retriever.chunks, args.n, args.seed)
+    for it in items:
+        it["candidates"] = retriever.retrieve(it["query"], top_k=args.candidates)
+    print(f"{len(items)} queries, {args.candidates} candidates each, top_k={args.top_k}")
+
+    full = Reranker(args.model, fast=False)
+    configs = [("full", full), ("fast", Reranker(args.model))]
+    small = Reranker(args.small_model, fast=False).model if args.small_model else None
+    for keep in args.keep:
+        configs.append((f"fused>{keep}", Reranker(args.model, cascade_keep=keep)))
+        if small is not None:
+            rr = Reranker(args.model, cascade_keep=keep)
+            rr.cascade = small
+            configs.append((f"small>{keep}", rr))
+    for _, rr in configs[1:]:
+        rr.model = full.model  # one copy of the bge weights
+        rr.prepare(retriever.chunks)
+    full.rerank("warm up", [dict(c) for c in items[0]["candidates"]])
+
+    reference = None
+    print(f"{'config':>12} {'ms/query':>9} {'p95 ms':>8} {'recall':>7} {'mrr':>6} {'overlap':>8}")
+    for name, rr in configs:
+        res, ranked = evaluate(rr, items, reference, args.top_k)
+        reference = reference or ranked
+        print(f"{name:>12} {res['ms']:>9.1f} {res['p95_ms']:>8.1f} {res['recall']:>7.3f} "
+              f"{res['mrr']:>6.3f} {res['overlap']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
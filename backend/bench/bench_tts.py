@@ -0,0 +1,80 @@
+# bench/bench_tts.py
+"""TTSCache against the stub synthesizer (simulated service round trip):
+
+    cold      every client asks for its own new phrase (synthesis per request)
+    burst     all clients ask for the same new phrase at once (one synthesis)
+    memory    repeat phrases, served from the in-memory LRU
+    disk      a fresh cache over the same directory (e.g. another worker)
+
+    cd backend && python bench/bench_tts.py --concurrency 1 8 32 --delay_ms 300
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from report import summarize
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.tts import StubSynthesizer, TTSCache  # noqa: E402
+
+PHRASES = ["Welcome! Listening has started. Please speak now.",
+           "Take a breath and acknowledge how the customer feels.",
+           "Offer a clear next step and a time frame.",
+           "Thank the customer for their patience."]
+
+
+def run(cache: TTSCache, texts_for, concurrency: int, per_client: int) -> dict:
+    latencies, lock = [], threading.Lock()
+
+    def client(cid: int):
+        for i in range(per_client):
+            t0 = time.perf_counter()
+            cache.get(texts_for(cid, i))
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--per_client", type=int, default=10)
+    parser.add_argument("--delay_ms", type=float, default=300, help="simulated synthesis round trip")
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} {'case':>7} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'synth calls':>11}")
+    for c in args.concurrency:
+        with tempfile.TemporaryDirectory() as tmp:
+            synth = StubSynthesizer(delay_ms=args.delay_ms)
+            cache = TTSCache(synth, cache_dir=tmp)
+            cases = [
+                ("cold", cache, lambda cid, i: f"{PHRASES[1]} (client {cid}, line {i})"),
+                ("burst", cache, lambda cid, i: f"{PHRASES[2]} (round {i})"),
+                ("memory", cache, lambda cid, i: PHRASES[0]),
+            ]
+            cache.get(PHRASES[0])
+            for name, cch, texts_for in cases:
+                before = synth.calls
+                res = run(cch, texts_for, c, args.per_client)
+                print(f"{c:>7} {name:>7} {res['throughput']:>10.1f} {res['p50_ms']:>8.2f} {res['p95_ms']:>8.2f} "
+                      f"{synth.calls - before:>11}")
+            # a second process would find the same clips on disk
+            fresh = TTSCache(synth, cache_dir=tmp)
+            before = synth.calls
+            res = run(fresh, lambda cid, i: f"{PHRASES[1]} (client {cid}, line {i})", c, args.per_client)
+            print(f"{c:>7} {'disk':>7} {res['throughput']:>10.1f} {res['p50_ms']:>8.2f} {res['p95_ms']:>8.2f} "
+                  f"{synth.calls - before:>11}")
+
+
+if __name__ == "__main__":
+    main()
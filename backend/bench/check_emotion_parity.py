@@ -0,0 +1,58 @@
+# bench/check_emotion_parity.py
+"""Self-check that EmotionAnalyzer scores faces like DeepFace.analyze(img,
+actions=['emotion']) on real captures: same dominant emotion per face and
+emotion percentages within --tol points. The analyzer runs unbatched at full
+resolution (max_side=0), so only the model input preprocessing can differ.
+Exits 1 on any mismatch.
+
+    cd backend && python bench/check_emotion_parity.py --frames ~/captures
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from bench_emotion import load_frames
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.emotion import LABELS, EmotionAnalyzer  # noqa: E402
+
+
+def nearest(region: dict, faces: list[dict]) -> dict:
+    return min(faces, key=lambda f: abs(f["region"]["x"] - region["x"]) + abs(f["region"]["y"] - region["y"]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", required=True, help="directory of webcam captures with faces")
+    parser.add_argument("--n_frames", type=int, default=32)
+    parser.add_argument("--detector", default="opencv")
+    parser.add_argument("--tol", type=float, default=2.0, help="max |diff| in percentage points")
+    args = parser.parse_args()
+
+    from deepface import DeepFace
+
+    analyzer = EmotionAnalyzer(args.detector, max_side=0, batching=False)
+    analyzer.load()
+    failed = worst = 0
+    for i, img in enumerate(load_frames(args.frames, args.n_frames)):
+        expected = DeepFace.analyze(img, actions=["emotion"], detector_backend=args.detector,
+                                    enforce_detection=False)
+        got = analyzer.analyze(img)
+        if len(got) != len(expected):
+            failed += 1
+            print(f"frame {i}: {len(expected)} faces from DeepFace, {len(got)} from the analyzer  MISMATCH")
+            continue
+        for face in expected:
+            mine = nearest(face["region"], got)
+            diff = max(abs(face["emotion"][k] - mine["emotion"][k]) for k in LABELS)
+            worst = max(worst, diff)
+            bad = diff > args.tol or face["dominant_emotion"] != mine["dominant_emotion"]
+            failed += bad
+            print(f"frame {i}: deepface {face['dominant_emotion']:>8}  analyzer {mine['dominant_emotion']:>8}  "
+                  f"max |diff| {diff:5.2f}  {'MISMATCH' if bad else ''}")
+    print(f"max |diff| {worst:.2f} points")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
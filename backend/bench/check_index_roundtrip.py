@@ -0,0 +1,95 @@
+# bench/check_index_roundtrip.py
+"""Self-check of the snapshot lifecycle for every FAISS index type: build,
+save, reload (mmapped where FAISS allows it), then update in place (remove
+one source, add new chunks) and save/reload again. Removed chunks must never
+come back from search, and removing a third of the corpus must leave no HNSW
+tombstones behind (compaction). Exits 1 on any failure.
+
+    cd backend && python bench/check_index_roundtrip.py
+    cd backend && python bench/check_index_roundtrip.py --types ivf ivfpq --chunks 5000
+"""
+import argparse
+import sys
+import tempfile
+import traceback
+from pathlib import Path
+
+from microbench import synthetic_chunks
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.embed import INDEX_TYPES, VectorIndex  # noqa: E402
+from ragcore.retrieve import HybridRetriever  # noqa: E402
+from ragcore.snapshot import SNAPSHOT_VERSION, load_snapshot, save_snapshot  # noqa: E402
+
+
+def reload(index_dir: str, vec: VectorIndex, manifest: dict) -> HybridRetriever:
+    snap = load_snapshot(index_dir, manifest)
+    if snap is None:
+        raise RuntimeError("snapshot did not load")
+    stored, chunks, index, mmapped, bm25 = snap
+    vec.attach(index, chunks, mmapped=mmapped)
+    retriever = HybridRetriever(chunks, vec, bm25=bm25)
+    retriever.manifest = stored
+    return retriever
+
+
+def check(index_type: str, n_chunks: int, model: str, nlist: int) -> str:
+    params = {"nlist": nlist} if index_type.startswith("ivf") else {}
+    vec = VectorIndex(model, index_type=index_type, **params)
+    chunks = synthetic_chunks(n_chunks)
+    vec.build(chunks)
+    retriever = HybridRetriever(vec.store, vec)
+    manifest = {"version": SNAPSHOT_VERSION, "embed_model": vec.model_id, "index": vec.spec, "files": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        save_snapshot(tmp, manifest, retriever)
+        retriever = reload(tmp, vec, manifest)
+        mmapped = vec._mmapped
+        before = len(retriever.chunks)
+        # drop the first source document and add fresh chunks, as update_files does
+        gone = retriever.chunks[0]["meta"]["filename"]
+        gone_text = retriever.chunks[0]["text"]
+        n_gone = len(retriever.chunks.rows_with_filename({gone}))
+        extra = [dict(c, meta={**c["meta"], "filename": "new.txt"}) for c in synthetic_chunks(50, seed=7)]
+        retriever.replace_sources({gone}, extra)
+        expected = before - n_gone + len(extra)
+        if len(retriever.chunks) != expected or vec.index.ntotal - vec.tombstones != expected:
+            raise RuntimeError(f"{len(retriever.chunks)} chunks / {vec.index.ntotal} vectors, expected {expected}")
+        if not retriever.retrieve(extra[0]["text"][:80], top_k=5):
+            raise RuntimeError("no hits after update")
+        if any(h["chunk"]["meta"]["filename"] == gone for h in vec.search(gone_text, top_k=20)):
+            raise RuntimeError(f"removed {gone} still returned by search")
+        save_snapshot(tmp, manifest, retriever)
+        retriever = reload(tmp, vec, manifest)
+        if len(retriever.chunks) != expected:
+            raise RuntimeError(f"{len(retriever.chunks)} chunks after second reload, expected {expected}")
+        # past COMPACT_RATIO, HNSW is rebuilt without its tombstones
+        names = sorted({c["meta"]["filename"] for c in retriever.chunks})
+        retriever.replace_sources(set(names[:len(names) // 3]), [])
+        if vec.tombstones:
+            raise RuntimeError(f"{vec.tombstones} tombstones left after removing a third of the corpus")
+        if not retriever.retrieve(extra[1]["text"][:80], top_k=5):
+            raise RuntimeError("no hits after compaction")
+    return f"ok ({'mmapped' if mmapped else 'read'}, {before} -> {expected} -> {len(retriever.chunks)} chunks)"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--types", choices=INDEX_TYPES, nargs="+", default=list(INDEX_TYPES))
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--nlist", type=int, default=32)
+    parser.add_argument("--embed_model", default="intfloat/e5-base")
+    args = parser.parse_args()
+
+    failed = 0
+    for index_type in args.types:
+        try:
+            result = check(index_type, args.chunks, args.embed_model, args.nlist)
+        except Exception:
+            failed += 1
+            result = "FAILED\n" + traceback.format_exc()
+        print(f"{index_type:>6}: {result}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# bench/check_rerank_parity.py
+"""Self-check that the Reranker fast path (cached passage tokens, pairs built
+by hand) scores like CrossEncoder.predict, including queries longer than 64
+tokens and passages past the model's max length, where the pair has to be
+truncated. Exits 1 when a score differs by more than --tol.
+
+    cd backend && python bench/check_rerank_parity.py
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.rerank import Reranker  # noqa: E402
+
+WORDS = ("customer service staff greet listen apologise refund complaint policy manager "
+         "escalate empathy tone calm resolve follow up feedback queue wait time").split()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="BAAI/bge-reranker-base")
+    parser.add_argument("--tol", type=float, default=1e-4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # short, 64+ token (advice-style prompts) and longer-than-passage queries
+    queries = [" ".join(rng.choices(WORDS, k=n)) for n in (6, 90, 400)]
+    passages = [" ".join(rng.choices(WORDS, k=n)) for n in (30, 200, 700)]
+    pairs = [(q, p) for q in queries for p in passages]
+
+    full = Reranker(args.model, fast=False)
+    fast = Reranker(args.model)
+    if not fast.fast:
+        sys.exit("fast path unavailable for this model/backend")
+    fast.model = full.model
+    expected = np.asarray(full.model.predict(pairs), dtype=np.float64).reshape(-1)
+    got = np.asarray(fast._predict(pairs), dtype=np.float64)
+    diff = np.abs(expected - got)
+    for (q, p), e, g, d in zip(pairs, expected, got, diff):
+        flag = "MISMATCH" if d > args.tol else ""
+        print(f"q {len(q.split()):>3}w  p {len(p.split()):>3}w  predict {e:+.5f}  fast {g:+.5f}  {flag}")
+    print(f"max |diff| {diff.max():.2e}")
+    sys.exit(1 if diff.max() > args.tol else 0)
+
+
+if __name__ == "__main__":
+    main()
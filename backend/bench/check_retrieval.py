@@ -0,0 +1,51 @@
+# bench/check_retrieval.py
+"""Self-check of hybrid fusion on rare terms: a chunk that is the only one
+containing a query term (a single BM25 match) must make the fused top-k under
+every fusion method, however the dense side ranks it. Exits 1 otherwise.
+
+    cd backend && python bench/check_retrieval.py
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from microbench import synthetic_chunks
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ragcore.embed import VectorIndex  # noqa: E402
+from ragcore.fusion import METHODS  # noqa: E402
+from ragcore.retrieve import HybridRetriever  # noqa: E402
+
+RARE = {
+    "refunds": "Refunds are processed within five working days of the request.",
+    "voucher": "A goodwill voucher may be offered once the manager approves it.",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--top_k", type=int, default=3)
+    parser.add_argument("--embed_model", default="intfloat/e5-base")
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks)
+    chunks += [{"text": text, "meta": {"filename": f"{term}.txt", "source_path": f"/synthetic/{term}.txt"}}
+               for term, text in RARE.items()]
+    vec = VectorIndex(args.embed_model)
+    vec.build(chunks)
+    retriever = HybridRetriever(vec.store, vec)
+
+    failed = 0
+    for method in METHODS:
+        retriever.fusion = method
+        for term, text in RARE.items():
+            hits = retriever.retrieve(term, top_k=args.top_k)
+            found = any(h["chunk"]["text"] == text for h in hits)
+            failed += not found
+            print(f"{method:>8} {term!r:>10}: {'ok' if found else 'MISSING from top-' + str(args.top_k)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# bench/loadtest.py
+"""End-to-end load test of the rag_api endpoints against the mock LLM.
+
+Closed-loop clients (each sends its next request when the previous one
+finishes) run at every concurrency level. The report gives throughput,
+p50/p95/p99 latency (and time to first token for streamed answers), errors,
+the server's peak RSS and its mean per-stage time from /metrics.
+
+    # spawn mock LLM + API (dev server, or gunicorn workers) and test them
+    cd backend && python bench/loadtest.py --spawn --concurrency 1 4 16
+    cd backend && python bench/loadtest.py --spawn --server gunicorn --workers 4 --endpoint ask-stream
+    # or point it at a running server started with OPENAI_BASE_URL=<mock>
+    cd backend && python bench/loadtest.py --url http://127.0.0.1:5000
+
+    # keep a baseline, later fail (exit 1) on >10% regressions against it
+    python bench/loadtest.py --spawn --save-baseline bench/baselines/loadtest.json
+    python bench/loadtest.py --spawn --baseline bench/baselines/loadtest.json
+
+--unique appends a request number to every query so the retrieval, rerank
+and answer caches never short-circuit the pipeline.
+"""
+import argparse
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from report import compare, save_baseline, summarize, tree_peak_rss_mb
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+QUESTIONS = [
+    "How should staff greet a customer who walks in upset?",
+    "What is the refund policy for damaged items?",
+    "How do I calm down an angry caller?",
+    "When should a complaint be escalated to a manager?",
+    "What is experiential learning?",
+    "How do I apologise without admitting fault?",
+    "What should I say when the queue wait time is long?",
+    "How do I follow up after resolving a complaint?",
+    "How can I show empathy over the phone?",
+    "What tone should I use with a frustrated customer?",
+    "How do I handle a customer asking for a discount?",
+    "What feedback should I collect after a service call?",
+]
+EMOTIONS = ["angry", "sad", "neutral", "happy", "fear", "surprise"]
+ENDPOINTS = ("ask", "ask-stream", "advice", "ask-batch")
+
+
+def payload(endpoint: str, rng: random.Random, n: int, unique: bool, batch: int):
+    def q():
+        text = rng.choice(QUESTIONS)
+        return f"{text} (request {n}-{rng.randrange(10**6)})" if unique else text
+    if endpoint == "ask":
+        return "/api/ask", {"query": q()}
+    if endpoint == "ask-stream":
+        return "/api/ask", {"query": q(), "stream": True}
+    if endpoint == "advice":
+        return "/api/advice", {"transcript": q(), "emotion": rng.choice(EMOTIONS)}
+    return "/api/ask-batch", {"queries": [q() for _ in range(batch)]}
+
+
+def one_request(session: requests.Session, url: str, endpoint: str, body: dict, timeout: float):
+    """(latency ms, time to first token ms or None, ok)."""
+    t0 = time.perf_counter()
+    if endpoint != "ask-stream":
+        r = session.post(url, json=body, timeout=timeout)
+        return (time.perf_counter() - t0) * 1000, None, r.ok and "error" not in r.json()
+    ttft, ok = None, False
+    with session.post(url, json=body, timeout=timeout, stream=True) as r:
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event: token") and ttft is None:
+                ttft = (time.perf_counter() - t0) * 1000
+            elif line.startswith("event: done"):
+                ok = r.ok
+            elif line.startswith("event: error"):
+                break
+    return (time.perf_counter() - t0) * 1000, ttft, ok
+
+
+def run_level(base: str, endpoint: str, concurrency: int, n_requests: int, warmup: int, unique: bool,
+              batch: int, timeout: float, seed: int) -> dict:
+    latencies, ttfts, errors, lock = [], [], [0], threading.Lock()
+
+    def client(cid: int):
+        rng = random.Random(seed * 1000 + cid)
+        session = requests.Session()
+        for n in range(warmup + n_requests):
+            path, body = payload(endpoint, rng, cid * 100_000 + n, unique, batch)
+            try:
+                ms, ttft, ok = one_request(session, base + path, endpoint, body, timeout)
+            except (requests.RequestException, ValueError):  # ValueError: non-JSON error page
+                ms, ttft, ok = 0.0, None, False
+            if n < warmup:
+                continue
+            with lock:
+                if ok:
+                    latencies.append(ms)
+                    if ttft is not None:
+                        ttfts.append(ttft)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out = summarize(latencies, time.perf_counter() - t0, errors[0])
+    if ttfts:
+        out["ttft_p50_ms"], out["ttft_p95_ms"] = (float(x) for x in np.percentile(ttfts, [50, 95]))
+    return out
+
+
+_HIST_RE = re.compile(r'^rag_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def stage_means(base: str) -> dict:
+    """Mean ms per pipeline stage from /metrics (one worker's view under gunicorn)."""
+    try:
+        text = requests.get(base + "/metrics", timeout=5).text
+    except requests.RequestException:
+        return {}
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        m = _HIST_RE.match(line)
+        if m:
+            (sums if m.group(1) == "sum" else counts)[m.group(2)] = float(m.group(3))
+    return {s: sums[s] / counts[s] * 1000 for s in sums if counts.get(s)}
+
+
+def wait_ready(base: str, proc: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            if requests.get(base + "/api/ready", timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"server not ready after {timeout:.0f}s")
+
+
+def spawn(args) -> tuple[list[subprocess.Popen], subprocess.Popen]:
+    mock = subprocess.Popen([sys.executable, str(BACKEND / "bench" / "mock_openai.py"), "--port", str(args.mock_port),
+                             "--ttft_ms", str(args.ttft_ms), "--token_ms", str(args.token_ms)],
+                            stdout=subprocess.DEVNULL)
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{args.mock_port}/v1",
+               OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "mock"))
+    if args.server == "gunicorn":
+        env.update(RAG_BIND=f"127.0.0.1:{args.port}", RAG_WORKERS=str(args.workers))
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    else:
+        cmd = [sys.executable, "-c", "import rag_api as r; r.bootstrap_index(); r.init_worker(); "
+               f"r.app.run(port={args.port}, threaded=True)"]
+    log_path = Path(tempfile.gettempdir()) / "rag_loadtest_server.log"
+    print(f"server log: {log_path}")
+    log = open(log_path, "w")
+    api = subprocess.Popen(cmd, cwd=str(BACKEND), env=env, stdout=log, stderr=subprocess.STDOUT)
+    return [mock, api], api
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="existing server; default spawns or uses localhost")
+    parser.add_argument("--spawn", action="store_true", help="start the mock LLM and the API")
+    parser.add_argument("--server", choices=("dev", "gunicorn"), default="dev")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--mock_port", type=int, default=8011)
+    parser.add_argument("--ttft_ms", type=float, default=300)
+    parser.add_argument("--token_ms", type=float, default=20)
+    parser.add_argument("--endpoint", choices=ENDPOINTS, nargs="+", default=["ask"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--warmup", type=int, default=2, help="uncounted requests per client")
+    parser.add_argument("--batch", type=int, default=8, help="queries per ask-batch request")
+    parser.add_argument("--unique", action="store_true", help="defeat caches with unique queries")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--ready_timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", dest="save_baseline", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    procs, api = [], None
+    base = args.url or f"http://127.0.0.1:{args.port if args.spawn else 5000}"
+    try:
+        if args.spawn:
+            procs, api = spawn(args)
+            wait_ready(base, api, args.ready_timeout)
+
+        results = {}
+        print(f"{'endpoint':>11} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'ttft50':>8} {'errors':>6}")
+        for endpoint in args.endpoint:
+            for c in args.concurrency:
+                res = run_level(base, endpoint, c, args.requests, args.warmup, args.unique, args.batch,
+                                args.timeout, args.seed)
+                results[f"{endpoint}@{c}"] = res
+                print(f"{endpoint:>11} {c:>7} {res['throughput']:>8.2f} {res.get('p50_ms', 0):>8.1f} "
+                      f"{res.get('p95_ms', 0):>8.1f} {res.get('p99_ms', 0):>8.1f} "
+                      f"{res.get('ttft_p50_ms', 0):>8.1f} {res['errors']:>6}")
+
+        stages = stage_means(base)
+        if stages:
+            print("\nmean ms per stage (/metrics):")
+            for name, ms in sorted(stages.items(), key=lambda x: -x[1]):
+                print(f"  {name:<16} {ms:>9.2f}")
+        if api is not None:
+            rss = tree_peak_rss_mb(api.pid)
+            results["server"] = {"peak_rss_mb": rss["max_process_mb"], "peak_rss_sum_mb": rss["sum_mb"]}
+            print(f"\nserver peak RSS: {rss['max_process_mb']:.0f} MB largest process, "
+                  f"{rss['sum_mb']:.0f} MB over {rss['processes']} processes")
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, vars(args))
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
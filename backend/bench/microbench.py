@@ -0,0 +1,171 @@
+# bench/microbench.py
+"""Component microbenchmarks over synthetic corpora of growing size:
+
+    ingest    ingest_dir over generated .txt files           (chunks/s)
+    build     VectorIndex.build                              (chunks/s)
+    search    VectorIndex.search, query encode + FAISS       (per query)
+    retrieve  HybridRetriever.retrieve, dense + BM25 + fuse  (per query)
+    rerank    Reranker.rerank of the top-10 retrieved hits   (per query)
+    compress  compress_context / pack_context of those hits  (per call)
+
+Every corpus size runs in a fresh process; peak RSS is read after each case,
+so growth shows which stage allocates. Queries are unique, so no cache
+short-circuits the work. Results can be saved as a baseline and compared
+(exit 1 on regressions), as in loadtest.py.
+
+    cd backend && python bench/microbench.py --sizes 1000 10000 50000
+    cd backend && python bench/microbench.py --cases build search retrieve --save-baseline bench/baselines/micro.json
+    cd backend && python bench/microbench.py --baseline bench/baselines/micro.json
+"""
+import argparse
+import multiprocessing as mp
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from report import compare, peak_rss_mb, save_baseline, summarize
+
+CASES = ("ingest", "build", "search", "retrieve", "rerank", "compress")
+TOPICS = {
+    "refund": "refund receipt damaged item return policy exchange store credit",
+    "greeting": "greet smile welcome eye contact name introduce customer",
+    "complaint": "complaint escalate manager resolve apologise listen record",
+    "phone": "phone caller hold transfer voicemail callback line",
+    "queue": "queue wait time ticket busy peak hours patience",
+    "empathy": "empathy tone calm frustrated upset reassure acknowledge",
+}
+FILLER = ("the a staff should always when with for to and of on be can it this that service team "
+          "customer policy time help ask check make sure").split()
+
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    topic = rng.choice(list(TOPICS.values())).split()
+    return " ".join(rng.choice(topic) if rng.random() < 0.3 else rng.choice(FILLER) for _ in range(words)) + "."
+
+
+def synthetic_chunks(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [{"text": synthetic_text(rng, rng.randint(80, 220)),
+             "meta": {"filename": f"doc{i // 20}.txt", "source_path": f"/synthetic/doc{i // 20}.txt"}}
+            for i in range(n)]
+
+
+def synthetic_queries(n: int, seed: int = 1) -> list[str]:
+    rng = random.Random(seed)
+    return [f"how to handle {' '.join(rng.sample(rng.choice(list(TOPICS.values())).split(), 3))} #{i}"
+            for i in range(n)]
+
+
+def timed_calls(fn, items) -> dict:
+    latencies, t0 = [], time.perf_counter()
+    for it in items:
+        t = time.perf_counter()
+        fn(it)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return summarize(latencies, time.perf_counter() - t0)
+
+
+def run_size(size: int, opts: dict) -> dict:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from ragcore.embed import VectorIndex
+    from ragcore.ingest import ingest_dir
+    from ragcore.orchestrate import compress_context, pack_context
+    from ragcore.retrieve import HybridRetriever
+
+    cases, out = opts["cases"], {}
+
+    def record(case: str, res: dict):
+        res["peak_rss_mb"] = peak_rss_mb()
+        out[f"{case}@{size}"] = res
+
+    chunks = synthetic_chunks(size)
+    if "ingest" in cases:
+        with tempfile.TemporaryDirectory() as tmp:
+            per_doc = 20
+            for d in range(0, size, per_doc):
+                text = "\n\n".join(c["text"] for c in chunks[d:d + per_doc])
+                (Path(tmp) / f"doc{d // per_doc}.txt").write_text(text, encoding="utf-8")
+            t0 = time.perf_counter()
+            docs = ingest_dir(tmp, workers=opts["ingest_workers"])
+            dt = time.perf_counter() - t0
+        record("ingest", {"seconds": dt, "chunks": len(docs), "throughput": len(docs) / dt})
+
+    needs_index = {"build", "search", "retrieve", "rerank", "compress"} & set(cases)
+    if not needs_index:
+        return out
+    vec = VectorIndex(opts["embed_model"], index_type=opts["index_type"])
+    vec.embed_query("warm up")
+    t0 = time.perf_counter()
+    vec.build(chunks)
+    dt = time.perf_counter() - t0
+    if "build" in cases:
+        record("build", {"seconds": dt, "chunks": len(chunks), "throughput": len(chunks) / dt})
+
+    queries = synthetic_queries(opts["queries"])
+    if "search" in cases:
+        record("search", timed_calls(lambda q: vec.search(q, top_k=20), [q + " s" for q in queries]))
+
+    retriever = HybridRetriever(vec.store, vec)
+    hits = {}
+    if {"retrieve", "rerank", "compress"} & set(cases):
+        def retrieve(q):
+            hits[q] = retriever.retrieve(q, top_k=10)
+        res = timed_calls(retrieve, queries)
+        if "retrieve" in cases:
+            record("retrieve", res)
+
+    if "rerank" in cases:
+        from ragcore.rerank import Reranker
+
+        reranker = Reranker(opts["rerank_model"])
+        reranker.prepare(retriever.chunks)
+        reranker.rerank("warm up", hits[queries[0]], top_k=3)
+        subset = queries[:opts["rerank_queries"]]
+        record("rerank", timed_calls(lambda q: reranker.rerank(q, hits[q], top_k=3), subset))
+
+    if "compress" in cases:
+        record("compress", timed_calls(lambda q: compress_context(hits[q], max_chars=1500), queries))
+        record("pack", timed_calls(lambda q: pack_context(hits[q], max_tokens=400, query=q), queries))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--cases", choices=CASES, nargs="+", default=list(CASES))
+    parser.add_argument("--embed_model", default="intfloat/e5-base")
+    parser.add_argument("--rerank_model", default="BAAI/bge-reranker-base")
+    parser.add_argument("--index_type", default="flat")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rerank_queries", type=int, default=30)
+    parser.add_argument("--ingest_workers", type=int, default=1)
+    parser.add_argument("--save-baseline", dest="save_baseline", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    opts = vars(args)
+    ctx = mp.get_context("spawn")
+    results = {}
+    print(f"{'case':>18} {'ops/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'seconds':>8} {'peak MB':>8}")
+    for size in args.sizes:
+        with ctx.Pool(1) as pool:
+            res = pool.apply(run_size, (size, opts))
+        for case, r in res.items():
+            cols = [f"{r[k]:>8.2f}" if k in r else f"{'-':>8}" for k in ("p50_ms", "p95_ms", "p99_ms", "seconds")]
+            print(f"{case:>18} {r['throughput']:>10.1f} {' '.join(cols)} {r['peak_rss_mb']:>8.0f}")
+        results.update(res)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, opts)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench/mock_openai.py
+"""Minimal OpenAI-compatible chat completions server with tunable latency, so
+the RAG API can be exercised (streaming and non-streaming) without a real LLM.
+
+    python bench/mock_openai.py --port 8001 --ttft_ms 300 --token_ms 20
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python rag_api.py
+"""
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = ("Greet the customer warmly, listen without interrupting and confirm "
+                  "their issue before offering a solution [1]. Follow up to make sure "
+                  "the problem is resolved [2].")
+
+
+def make_handler(ttft_ms: float, token_ms: float, answer: str):
+    tokens = [w + " " for w in answer.split(" ")]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = req.get("model", "mock")
+            cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            time.sleep(ttft_ms / 1000)
+            if not req.get("stream"):
+                time.sleep(token_ms * len(tokens) / 1000)
+                return self._json(200, {
+                    "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": answer}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+                })
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(obj):
+                data = f"data: {obj if isinstance(obj, str) else json.dumps(obj)}\n\n".encode()
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            for i, tok in enumerate(tokens):
+                if i:
+                    time.sleep(token_ms / 1000)
+                send({"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                      "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]})
+            send({"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                  "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(port: int = 8001, ttft_ms: float = 300, token_ms: float = 20, answer: str = DEFAULT_ANSWER):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(ttft_ms, token_ms, answer))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft_ms", type=float, default=300, help="delay before the first token")
+    parser.add_argument("--token_ms", type=float, default=20, help="delay between tokens")
+    parser.add_argument("--answer", default=DEFAULT_ANSWER)
+    args = parser.parse_args()
+    srv = serve(args.port, args.ttft_ms, args.token_ms, args.answer)
+    print(f"mock OpenAI server on http://127.0.0.1:{args.port}/v1")
+    srv.serve_forever()
@@ -0,0 +1,108 @@
+# bench/report.py
+"""Shared by loadtest.py and microbench.py: latency summaries, peak RSS and
+saved baselines.
+
+A baseline is the JSON `results` of an earlier run ({case: {metric: value}})
+plus the machine it ran on. `compare` flags every metric that got worse by
+more than `tolerance`; numbers from different machines are not comparable,
+so save one baseline per reference box.
+"""
+import json
+import os
+import platform
+import resource
+import time
+from pathlib import Path
+
+import numpy as np
+
+# metrics where a larger value is better; for everything else (latency,
+# seconds, RSS) larger is worse. Counts, and the single-sample max, are skipped.
+HIGHER_IS_BETTER = {"throughput"}
+NOT_COMPARED = {"n", "errors", "chunks", "items", "max_ms"}
+
+
+def summarize(latencies_ms, wall_s: float, errors: int = 0) -> dict:
+    a = np.asarray(latencies_ms, dtype=np.float64)
+    out = {"n": int(len(a)), "errors": int(errors), "throughput": len(a) / wall_s if wall_s > 0 else 0.0}
+    if len(a):
+        p50, p95, p99 = np.percentile(a, [50, 95, 99])
+        out.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99), mean_ms=float(a.mean()),
+                   max_ms=float(a.max()))
+    return out
+
+
+def _status_kb(pid, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def peak_rss_mb(pid: int | None = None) -> float:
+    """High-water RSS of `pid` (default: this process)."""
+    if pid is None and not Path("/proc/self/status").exists():
+        # macOS reports bytes, Linux kilobytes; /proc covers Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20
+    return _status_kb(pid or "self", "VmHWM") / 1024
+
+
+def process_tree(pid: int) -> list[int]:
+    """`pid` and its descendants (e.g. gunicorn master and workers), Linux only."""
+    children = {}
+    for p in Path("/proc").iterdir():
+        if p.name.isdigit():
+            try:
+                ppid = int((p / "stat").read_text().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(p.name))
+    out, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        out.append(p)
+        todo.extend(children.get(p, ()))
+    return out
+
+
+def tree_peak_rss_mb(pid: int) -> dict:
+    """Peak RSS per process of the tree under `pid`, and their sum. The sum
+    double-counts pages shared between forked workers, so it is an upper bound."""
+    peaks = {p: peak_rss_mb(p) for p in process_tree(pid)}
+    return {"max_process_mb": max(peaks.values(), default=0.0), "sum_mb": sum(peaks.values()),
+            "processes": len(peaks)}
+
+
+def save_baseline(path, results: dict, args: dict | None = None):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "host": platform.node(),
+               "machine": platform.machine(), "cpus": os.cpu_count(), "python": platform.python_version(),
+               "args": args or {}, "results": results}
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    print(f"baseline saved to {path}")
+
+
+def compare(results: dict, baseline_path, tolerance: float = 0.10) -> list[str]:
+    """Print current vs baseline per metric; return the regressions."""
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    print(f"\nvs baseline {baseline_path} ({base['created']}, {base['host']}, {base['cpus']} CPUs)")
+    regressions = []
+    for case, metrics in results.items():
+        old = base["results"].get(case)
+        if old is None:
+            continue
+        for name, value in metrics.items():
+            if name in NOT_COMPARED or not isinstance(value, (int, float)) or not old.get(name):
+                continue
+            change = (value - old[name]) / old[name]
+            worse = -change if name in HIGHER_IS_BETTER else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"  {case:<32} {name:<14} {old[name]:>10.2f} -> {value:>10.2f} ({change:+.1%}) {flag}")
+            if flag:
+                regressions.append(f"{case} {name}: {old[name]:.2f} -> {value:.2f} ({change:+.1%})")
+    return regressions
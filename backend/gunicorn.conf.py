@@ -0,0 +1,39 @@
+# gunicorn.conf.py
+"""Production serving: `cd backend && gunicorn -c gunicorn.conf.py wsgi:app`
+
+preload_app imports wsgi, and so bootstraps the index, once in the master.
+Workers fork from it: the FAISS index and ChunkStore are memory-mapped from
+data/index and the torch weights are shared copy-on-write, so N workers hold
+one copy of each. Every worker then restarts its background threads, caps
+its inference threads and warms its models (rag_api.init_worker) before it
+accepts requests; /api/ready reports the result. The TensorFlow emotion
+models are the exception: each worker loads its own copy there.
+
+Run `python wsgi.py` after changing documents or models, so the master only
+loads an up-to-date snapshot and never runs inference before forking.
+Uploads and deletes through any worker re-save the snapshot; the other
+workers reload it on their next request.
+"""
+import os
+
+# HF tokenizers' own thread pool does not survive fork either
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = os.getenv("RAG_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("RAG_WORKERS", "2"))
+# threads per worker: LLM calls and SSE streams are I/O bound, model calls release the GIL
+worker_class = "gthread"
+threads = int(os.getenv("RAG_WORKER_THREADS", "8"))
+preload_app = True
+# first-request warmup and incremental uploads can take a while on CPU
+timeout = int(os.getenv("RAG_WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+
+# intra-op threads per worker; by default the cores are split between workers
+_inference_threads = int(os.getenv("RAG_INFERENCE_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+
+
+def post_worker_init(worker):
+    import rag_api
+
+    rag_api.init_worker(threads=_inference_threads)
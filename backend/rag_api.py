@@ -1,29 +1,111 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 import os
-import base64
-import re
-import numpy as np
-import cv2
-from gtts import gTTS
-from deepface import DeepFace
+import json
+import logging
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import sys
+import threading
+import time
 
 # Import your RAG pipeline functions
-from ragcore.ingest import ingest_dir
-from ragcore.embed import VectorIndex
-from ragcore.retrieve import HybridRetriever
 from ragcore.rerank import Reranker
-from ragcore.orchestrate import detect_intent, rewrite_query, compress_context
-from ragcore.generate import call_llm
-from ragcore.verify import self_check
+from ragcore.orchestrate import detect_intent, rewrite_query, pack_context
+from ragcore.generate import build_prompt, call_llm, stream_llm
+from ragcore.verify import self_check, StreamingCheck
+from ragcore.snapshot import load_or_build, update_files, reload_snapshot, snapshot_mtime
+from ragcore.answer_cache import SemanticAnswerCache, context_key
+from ragcore.engine import Engine
+from ragcore.emotion import EmotionAnalyzer
+from ragcore.frames import LatestFrameGate, decode_frame, data_url_bytes, frame_bytes
+from ragcore.tts import TTSCache, SYNTHESIZERS
+from ragcore import metrics
+try:  # optional: WebSocket frame streaming on /ws/frames
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
 
 app = Flask(__name__)
 CORS(app)
+
+logging.basicConfig(level=os.getenv("RAG_LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s")
+log = logging.getLogger("rag_api")
+# requests carrying this header get their stage timings back (Server-Timing + "trace")
+TRACE_HEADER = "X-RAG-Trace"
+ALLOW_TRACE = os.getenv("RAG_ALLOW_TRACE", "1") == "1"
  
-# Bootstrap index ONCE at startup
+# Bootstrap index ONCE at startup (in the gunicorn master under wsgi.py; see gunicorn.conf.py)
 retriever, reranker = None, None
+# readiness: bootstrap done in this process tree, and this worker's models warmed
+STATE = {"bootstrapped": False, "warm": False, "boot_pid": None, "started": time.time(),
+         "empty_snapshot_mtime": None}
+_reload_lock = threading.Lock()
+EMBED_MODEL = "intfloat/e5-base"
+RERANK_MODEL = "BAAI/bge-reranker-base"
+INDEX_DIR = Path(__file__).parent / "data" / "index"
+# process-pool size for full rebuilds; 0 = one per CPU, 1 = in-process
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "0"))
+# FAISS backend: flat (exact) | hnsw | ivf | ivfpq | ivfsq; pick an operating point with bench/bench_ann.py
+INDEX_PARAMS = {
+    "index_type": os.getenv("RAG_INDEX_TYPE", "flat"),
+    "nprobe": int(os.getenv("RAG_INDEX_NPROBE", "16")),
+    "ef_search": int(os.getenv("RAG_INDEX_EF_SEARCH", "64")),
+}
+# Model inference: torch | onnx | onnx-int8, with an optional intra-op thread cap
+# (see ragcore.inference; check parity with bench/bench_inference.py first)
+INFERENCE_BACKEND = os.getenv("RAG_INFERENCE_BACKEND", "torch")
+INFERENCE_THREADS = int(os.getenv("RAG_INFERENCE_THREADS", "0")) or None
+INDEX_PARAMS.update(backend=INFERENCE_BACKEND, threads=INFERENCE_THREADS)
+# Rank fusion of dense + BM25 hits: zscore | weighted | convex | rrf (see ragcore.fusion)
+FUSION = os.getenv("RAG_FUSION", "zscore")
+FUSION_WEIGHTS = tuple(float(w) for w in os.getenv("RAG_FUSION_WEIGHTS", "1,1").split(","))
+# LLM token budget for the packed context. chunk_text cuts chunks of 500+ words
+# (~650-700 tokens), so the default fits the top 3 whole; below ~700 even the
+# top chunk gets trimmed, which is less than compress_context used to send.
+CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "2200"))
+# Micro-batch CrossEncoder calls from concurrent requests (see ragcore.batching)
+RERANK_BATCHING = os.getenv("RAG_RERANK_BATCHING", "1") == "1"
+# Cascade: prune candidates to this many (by fused score, or RAG_RERANK_CASCADE_MODEL)
+# before bge runs; 0 disables. See bench/bench_rerank_cascade.py for the quality cost.
+RERANK_CASCADE_KEEP = int(os.getenv("RAG_RERANK_CASCADE_KEEP", "0")) or None
+RERANK_CASCADE_MODEL = os.getenv("RAG_RERANK_CASCADE_MODEL") or None
+# Shared pool that overlaps dense/lexical search and prompt prefetch with reranking
+engine = Engine(int(os.getenv("RAG_ENGINE_WORKERS", "0")) or None)
+# Optional semantic answer cache in front of call_llm (RAG_ANSWER_CACHE=1 to enable)
+answer_cache = None
+if os.getenv("RAG_ANSWER_CACHE", "0") == "1":
+    answer_cache = SemanticAnswerCache(
+        str(Path(__file__).parent / "data" / "cache" / "answers.sqlite"),
+        threshold=float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95")),
+    )
+# Emotion recognition for /process-image: frames are shrunk to RAG_EMOTION_MAX_SIDE
+# before face detection and concurrent frames share forward passes (ragcore.emotion).
+# Models load per worker in init_worker; RAG_EMOTION_PRELOAD=0 defers that to the first frame.
+emotion_analyzer = EmotionAnalyzer(
+    detector_backend=os.getenv("RAG_EMOTION_DETECTOR", "opencv"),
+    max_side=int(os.getenv("RAG_EMOTION_MAX_SIDE", "320")),
+    batching=os.getenv("RAG_EMOTION_BATCHING", "1") == "1",
+    max_batch_size=int(os.getenv("RAG_EMOTION_MAX_BATCH", "16")),
+    max_wait_ms=float(os.getenv("RAG_EMOTION_MAX_WAIT_MS", "10")),
+)
+EMOTION_PRELOAD = os.getenv("RAG_EMOTION_PRELOAD", "1") == "1"
+# Webcam frames: only each client's newest frame is analyzed (ragcore.frames).
+# RAG_FRAME_DECODE_REDUCE=2/4/8 decodes JPEGs at 1/n scale for high-resolution cameras.
+frame_gate = LatestFrameGate()
+FRAME_DECODE_REDUCE = int(os.getenv("RAG_FRAME_DECODE_REDUCE", "1"))
+# Text-to-speech: clips cached by hash of (synthesizer, lang, voice, text) in memory
+# and under data/cache/tts, shared by all workers. RAG_TTS_BACKEND=stub works offline.
+TTS_GREETING = "Welcome! Listening has started. Please speak now."
+TTS_PHRASES = [TTS_GREETING]  # synthesized ahead of the first request (RAG_TTS_PREGENERATE=1)
+tts_cache = TTSCache(SYNTHESIZERS[os.getenv("RAG_TTS_BACKEND", "gtts")](),
+                     cache_dir=str(Path(__file__).parent / "data" / "cache" / "tts"),
+                     max_entries=int(os.getenv("RAG_TTS_CACHE_ENTRIES", "256")),
+                     max_chars=int(os.getenv("RAG_TTS_MAX_CHARS", "1000")),
+                     max_disk_bytes=int(os.getenv("RAG_TTS_DISK_MB", "256")) * 2**20)
+TTS_PREGENERATE = os.getenv("RAG_TTS_PREGENERATE", "1") == "1"
 
 # --- Optional: wire in local career-path pipeline (Python scripts under ../career-path) ---
 CAREER_PATH_DIR = Path(__file__).resolve().parents[1] / "career-path"  # Now sapxntu_lawlsters1
@@ -51,27 +133,274 @@ def bootstrap_index(data_dir=None):
     # Resolve data_dir relative to this file to avoid CWD issues
     if data_dir is None:
         data_dir = str((Path(__file__).parent / "data" / "raw").resolve())
-    chunks = ingest_dir(data_dir)
-    if not chunks:
-        print(f"[bootstrap] No documents found under {data_dir}. RAG endpoints will be disabled.")
-        retriever = None
+    # Reuse the persisted index under data/index unless the corpus or models changed
+    retriever = load_or_build(data_dir, str(INDEX_DIR), EMBED_MODEL, workers=INGEST_WORKERS,
+                              index_params=INDEX_PARAMS)
+    STATE.update(bootstrapped=True, boot_pid=os.getpid())
+    if retriever is None:
+        log.warning("No documents found under %s. RAG endpoints will be disabled.", data_dir)
         reranker = None
+        STATE["empty_snapshot_mtime"] = snapshot_mtime(str(INDEX_DIR))
+        return
+    retriever.engine = engine
+    retriever.fusion, retriever.fusion_weights = FUSION, FUSION_WEIGHTS
+    reranker = Reranker(RERANK_MODEL, batching=RERANK_BATCHING,
+                        max_batch_size=int(os.getenv("RAG_RERANK_MAX_BATCH", "64")),
+                        max_wait_ms=float(os.getenv("RAG_RERANK_MAX_WAIT_MS", "5")),
+                        cascade_keep=RERANK_CASCADE_KEEP, cascade_model=RERANK_CASCADE_MODEL,
+                        backend=INFERENCE_BACKEND, threads=INFERENCE_THREADS)
+    # tokenize every passage once up front so queries only tokenize themselves
+    reranker.prepare(retriever.chunks)
+
+def warmup():
+    """Run one throwaway query through embedding, search and reranking so lazy
+    initialization (kernels, thread pools, graph optimization) is not paid by
+    the first real request."""
+    if retriever is None or reranker is None:
         return
-    vec = VectorIndex("intfloat/e5-base")
-    vec.build(chunks)
-    retriever = HybridRetriever(chunks, vec)
-    reranker = Reranker("BAAI/bge-reranker-base")
+    t0 = time.perf_counter()
+    candidates = retriever.retrieve("warmup", top_k=5)
+    reranker.rerank("warmup", candidates, top_k=3)
+    log.info("Warmed up in %.2fs", time.perf_counter() - t0)
+
+def init_worker(threads: int | None = None):
+    """Per-process setup after bootstrap_index(). In a forked worker, background
+    threads and ONNX sessions are recreated and torch is capped at `threads`;
+    the index, chunk store and torch weights stay shared with the master.
+    The emotion models are loaded here, never in the master (TensorFlow does
+    not survive fork)."""
+    if STATE["boot_pid"] not in (None, os.getpid()):
+        engine.after_fork()
+        if retriever is not None:
+            retriever.vec.after_fork(threads)
+        if reranker is not None:
+            reranker.after_fork(threads)
+        if answer_cache is not None:
+            answer_cache.after_fork()
+    if EMOTION_PRELOAD:
+        emotion_analyzer.load(threads)
+    if TTS_PREGENERATE:
+        # off the critical path: readiness does not wait on the synthesis service
+        threading.Thread(target=tts_cache.pregenerate, args=(TTS_PHRASES,), name="tts-pregenerate",
+                         daemon=True).start()
+    warmup()
+    STATE["warm"] = True
+
+@app.before_request
+def start_request():
+    g.t0 = time.perf_counter()
+    if ALLOW_TRACE and request.headers.get(TRACE_HEADER, "") not in ("", "0"):
+        g.trace_token = metrics.start_trace()
+
+@app.after_request
+def finish_request(response):
+    # streamed (SSE) bodies are still pending here; their LLM time shows up as
+    # llm_first_token / llm_stream in /metrics, not in the request trace
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.t0, endpoint=endpoint,
+                                    method=request.method, status=response.status_code)
+    events = metrics.current_trace() if "trace_token" in g else None
+    if events is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(events)
+        if response.is_json and not response.is_streamed:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict):
+                body["trace"] = events
+                response.set_data(json.dumps(body))
+    return response
+
+@app.teardown_request
+def end_request(exc):
+    token = g.pop("trace_token", None)
+    if token is not None:
+        try:
+            metrics.end_trace(token)
+        except ValueError:
+            pass  # torn down from another context (streamed response); nothing left to reset
+
+@app.before_request
+def sync_snapshot():
+    # another worker re-saved the snapshot (upload/delete): serve from it too
+    def seen():
+        return retriever.snapshot_mtime if retriever is not None else STATE["empty_snapshot_mtime"]
+    mtime = snapshot_mtime(str(INDEX_DIR))
+    if mtime is None or mtime == seen():
+        return
+    with _reload_lock:
+        if mtime == seen():
+            return
+        if retriever is None:
+            bootstrap_index()  # first documents were uploaded through another worker
+        elif reload_snapshot(retriever, str(INDEX_DIR)) and reranker is not None:
+            reranker.prepare(retriever.chunks)
+
+def _cache_lookup(query: str, ctx: list[dict], qvec=None):
+    """(hit, qvec, ctx_key) against the optional semantic answer cache."""
+    if answer_cache is None:
+        return None, None, None
+    qvec = retriever.vec.embed_query(query) if qvec is None else qvec
+    ctx_key = context_key(ctx)
+    return answer_cache.lookup(qvec, ctx_key), qvec, ctx_key
+
+def _cache_store(query: str, qvec, ctx_key, ctx: list[dict], ans: str, issues: list[str]):
+    if answer_cache is not None and ans:
+        citations = [c["chunk"]["meta"].get("filename", "unknown") for c in ctx]
+        answer_cache.store(query, qvec, ctx_key, ans, issues, citations)
+
+def _generate(query: str, ctx: list[dict], qvec=None, prompt=None):
+    # LLM step shared by answer() and answer_many(), behind the optional answer cache
+    hit, qvec, ctx_key = _cache_lookup(query, ctx, qvec)
+    if hit is not None:
+        return hit["answer"], hit["checks"]
+    ans = call_llm(query, ctx, model=os.getenv("RAG_LLM", "gpt-4o-mini"), prompt=prompt)
+    issues = self_check(ans, query)
+    _cache_store(query, qvec, ctx_key, ctx, ans, issues)
+    return ans, issues
 
-def answer(query: str, retriever, reranker, top_k=3):
+@metrics.timed("prefetch")
+def _speculative_prompt(query: str, candidates: list[dict], top_k: int):
+    # guess that the reranker keeps the fused top-k; returns (context key, prompt).
+    # Undecorated pack_context: the real packing below is the request's "compress" sample.
+    ctx = pack_context.__wrapped__(candidates[:top_k], max_tokens=CONTEXT_TOKENS, query=query)
+    return context_key(ctx), build_prompt(query, ctx)
+
+def build_context(query: str, retriever, reranker, top_k=3):
+    """Returns (ctx, prompt); prompt is a prebuilt (system, user) pair when the
+    speculative prompt built during reranking matches the final context."""
     # Speedup: lower top_k, reduce context size
     intent = detect_intent(query)
     q2 = rewrite_query(query, intent)
-    candidates = retriever.retrieve(q2, top_k=10)  # fewer docs
-    ranked = reranker.rerank(q2, candidates, top_k=top_k)
-    ctx = compress_context(ranked, max_chars=1500)  # smaller context
-    ans = call_llm(query, ctx, model=os.getenv("RAG_LLM", "gpt-4o-mini"))
-    issues = self_check(ans, query)
-    return ans, issues
+    candidates = engine.run("retrieve", retriever.retrieve, q2, top_k=10)  # fewer docs
+    speculative = engine.submit("prefetch", _speculative_prompt, query, [dict(c) for c in candidates], top_k)
+    ranked = engine.run("rerank", reranker.rerank, q2, candidates, top_k=top_k)
+    ctx = engine.run("compress", pack_context, ranked, max_tokens=CONTEXT_TOKENS, query=query)  # smaller context
+    spec_key, prompt = speculative.result()
+    return ctx, (prompt if spec_key == context_key(ctx) else None)
+
+def answer(query: str, retriever, reranker, top_k=3):
+    ctx, prompt = build_context(query, retriever, reranker, top_k)
+    return engine.run("llm", _generate, query, ctx, prompt=prompt)
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def wants_stream(data: dict) -> bool:
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+def stream_answer(query: str, ctx: list[dict], answer_key='answer', prompt=None):
+    """SSE body: a `token` event per LLM delta, then one `done` event carrying the
+    full answer and its checks (or an `error` event)."""
+    hit, qvec, ctx_key = _cache_lookup(query, ctx)
+    if hit is not None:
+        yield _sse('token', {'token': hit["answer"]})
+        yield _sse('done', {answer_key: hit["answer"], 'checks': hit["checks"]})
+        return
+    check, parts = StreamingCheck(), []
+    try:
+        for delta in stream_llm(query, ctx, model=os.getenv("RAG_LLM", "gpt-4o-mini"), prompt=prompt):
+            check.feed(delta)
+            parts.append(delta)
+            yield _sse('token', {'token': delta})
+    except Exception as e:
+        log.exception("LLM stream failed")
+        yield _sse('error', {'error': str(e)})
+        return
+    ans, issues = "".join(parts), check.finish()
+    _cache_store(query, qvec, ctx_key, ctx, ans, issues)
+    yield _sse('done', {answer_key: ans, 'checks': issues})
+
+def sse_response(gen):
+    return Response(stream_with_context(gen), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def answer_many(queries: list[str], retriever, reranker, top_k=3, llm_workers=8):
+    """Batched answer(): retrieval and reranking run once over all queries, then
+    the (I/O-bound) LLM calls run concurrently."""
+    rewritten = [rewrite_query(q, detect_intent(q)) for q in queries]
+    candidates = retriever.retrieve_many(rewritten, top_k=10)
+    ranked = reranker.rerank_many(rewritten, candidates, top_k=top_k)
+    ctxs = [pack_context(r, max_tokens=CONTEXT_TOKENS, query=q) for r, q in zip(ranked, queries)]
+    qvecs = retriever.vec.embed_queries(queries) if answer_cache is not None else [None] * len(queries)
+    with ThreadPoolExecutor(max_workers=llm_workers) as pool:
+        return list(pool.map(_generate, queries, ctxs, qvecs))
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    # liveness: the process is up and serving requests
+    return jsonify({'status': 'ok', 'pid': os.getpid(), 'uptime_s': round(time.time() - STATE['started'], 1)})
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    # readiness: bootstrap finished and this worker's models are warm. An empty
+    # corpus still counts as ready, or the upload endpoint could never be reached.
+    ok = STATE['bootstrapped'] and STATE['warm']
+    body = {
+        'ready': ok,
+        'pid': os.getpid(),
+        'index_loaded': retriever is not None,
+        'chunks': len(retriever.chunks) if retriever is not None else 0,
+        'snapshot_mtime_ns': retriever.snapshot_mtime if retriever is not None else None,
+        'warm': STATE['warm'],
+        'emotion_loaded': emotion_analyzer.ready,
+    }
+    return jsonify(body), 200 if ok else 503
+
+@app.route('/api/engine-stats', methods=['GET'])
+def engine_stats():
+    return jsonify({'stages': engine.stats()})
+
+def _cache_stats() -> dict:
+    out = {tts_cache.memory.name: tts_cache.stats()}
+    if retriever is None or reranker is None:
+        return out
+    caches = [retriever.vec.query_cache, retriever.cache, reranker.score_cache, reranker.passage_tokens]
+    out.update({c.name: c.stats() for c in caches})
+    if answer_cache is not None:
+        out['semantic_answer'] = answer_cache.stats()
+    return out
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    out = _cache_stats()
+    if reranker is not None and reranker.batcher is not None:
+        out['rerank_batcher'] = reranker.batcher.stats()
+    if emotion_analyzer.batcher is not None:
+        out['emotion_batcher'] = emotion_analyzer.stats()
+    out['frame_gate'] = frame_gate.stats()
+    return jsonify({'caches': out})
+
+@metrics.register
+def _collect():
+    caches = _cache_stats()
+    out = [
+        ("rag_cache_hits_total", "counter", "Cache hits.",
+         [({"cache": name}, st["hits"]) for name, st in caches.items()]),
+        ("rag_cache_misses_total", "counter", "Cache misses.",
+         [({"cache": name}, st["misses"] if "misses" in st else st["lookups"] - st["hits"])
+          for name, st in caches.items()]),
+        ("rag_cache_entries", "gauge", "Entries currently cached.",
+         [({"cache": name}, st["size"]) for name, st in caches.items()]),
+        ("rag_index_chunks", "gauge", "Chunks in the live index.",
+         [({}, len(retriever.chunks) if retriever is not None else 0)]),
+        ("rag_engine_queued", "gauge", "Engine tasks waiting for a pool thread.",
+         [({"stage": name}, st["queued"]) for name, st in engine.stats().items()]),
+    ]
+    if reranker is not None and reranker.batcher is not None:
+        st = reranker.batcher.stats()
+        out += [("rag_rerank_batches_total", "counter", "Micro-batched rerank forward passes.", [({}, st["batches"])]),
+                ("rag_rerank_batch_items_total", "counter", "Pairs scored by micro-batches.", [({}, st["items"])])]
+    st = frame_gate.stats()
+    out += [("rag_frames_analyzed_total", "counter", "Webcam frames admitted for analysis.", [({}, st["admitted"])]),
+            ("rag_frames_dropped_total", "counter", "Webcam frames skipped for a newer one.", [({}, st["dropped"])])]
+    if emotion_analyzer.batcher is not None:
+        st = emotion_analyzer.stats()
+        out += [("rag_emotion_batches_total", "counter", "Micro-batched emotion forward passes.", [({}, st["batches"])]),
+                ("rag_emotion_batch_frames_total", "counter", "Frames analyzed by micro-batches.", [({}, st["items"])])]
+    return out
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/list-backend-files', methods=['GET'])
 def list_backend_files():
@@ -93,6 +422,28 @@ def download_backend_file():
         return jsonify({'error': 'File not found'}), 404
     return send_file(str(file_path), as_attachment=True)
 
+# Delete a file from backend/data/raw and drop its chunks from the live index
+@app.route('/api/delete-backend-file', methods=['DELETE'])
+def delete_backend_file():
+    filename = request.args.get('file')
+    if not filename:
+        return jsonify({'error': 'No file specified'}), 400
+    data_dir = Path(__file__).parent / 'data' / 'raw'
+    file_path = data_dir / Path(filename).name
+    if not file_path.exists() or not file_path.is_file():
+        return jsonify({'error': 'File not found'}), 404
+    file_path.unlink()
+    if retriever is not None:
+        # the file is gone already; a failed update is retried by the next
+        # update_files/startup check, which finds it missing from disk
+        try:
+            update_files(retriever, str(data_dir), str(INDEX_DIR), names=[file_path.name])
+        except Exception as e:
+            log.exception("Index update after delete failed")
+            return jsonify({'error': f'Deleted {file_path.name}, but failed to update RAG: {e}',
+                            'file': file_path.name}), 500
+    return jsonify({'message': f'Deleted {file_path.name}', 'file': file_path.name})
+
 @app.route('/api/upload-pdfs', methods=['POST'])
 def upload_pdfs():
     # Ensure upload folder exists
@@ -109,21 +460,39 @@ def upload_pdfs():
             saved.append(file.filename)
     if not saved:
         return jsonify({'error': 'No valid PDF files uploaded'}), 400
-    # Trigger RAG ingest after upload
+    # Index only the uploaded files; the live retriever picks them up in place
     try:
-        chunks = ingest_dir(str(upload_folder))
-        msg = f'Successfully uploaded: {", ".join(saved)}. RAG updated with {len(chunks)} new chunks.'
+        if retriever is None:
+            bootstrap_index(str(upload_folder))
+            n_chunks = len(retriever.chunks) if retriever is not None else 0
+        else:
+            n_chunks = update_files(retriever, str(upload_folder), str(INDEX_DIR), names=saved)["chunks"]
+            if reranker is not None:
+                reranker.prepare(retriever.chunks)
+        msg = f'Successfully uploaded: {", ".join(saved)}. RAG updated with {n_chunks} new chunks.'
     except Exception as e:
+        log.exception("Index update after upload failed")
         msg = f'Successfully uploaded: {", ".join(saved)}, but failed to update RAG: {e}'
     return jsonify({'message': msg, 'files': saved})
 
-@app.route('/api/tts', methods=['GET'])
+@app.route('/api/tts', methods=['GET', 'POST'])
 def tts():
-    text = "Welcome! Listening has started. Please speak now."  # Your predetermined string
-    tts = gTTS(text)
-    filename = "tts_output.mp3"
-    tts.save(filename)
-    return send_file(filename, mimetype="audio/mpeg")
+    # GET ?text=&lang=&voice= (defaults to the greeting); POST {"text", "lang", "voice"} for long text
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    text = params.get('text') or TTS_GREETING
+    try:
+        key, audio = tts_cache.get(text, lang=params.get('lang', 'en'), voice=params.get('voice', 'com'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception("TTS synthesis failed")
+        return jsonify({'error': str(e)}), 502
+    response = Response(audio, mimetype=tts_cache.mimetype)
+    # the key is a content hash: browsers may keep the clip and revalidate by ETag
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request, accept_ranges=True)
 
 @app.route('/api/direct-llm-query', methods=['POST'])
 def direct_llm_query():
@@ -141,9 +510,7 @@ def direct_llm_query():
             return jsonify({'answer': '', 'checks': issues, 'error': 'No answer generated by LLM.'}), 200
         return jsonify({'answer': ans, 'checks': issues})
     except Exception as e:
-        import traceback
-        print("Direct LLM query error:", e)
-        traceback.print_exc()
+        log.exception("Direct LLM query error")
         return jsonify({'error': 'Internal error in direct LLM query: ' + str(e)}), 500
     
 @app.route('/api/ask', methods=['POST'])
@@ -155,9 +522,28 @@ def ask():
     if retriever is None or reranker is None:
         return jsonify({'error': 'RAG index not initialized'}), 500
     try:
+        if wants_stream(data):
+            ctx, prompt = build_context(user_query, retriever, reranker)
+            return sse_response(stream_answer(user_query, ctx, prompt=prompt))
         ans, issues = answer(user_query, retriever, reranker)
         return jsonify({'answer': ans, 'checks': issues})
     except Exception as e:
+        log.exception("Ask endpoint error")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ask-batch', methods=['POST'])
+def ask_batch():
+    data = request.get_json()
+    queries = data.get('queries') or []
+    if not queries or not isinstance(queries, list) or not all(isinstance(q, str) and q for q in queries):
+        return jsonify({'error': 'queries must be a non-empty list of strings'}), 400
+    if retriever is None or reranker is None:
+        return jsonify({'error': 'RAG index not initialized'}), 500
+    try:
+        results = answer_many(queries, retriever, reranker)
+        return jsonify({'results': [{'answer': ans, 'checks': issues} for ans, issues in results]})
+    except Exception as e:
+        log.exception("Batch ask endpoint error")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/advice', methods=['POST'])
@@ -178,17 +564,18 @@ def advice():
             "Do not use markdown, lists, or extra explanation. "
             "Example: 'You are being too fierce, please calm down.'"
         )
+        if wants_stream(data):
+            ctx, prompt = build_context(user_query, retriever, reranker)
+            return sse_response(stream_answer(user_query, ctx, answer_key='advice', prompt=prompt))
         ans, issues = answer(user_query, retriever, reranker)
         return jsonify({'advice': ans, 'checks': issues})
     except Exception as e:
-        import traceback
-        print("Advice endpoint error:", e)
-        traceback.print_exc()
+        log.exception("Advice endpoint error")
         return jsonify({'error': 'Internal error in advice endpoint: ' + str(e)}), 500
 
 # --- Speedup tips ---
 # 1. Use a smaller/faster LLM model (set RAG_LLM env to a fast model, e.g. gpt-3.5-turbo or a local fast model)
-# 2. Reduce top_k in answer() to 3-5, or reduce context size in compress_context
+# 2. Reduce top_k in answer() to 3-5, or lower RAG_CONTEXT_TOKENS (pack_context budget)
 # 3. Use a faster reranker or skip reranking for quick feedback
 # 4. Precompute embeddings/index if possible
 """
@@ -200,54 +587,94 @@ def advice():
     emotion = data.get('emotion', '')
     return jsonify({'advice': f"Transcript: {transcript}, Emotion: {emotion}"})
 """
+def _frame_client() -> str | None:
+    # explicit ids only: clients behind one proxy or NAT share remote_addr
+    return request.headers.get('X-Client-Id') or request.args.get('client') or None
+
+def _analyze_frame(buf) -> tuple[dict, int]:
+    with metrics.timer("image_decode"):
+        img = decode_frame(buf, FRAME_DECODE_REDUCE)
+    if img is None:
+        return {'error': 'Could not decode image'}, 400
+    # downscale, detect and score (batched with other clients' frames)
+    with metrics.timer("deepface"):
+        faces = emotion_analyzer.analyze(img)
+    if not faces:
+        return {'result': 'No face detected', 'emotion': None}, 200
+    dominant = faces[0]['dominant_emotion']
+    return {'result': f'Detected emotion: {dominant}', 'emotion': dominant}, 200
+
 @app.route('/api/process_webcam', methods=['POST'])
 def process_webcam():
-    data = request.get_json()
-    image_data = data.get('image')
-    if not image_data:
-        return jsonify({'error': 'No image data provided'}), 400
-
-    # Remove the header of the data URL
-    match = re.match(r'data:image/(png|jpeg);base64,(.*)', image_data)
-    if not match:
-        return jsonify({'error': 'Invalid image data'}), 400
-
-    image_b64 = match.group(2)
     try:
-        image_bytes = base64.b64decode(image_b64)
-        # Process image_bytes as needed
-        result = f"Received image of size: {len(image_bytes)} bytes"
-        return jsonify({'result': result})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        image_bytes = frame_bytes(request)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not image_bytes:
+        return jsonify({'error': 'No image data provided'}), 400
+    return jsonify({'result': f"Received image of size: {len(image_bytes)} bytes"})
 
 @app.route('/process-image', methods=['POST'])
 def process_image():
-    data = request.get_json()
-    image_data = data.get('image')
-    if not image_data:
+    try:
+        image_bytes = frame_bytes(request)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not image_bytes:
         return jsonify({'error': 'No image data provided'}), 400
-
-    # Remove the header of the data URL
-    match = re.match(r'data:image/(png|jpeg);base64,(.*)', image_data)
-    if not match:
-        return jsonify({'error': 'Invalid image data'}), 400
-
-    image_b64 = match.group(2)
+    client = _frame_client()
     try:
-        image_bytes = base64.b64decode(image_b64)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        # Use DeepFace to analyze emotion
-        result = DeepFace.analyze(img, actions=['emotion'], enforce_detection=False)
-        if isinstance(result, list):
-            result = result[0]
-        emotion = result['dominant_emotion']
-
-        return jsonify({'result': f'Detected emotion: {emotion}'})
+        if client is None:  # anonymous (e.g. legacy JSON) clients are never dropped
+            body, status = _analyze_frame(image_bytes)
+        else:
+            # one frame per client at a time; a frame overtaken while waiting is skipped
+            with frame_gate.newest(client) as admitted:
+                if not admitted:
+                    return jsonify({'dropped': True, 'result': None})
+                body, status = _analyze_frame(image_bytes)
     except Exception as e:
+        log.exception("Emotion detection error")
         return jsonify({'error': str(e)}), 500
+    return jsonify(body), status
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/ws/frames')
+    def frames_ws(ws):
+        """Binary WebSocket stream: each message is one encoded frame, each reply
+        the JSON result for the newest frame received by then. Holds one worker
+        thread for the life of the connection."""
+        slot = frame_gate.slot()
+
+        def receive():
+            try:
+                while True:
+                    msg = ws.receive()
+                    if msg is None:
+                        break
+                    if isinstance(msg, str):  # a data URL sent as text
+                        try:
+                            msg = data_url_bytes(msg)
+                        except ValueError:
+                            continue
+                    slot.put(msg)
+            except ConnectionClosed:
+                pass
+            finally:
+                slot.close()
+
+        threading.Thread(target=receive, name="ws-frames", daemon=True).start()
+        while (buf := slot.get()) is not None:
+            try:
+                body, _ = _analyze_frame(buf)
+            except Exception as e:
+                log.exception("Emotion detection error")
+                body = {'error': str(e)}
+            try:
+                ws.send(json.dumps(body))
+            except ConnectionClosed:
+                break
 
 @app.route('/process-audio', methods=['POST'])
 def process_audio():
@@ -314,13 +741,13 @@ def career_path_generate():
                              include_tags=include_tags, include_types=include_types)
         except Exception as e:
             # Retrieval failed (likely embeddings server). Proceed without hits.
-            print(f"[career-path] Retrieval disabled: {e}")
+            log.warning("career-path retrieval disabled: %s", e)
 
         # Generate markdown table via LLM; fallback to last-saved or stub on failure
         try:
             table_md = career_app.call_llm(hits, profile)
         except Exception as e:
-            print(f"[career-path] LLM generation failed: {e}")
+            log.warning("career-path LLM generation failed: %s", e)
             # Try last saved table
             last_md = CAREER_PATH_DIR / 'career_path.md'
             if last_md.exists():
@@ -362,6 +789,7 @@ def career_path_generate():
         }
         return jsonify(resp)
     except Exception as e:
+        log.exception("career-path generation error")
         return jsonify({'error': str(e)}), 500
 
 
@@ -373,5 +801,7 @@ def career_path_svg():
     return send_file(str(svg_path), mimetype='image/svg+xml')
 
 if __name__ == '__main__':
+    # development server; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
     bootstrap_index()  # uses backend/data/raw by default
-    app.run(debug=True, port=5000)  
+    init_worker()
+    app.run(debug=True, port=5000, threaded=True)  
@@ -0,0 +1,135 @@
+# ragcore/answer_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def chunk_id(chunk: dict) -> str:
+    # content-addressed, so ids survive index rebuilds but change with the text
+    h = hashlib.blake2b(digest_size=12)
+    h.update(chunk["meta"].get("filename", "").encode("utf-8"))
+    h.update(b"\0")
+    h.update(chunk["text"].encode("utf-8"))
+    return h.hexdigest()
+
+
+def context_key(ctx: list[dict]) -> str:
+    # order matters: the answer's [n] citations index into the context list
+    return hashlib.blake2b("|".join(chunk_id(c["chunk"]) for c in ctx).encode(), digest_size=16).hexdigest()
+
+
+class SemanticAnswerCache:
+    """Persistent answer cache for call_llm.
+
+    An entry is reused when the retrieved context is exactly the same chunk
+    list AND the query embedding is within `threshold` cosine similarity of the
+    cached query. Embeddings are expected to be L2-normalized.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.95, max_entries: int = 5000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.lookups = self.hits = 0
+        self._lock = threading.Lock()
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        # WAL: gunicorn workers share the file, readers never block the writer
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY, ctx_key TEXT NOT NULL, query TEXT, embedding BLOB NOT NULL,"
+            " answer TEXT NOT NULL, checks TEXT, citations TEXT, created REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_ctx ON answers(ctx_key)")
+        self._db.commit()
+        # ctx_key -> (row ids, stacked embeddings); a context usually has a handful of entries
+        self._groups = {}
+        self._max_id = 0
+        self._sync()
+
+    def after_fork(self):
+        """Reopen in a forked worker (gunicorn --preload): an SQLite connection
+        must not be used across fork(). The inherited handle is dropped unclosed,
+        since closing it could release locks the master still holds."""
+        with self._lock:
+            self._open()
+
+    def _sync(self):
+        # pick up rows other processes (workers sharing the file) inserted since
+        rows = self._db.execute("SELECT id, ctx_key, embedding FROM answers WHERE id > ? ORDER BY id",
+                                (self._max_id,))
+        for row_id, key, emb in rows:
+            self._index(key, row_id, np.frombuffer(emb, dtype="float32"))
+
+    def _index(self, key: str, row_id: int, vec: np.ndarray):
+        ids, mat = self._groups.get(key, ([], None))
+        mat = vec[None, :] if mat is None else np.vstack([mat, vec])
+        self._groups[key] = (ids + [row_id], mat)
+        self._max_id = max(self._max_id, row_id)
+
+    def lookup(self, qvec: np.ndarray, ctx_key: str):
+        """Return {"answer", "checks", "citations", "similarity"} or None."""
+        q = np.asarray(qvec, dtype="float32").reshape(-1)
+        with self._lock:
+            self.lookups += 1
+            self._sync()
+            group = self._groups.get(ctx_key)
+            if group is None:
+                return None
+            ids, mat = group
+            sims = mat @ q
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            row = self._db.execute(
+                "SELECT answer, checks, citations FROM answers WHERE id = ?", (ids[best],)
+            ).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+        return {"answer": row[0], "checks": json.loads(row[1] or "[]"),
+                "citations": json.loads(row[2] or "[]"), "similarity": float(sims[best])}
+
+    def store(self, query: str, qvec: np.ndarray, ctx_key: str, answer: str,
+              checks: list[str], citations: list[str]):
+        q = np.asarray(qvec, dtype="float32").reshape(-1)
+        with self._lock:
+            self._sync()
+            cur = self._db.execute(
+                "INSERT INTO answers (ctx_key, query, embedding, answer, checks, citations, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ctx_key, query, q.tobytes(), answer, json.dumps(checks), json.dumps(citations), time.time()),
+            )
+            self._index(ctx_key, cur.lastrowid, q)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        (n,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        if n <= self.max_entries:
+            return
+        old = [r[0] for r in self._db.execute(
+            "SELECT id FROM answers ORDER BY created LIMIT ?", (n - self.max_entries,))]
+        self._db.executemany("DELETE FROM answers WHERE id = ?", [(i,) for i in old])
+        drop = set(old)
+        for key, (ids, mat) in list(self._groups.items()):
+            keep = [j for j, i in enumerate(ids) if i not in drop]
+            if len(keep) == len(ids):
+                continue
+            if keep:
+                self._groups[key] = ([ids[j] for j in keep], mat[keep])
+            else:
+                del self._groups[key]
+
+    def stats(self) -> dict:
+        return {"size": sum(len(ids) for ids, _ in self._groups.values()), "lookups": self.lookups,
+                "hits": self.hits, "hit_rate": self.hits / self.lookups if self.lookups else 0.0}
@@ -0,0 +1,87 @@
+# ragcore/batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Dynamic micro-batching in front of a batch predict function.
+
+    Concurrent callers `submit` lists of items; a background thread gathers
+    them until `max_batch_size` items are queued or the oldest request has
+    waited `max_wait_ms`, sorts the combined items by `length_key` so each
+    forward pass pads to similar lengths, and scatters results back to each
+    caller's Future in their original order.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 length_key=len, name: str = "batcher"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.length_key = length_key
+        self._queue = queue.Queue()
+        self.batches = self.items = 0
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def after_fork(self):
+        """Restart the worker thread in a forked child (gunicorn --preload workers),
+        which inherits this object but not its thread."""
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=self._thread.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items: list) -> Future:
+        fut = Future()
+        if not items:
+            fut.set_result([])
+        else:
+            self._queue.put((list(items), fut))
+        return fut
+
+    def __call__(self, items: list) -> list:
+        return self.submit(items).result()
+
+    def _gather(self):
+        requests = [self._queue.get()]
+        n = len(requests[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                req = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            requests.append(req)
+            n += len(req[0])
+        return requests
+
+    def _loop(self):
+        while True:
+            requests = self._gather()
+            flat = [(r, i, item) for r, (items, _) in enumerate(requests) for i, item in enumerate(items)]
+            results = [[None] * len(items) for items, _ in requests]
+            try:
+                # length bucketing: neighbours in a forward pass have similar lengths
+                flat.sort(key=lambda x: self.length_key(x[2]))
+                for start in range(0, len(flat), self.max_batch_size):
+                    part = flat[start:start + self.max_batch_size]
+                    preds = self.predict_fn([item for _, _, item in part])
+                    for (r, i, _), p in zip(part, preds):
+                        results[r][i] = p
+                    self.batches += 1
+                    self.items += len(part)
+            except Exception as e:
+                for _, fut in requests:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(requests, results):
+                fut.set_result(res)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "items": self.items, "queued": self._queue.qsize(),
+                "mean_batch": self.items / self.batches if self.batches else 0.0}
@@ -0,0 +1,180 @@
+# ragcore/chunkstore.py
+"""Array-backed chunk storage in place of a list of {"text", "meta"} dicts.
+
+All chunk texts live in one contiguous UTF-8 buffer addressed by an int64
+offsets array; the per-chunk fields every chunk has are NumPy columns
+(stable integer ids, LLM token counts, MinHash signatures), filename /
+source / date / tags sit in the columnar MetaStore, and only uncommon meta
+keys are kept as small per-chunk dicts. A saved store can be memory-mapped,
+so loading is O(1) and the pages are shared between processes.
+
+Indexing with a row number (`store[row]`) still materializes the familiar
+chunk dict, plus its stable "id"; hot paths use `text`, `signature` and
+`n_tokens` directly. Ids are never reused, so they remain valid cache keys
+across incremental updates, unlike row numbers which shift on removal.
+"""
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from ragcore.dedup import NUM_PERM, minhash
+from ragcore.metastore import MetaStore
+from ragcore.tokens import count_tokens
+
+# meta keys with a dedicated column; anything else goes to `extras`
+_COLUMN_KEYS = ("filename", "source_path", "minhash", "n_tokens")
+_ARRAYS = ("offsets", "ids", "n_tokens", "minhash")
+
+class ChunkStore:
+    def __init__(self, chunks=()):
+        self._buf = np.zeros(0, dtype=np.uint8)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.n_tokens = np.zeros(0, dtype=np.int32)
+        self.minhash = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self.columns = MetaStore()
+        self.extras = {}  # chunk id -> uncommon meta keys
+        self.next_id = 0
+        # appended text not yet copied into _buf; merged on the next read
+        self._pending = []
+        self._flush_lock = threading.Lock()
+        self.mmapped = False
+        self.extend(list(chunks))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, row: int) -> dict:
+        row = range(len(self))[row]
+        cid = int(self.ids[row])
+        meta = {}
+        filename = self.columns.filenames.values[self.columns.filename[row]]
+        source = self.columns.sources.values[self.columns.source[row]]
+        if filename:
+            meta["filename"] = filename
+        if source:
+            meta["source_path"] = source
+        meta["minhash"] = self.minhash[row].tobytes().hex()
+        meta["n_tokens"] = int(self.n_tokens[row])
+        meta.update(self.extras.get(cid, {}))
+        return {"id": cid, "text": self.text(row), "meta": meta}
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    # --- reads ----------------------------------------------------------------
+
+    def _flush(self):
+        with self._flush_lock:
+            if self._pending:
+                self._buf = np.concatenate([self._buf, np.frombuffer(b"".join(self._pending), dtype=np.uint8)])
+                self._pending = []
+
+    def text(self, row: int) -> str:
+        if self._pending:
+            self._flush()
+        return self._buf[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def texts(self):
+        for row in range(len(self)):
+            yield self.text(row)
+
+    def signature(self, row: int) -> np.ndarray:
+        return self.minhash[row]
+
+    def rows_with_filename(self, names) -> np.ndarray:
+        return self.columns.rows_with_filename(names)
+
+    def nbytes(self) -> int:
+        arrays = [self._buf, self.offsets, self.ids, self.n_tokens, self.minhash,
+                  *(getattr(self.columns, a) for a in MetaStore.ARRAYS)]
+        return sum(a.nbytes for a in arrays) + sum(len(p) for p in self._pending)
+
+    # --- writes -----------------------------------------------------------------
+
+    def _ensure_writable(self):
+        # a memory-mapped store is read-only; copy it into memory before the first write
+        if self.mmapped:
+            self._buf = np.array(self._buf)
+            for name in _ARRAYS:
+                setattr(self, name, np.array(getattr(self, name)))
+            self.mmapped = False
+
+    def extend(self, chunks: list[dict]):
+        if not chunks:
+            return
+        self._ensure_writable()
+        raw = [c["text"].encode("utf-8") for c in chunks]
+        metas = [c.get("meta", {}) for c in chunks]
+        ids = np.arange(self.next_id, self.next_id + len(chunks), dtype=np.int64)
+        self.next_id += len(chunks)
+        lens = np.fromiter((len(b) for b in raw), dtype=np.int64, count=len(raw))
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + np.cumsum(lens)])
+        self._pending.extend(raw)
+        self.ids = np.concatenate([self.ids, ids])
+        self.n_tokens = np.concatenate([self.n_tokens, np.fromiter(
+            (m["n_tokens"] if "n_tokens" in m else count_tokens(c["text"]) for c, m in zip(chunks, metas)),
+            dtype=np.int32, count=len(chunks))])
+        sigs = np.stack([np.frombuffer(bytes.fromhex(m["minhash"]), dtype=np.uint32) if "minhash" in m
+                         else minhash(c["text"]) for c, m in zip(chunks, metas)])
+        self.minhash = np.concatenate([self.minhash, sigs])
+        self.columns.append(chunks)
+        for cid, m in zip(ids.tolist(), metas):
+            extra = {k: v for k, v in m.items() if k not in _COLUMN_KEYS}
+            if extra:
+                self.extras[cid] = extra
+
+    def remove(self, rows):
+        if not len(rows):
+            return
+        self._ensure_writable()
+        self._flush()
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(rows, dtype=np.int64)] = False
+        lens = np.diff(self.offsets)
+        # gather the surviving byte ranges in one vectorized pass
+        self._buf = self._buf[np.repeat(keep, lens)]
+        self.offsets = np.concatenate([[0], np.cumsum(lens[keep])]).astype(np.int64)
+        for cid in self.ids[~keep].tolist():
+            self.extras.pop(cid, None)
+        self.ids, self.n_tokens, self.minhash = self.ids[keep], self.n_tokens[keep], self.minhash[keep]
+        self.columns.remove(rows)
+
+    # --- persistence --------------------------------------------------------------
+
+    def save(self, out_dir: str):
+        """Write texts.bin, one .npy per column and meta.json into `out_dir`."""
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        self._flush()
+        self._buf.tofile(out / "texts.bin")
+        for name in _ARRAYS:
+            np.save(out / f"{name}.npy", getattr(self, name))
+        for name in MetaStore.ARRAYS:
+            np.save(out / f"meta_{name}.npy", getattr(self.columns, name))
+        meta = {"next_id": self.next_id, "vocab": self.columns.vocab(),
+                "extras": {str(k): v for k, v in self.extras.items()}}
+        (out / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, src_dir: str, mmap: bool = True) -> "ChunkStore":
+        src = Path(src_dir)
+        mode = "r" if mmap else None
+        store = cls()
+        n_bytes = (src / "texts.bin").stat().st_size
+        if mmap and n_bytes:
+            store._buf = np.memmap(src / "texts.bin", dtype=np.uint8, mode="r")
+        else:
+            store._buf = np.fromfile(src / "texts.bin", dtype=np.uint8)
+        for name in _ARRAYS:
+            setattr(store, name, np.load(src / f"{name}.npy", mmap_mode=mode))
+        meta = json.loads((src / "meta.json").read_text(encoding="utf-8"))
+        arrays = {name: np.load(src / f"meta_{name}.npy", mmap_mode=mode) for name in MetaStore.ARRAYS}
+        store.columns = MetaStore.restore(arrays, meta["vocab"])
+        store.extras = {int(k): v for k, v in meta["extras"].items()}
+        store.next_id = meta["next_id"]
+        store.mmapped = mmap
+        return store
@@ -0,0 +1,82 @@
+# ragcore/dedup.py
+"""Near-duplicate detection with MinHash signatures and LSH banding.
+
+A chunk's signature (NUM_PERM 32-bit minima over its word set) is computed
+once at ingest and kept in meta["minhash"]. The share of equal positions in
+two signatures estimates the Jaccard similarity of the chunks' word sets.
+NearDupIndex buckets each signature by BANDS slices of it, so a lookup only
+verifies the few signatures that share a bucket instead of every kept chunk:
+expected O(1) per chunk, O(n) to dedupe a list.
+"""
+import hashlib
+import re
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs at Jaccard 0.8 collide with p > 0.999
+DEFAULT_THRESHOLD = 0.8
+
+_WORD_RE = re.compile(r"\w+")  # same words as ingest.tokenize (which imports this module)
+
+_rng = np.random.default_rng(0x5EED)
+# multiply-shift hash family: (a * h + b) mod 2^64, top 32 bits
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+def minhash(text: str) -> np.ndarray:
+    words = set(_WORD_RE.findall(text.lower())) or {""}
+    h = np.fromiter((int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "little")
+                     for w in words), dtype=np.uint64, count=len(words))
+    with np.errstate(over="ignore"):
+        perms = (h[:, None] * _A + _B) >> np.uint64(32)
+    return perms.min(axis=0).astype(np.uint32)
+
+def minhash_hex(text: str) -> str:
+    # JSON-friendly form stored in chunk meta
+    return minhash(text).tobytes().hex()
+
+def signature(chunk: dict) -> np.ndarray:
+    # chunks from older snapshots carry no signature; compute and keep it
+    meta = chunk.setdefault("meta", {})
+    sig = meta.get("minhash")
+    if sig is None:
+        sig = meta["minhash"] = minhash_hex(chunk["text"])
+    return np.frombuffer(bytes.fromhex(sig), dtype=np.uint32)
+
+class NearDupIndex:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._rows = NUM_PERM // BANDS
+        self._buckets = [{} for _ in range(BANDS)]
+
+    def _keys(self, sig: np.ndarray):
+        r = self._rows
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(BANDS)]
+
+    def find(self, sig: np.ndarray):
+        """The item stored with a near-duplicate of `sig`, or None."""
+        for key, buckets in zip(self._keys(sig), self._buckets):
+            for other, item in buckets.get(key, ()):
+                if np.count_nonzero(other == sig) >= self.threshold * NUM_PERM:
+                    return item
+        return None
+
+    def add(self, sig: np.ndarray, item=True):
+        for key, buckets in zip(self._keys(sig), self._buckets):
+            buckets.setdefault(key, []).append((sig, item))
+
+    def add_if_new(self, sig: np.ndarray, item=True) -> bool:
+        """Insert `sig` unless a near-duplicate is already present; True if inserted."""
+        if self.find(sig) is not None:
+            return False
+        self.add(sig, item)
+        return True
+
+def dedupe_chunks(chunks, index: NearDupIndex | None = None):
+    """Yield the chunks that are not near-duplicates of an earlier one (or of
+    anything already in `index`), in input order."""
+    index = index if index is not None else NearDupIndex()
+    for c in chunks:
+        if index.add_if_new(signature(c)):
+            yield c
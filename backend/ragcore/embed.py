@@ -1,38 +1,355 @@
 # ragcore/embed.py
+import logging
+
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from ragcore.cache import LRUCache, normalize_query
+from ragcore.inference import load_model, model_id, set_torch_threads
+from ragcore.chunkstore import ChunkStore
+from ragcore import metrics
+
+log = logging.getLogger(__name__)
+
+# flat = exact search; the rest trade recall for memory/latency (see bench/bench_ann.py)
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "ivfsq")
+# HNSW cannot delete; removed vectors stay in the graph as tombstones until they
+# make up this share of it, then VectorIndex.compacted rebuilds without them
+COMPACT_RATIO = 0.2
+
+def make_faiss_index(index_type: str, dim: int, nlist: int = 1024, pq_m: int = 16, pq_nbits: int = 8,
+                     hnsw_m: int = 32, ef_construction: int = 200):
+    ip = faiss.METRIC_INNER_PRODUCT  # embeddings are L2-normalized, so IP == cosine
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, ip)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    quantizer = faiss.IndexFlatIP(dim)
+    if index_type == "ivf":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, ip)
+    if index_type == "ivfpq":
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits, ip)
+    if index_type == "ivfsq":
+        return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit, ip)
+    raise ValueError(f"Unknown index_type {index_type!r}; expected one of {INDEX_TYPES}")
+
+def train_faiss_index(index_type: str, sample: np.ndarray, **params):
+    """Create and train an index on `sample`. nlist is capped so each IVF list
+    gets ~39 training points; too little data for PQ falls back to flat."""
+    n, dim = sample.shape
+    if index_type.startswith("ivf"):
+        params["nlist"] = max(1, min(params.get("nlist", 1024), n // 39))
+        if index_type == "ivfpq" and n < 2 ** params.get("pq_nbits", 8):
+            log.warning("%d vectors are too few to train PQ; using a flat index", n)
+            index_type = "flat"
+    index = make_faiss_index(index_type, dim, **params)
+    if not index.is_trained:
+        index.train(sample)
+    return index
+
+def with_chunk_ids(index):
+    """Prepare an empty index to be labeled with ChunkStore ids (add_with_ids).
+    IVF indexes store labels natively, and a hashtable direct map makes
+    removal O(removed); flat and HNSW indexes get an IndexIDMap."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+    return faiss.IndexIDMap(index)
+
+def _unwrap(index):
+    # the index under an IndexIDMap, which forwards search parameters to it
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+def filtered_search_params(index, mask: np.ndarray, nprobe: int, ef_search: int):
+    """Per-call FAISS SearchParameters restricting results to labels where `mask` is set.
+    Search-time knobs must be repeated here: params replace the index defaults."""
+    sel = faiss.IDSelectorBitmap(np.packbits(mask, bitorder="little"))
+    if faiss.try_extract_index_ivf(index) is not None:
+        params = faiss.SearchParametersIVF(sel=sel, nprobe=nprobe)
+    elif isinstance(_unwrap(index), faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=sel, efSearch=ef_search)
+    else:
+        params = faiss.SearchParameters(sel=sel)
+    params.referenced_objects = [sel]  # SWIG does not keep the selector alive on its own
+    return params
+
+def set_search_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe is not None:
+        ivf.nprobe = nprobe
+    index = _unwrap(index)
+    if ef_search is not None and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+def index_vectors(index) -> tuple[np.ndarray, np.ndarray]:
+    """(labels, vectors) of everything stored in a with_chunk_ids index; PQ/SQ
+    codes decode lossily."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        labels = np.concatenate([np.zeros(0, dtype=np.int64)] + [
+            faiss.rev_swig_ptr(ivf.invlists.get_ids(lst), ivf.invlists.list_size(lst)).copy()
+            for lst in range(ivf.nlist) if ivf.invlists.list_size(lst)])
+        return labels, index.reconstruct_batch(labels)
+    base = _unwrap(index)
+    return faiss.vector_to_array(index.id_map), base.reconstruct_n(0, base.ntotal)
+
+def _in_memory_invlists(src):
+    """ArrayInvertedLists copy of (e.g. mmapped on-disk) IVF lists."""
+    dst = faiss.ArrayInvertedLists(src.nlist, src.code_size)
+    for lst in range(src.nlist):
+        n = src.list_size(lst)
+        if n:
+            dst.add_entries(lst, n, src.get_ids(lst), src.get_codes(lst))
+    dst.this.disown()  # owned by the index after replace_invlists(..., own=True)
+    return dst
 
 class VectorIndex:
-    def __init__(self, model_name="intfloat/e5-base"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name="intfloat/e5-base", index_type="flat", nprobe=16, ef_search=64,
+                 train_size=None, backend="torch", threads=None, **index_params):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type {index_type!r}; expected one of {INDEX_TYPES}")
+        # backend: torch | onnx | onnx-int8 (see ragcore.inference)
+        self.model = load_model(SentenceTransformer, model_name, backend, threads)
+        self.model_name, self.backend, self.threads = model_name, backend, threads
+        self.model_id = model_id(model_name, backend)
         self.index = None
-        self.store = []   # parallel array of chunks
+        self.store = ChunkStore()  # chunk texts + metadata; FAISS labels are its ids
+        # bumped on every mutation; result caches downstream key on it
+        self.version = 0
+        # query embeddings depend only on the model, so they survive index changes
+        self.query_cache = LRUCache(maxsize=2048, ttl=None, name="query_embedding")
+        self.index_type, self.index_params = index_type, index_params
+        self.nprobe, self.ef_search = nprobe, ef_search
+        # IVF variants buffer this many vectors, then train on them (see finalize)
+        self.train_size = train_size or 64 * index_params.get("nlist", 1024)
+        self._pending = []  # (vectors, chunk ids) awaiting training
+        self._mmapped = False
+
+    def after_fork(self, threads: int | None = None):
+        """Per-worker setup after a fork (gunicorn --preload). torch weights stay
+        shared copy-on-write; an ONNX Runtime session owns a thread pool that does
+        not survive fork, so non-torch backends load their own session."""
+        self.threads = threads or self.threads
+        if self.backend == "torch":
+            if threads:
+                set_torch_threads(threads)  # process-wide
+        else:
+            self.model = load_model(SentenceTransformer, self.model_name, self.backend, self.threads)
+
+    @property
+    def columns(self):
+        # columnar metadata for pre-filtering (see ragcore.metastore)
+        return self.store.columns
+
+    @property
+    def spec(self) -> str:
+        # build-time identity of the index, recorded in the snapshot manifest
+        return ",".join([self.index_type] + [f"{k}={v}" for k, v in sorted(self.index_params.items())])
+
+    def set_search_params(self, nprobe: int | None = None, ef_search: int | None = None):
+        self.nprobe = nprobe if nprobe is not None else self.nprobe
+        self.ef_search = ef_search if ef_search is not None else self.ef_search
+        if self.index is not None:
+            set_search_params(self.index, self.nprobe, self.ef_search)
 
     def _embed(self, texts: list[str]) -> np.ndarray:
         # e5 expects "query: ..." / "passage: ..." convention
         return np.array(self.model.encode(texts, normalize_embeddings=True))
 
-    def build(self, chunks: list[dict]):
-        self.store = chunks
-        texts = [f"passage: {c['text']}" for c in chunks if 'text' in c and c['text']]
-        if not texts:
-            self.index = None
+    def build(self, chunks: list[dict], batch_size: int = 256):
+        # encode and add batch by batch so we never hold a corpus-sized float matrix
+        self.store = ChunkStore()
+        self.index = None
+        self._pending = []
+        self.version += 1
+        chunks = [c for c in chunks if c.get('text')]
+        for i in range(0, len(chunks), batch_size):
+            self.add(chunks[i:i + batch_size])
+        self.finalize()
+
+    def encode_passages(self, chunks: list[dict]) -> np.ndarray:
+        return self._embed([f"passage: {c['text']}" for c in chunks]).astype('float32')
+
+    def add_vectors(self, vecs: np.ndarray, chunks: list[dict]):
+        # callers encode first (slow) and only hold their write lock for this part
+        self._ensure_writable()
+        self.store.extend(chunks)
+        ids = self.store.ids[len(self.store) - len(chunks):]
+        self.version += 1
+        if self.index is None and self.index_type in ("flat", "hnsw"):
+            self.index = with_chunk_ids(make_faiss_index(self.index_type, vecs.shape[1], **self.index_params))
+            set_search_params(self.index, self.nprobe, self.ef_search)
+        if self.index is None:
+            # untrained IVF: hold vectors back until there is a training sample
+            self._pending.append((vecs, ids))
+            if sum(len(v) for v, _ in self._pending) >= self.train_size:
+                self.finalize()
             return
+        self.index.add_with_ids(vecs, ids)
+
+    def finalize(self):
+        """Train on (and add) any buffered vectors. Call after the last add of a
+        build; vectors still pending are not searchable."""
+        if not self._pending:
+            return
+        sample = np.vstack([v for v, _ in self._pending])
+        ids = np.concatenate([i for _, i in self._pending])
+        self._pending = []
+        self.index = with_chunk_ids(train_faiss_index(self.index_type, sample, **self.index_params))
+        set_search_params(self.index, self.nprobe, self.ef_search)
+        self.index.add_with_ids(sample, ids)
+
+    def add(self, chunks: list[dict]):
+        if chunks:
+            self.add_vectors(self.encode_passages(chunks), chunks)
+
+    def remove(self, rows: list[int]):
+        """Drop store rows and their vectors. Nothing is re-encoded: IVF lists
+        and flat indexes delete by label, HNSW leaves tombstones (see compacted)."""
+        if not rows or self.index is None:
+            return
+        self._ensure_writable()
+        labels = np.ascontiguousarray(self.store.ids[np.asarray(rows, dtype=np.int64)])
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            # the hashtable direct map only accepts an explicit id array
+            self.index.remove_ids(faiss.IDSelectorArray(len(labels), faiss.swig_ptr(labels)))
+        elif not isinstance(_unwrap(self.index), faiss.IndexHNSW):
+            self.index.remove_ids(labels)
+        self.store.remove(rows)
+        self.version += 1
+
+    @property
+    def tombstones(self) -> int:
+        # vectors of removed chunks still in an HNSW graph
+        return self.index.ntotal - len(self.store) if self.index is not None else 0
+
+    def compacted(self):
+        """(HNSW index rebuilt from the live vectors, version it reflects), or None
+        while tombstones are under COMPACT_RATIO. Reads but never mutates the
+        current index, so it can run outside the caller's write lock as long as
+        writers are serialized; hand the result to `swap_index` under the lock."""
+        if self.index is None or self.tombstones <= COMPACT_RATIO * self.index.ntotal:
+            return None
+        version = self.version
+        labels, vecs = index_vectors(self.index)
+        live = np.isin(labels, self.store.ids)
+        fresh = with_chunk_ids(make_faiss_index(self.index_type, vecs.shape[1], **self.index_params))
+        fresh.add_with_ids(vecs[live], labels[live])
+        set_search_params(fresh, self.nprobe, self.ef_search)
+        log.info("Compacted HNSW index: dropped %d tombstones", int((~live).sum()))
+        return fresh, version
+
+    def swap_index(self, index, version: int) -> bool:
+        """Install a `compacted` index unless the store changed since it was built."""
+        if version != self.version:
+            return False
+        self.index = index
+        self._mmapped = False
+        self.version += 1
+        return True
+
+    def _ensure_writable(self):
+        # an mmapped snapshot index is read-only; copy it into memory before the first write
+        if self._mmapped and self.index is not None:
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                # IVF lists are OnDiskInvertedLists over the read-only file, which even
+                # serialize/clone try to reopen r+; copy them into ArrayInvertedLists
+                ivf.replace_invlists(_in_memory_invlists(ivf.invlists), True)
+            else:
+                self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            set_search_params(self.index, self.nprobe, self.ef_search)
+        self._mmapped = False
+
+    def attach(self, index, chunks, mmapped: bool = False):
+        # reuse a prebuilt/persisted FAISS index (and ChunkStore) instead of re-encoding
+        self.store = chunks if isinstance(chunks, ChunkStore) else ChunkStore(chunks)
+        self.index = index
+        self._pending = []
+        self._mmapped = mmapped
+        if index is not None:
+            set_search_params(index, self.nprobe, self.ef_search)
+        self.version += 1
+
+    def embed_query(self, query: str) -> np.ndarray:
+        key = normalize_query(query)
+        q = self.query_cache.get(key)
+        if q is None:
+            with metrics.timer("embed"):
+                q = self._embed([f"query: {query}"]).astype('float32')
+            self.query_cache.put(key, q)
+        return q
+
+    def embed_queries(self, queries: list[str]) -> np.ndarray:
+        """(n, dim) query matrix; cache misses are encoded in a single model call."""
+        keys = [normalize_query(q) for q in queries]
+        rows = [self.query_cache.get(k) for k in keys]
+        todo = [i for i, r in enumerate(rows) if r is None]
+        if todo:
+            with metrics.timer("embed"):
+                fresh = self._embed([f"query: {queries[i]}" for i in todo]).astype('float32')
+            for j, i in enumerate(todo):
+                rows[i] = fresh[j:j + 1]
+                self.query_cache.put(keys[i], rows[i])
+        return np.vstack(rows)
+
+    def _label_mask(self, mask: np.ndarray | None) -> np.ndarray:
+        # row mask -> mask over chunk ids, the labels FAISS selectors see
+        labels = np.zeros(self.store.next_id, dtype=bool)
+        labels[self.store.ids if mask is None else self.store.ids[mask]] = True
+        return labels
+
+    @metrics.timed("faiss")
+    def _search(self, q: np.ndarray, top_k: int, mask: np.ndarray | None):
+        if mask is None and not self.tombstones:
+            return self.index.search(q, top_k)
+        # filtered, or an HNSW graph holding removed chunks that must not surface
+        labels = self._label_mask(mask)
+        params = filtered_search_params(self.index, labels, self.nprobe, self.ef_search)
+        sims, ids = self.index.search(q, top_k, params=params)
+        want = min(top_k, len(self.store) if mask is None else int(mask.sum()))
+        if (ids[:, :want] < 0).any():
+            # a selective filter can starve the probed lists / graph walk; widen once
+            ivf = faiss.try_extract_index_ivf(self.index)
+            wide = filtered_search_params(self.index, labels, ivf.nlist if ivf is not None else self.nprobe,
+                                          max(self.ef_search, top_k) * 8)
+            sims, ids = self.index.search(q, top_k, params=wide)
+        return sims, ids
+
+    def _valid(self, sims: np.ndarray, labels: np.ndarray):
+        """(store rows, similarities) of the hits; ids are ascending in the store."""
+        keep = labels >= 0
+        labels, sims = labels[keep], sims[keep]
+        rows = np.searchsorted(self.store.ids, labels)
+        keep = rows < len(self.store)
+        keep[keep] = self.store.ids[rows[keep]] == labels[keep]
+        return rows[keep].astype(np.int64), sims[keep]
+
+    def _empty(self, mask) -> bool:
+        return self.index is None or len(self.store) == 0 or (mask is not None and not mask.any())
+
+    def search_ids(self, query: str, top_k: int = 20, mask: np.ndarray | None = None):
+        """(row ids, similarities), best first; `mask` (bool per row, see
+        MetaStore.mask) pre-filters candidates."""
+        if self._empty(mask):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        sims, ids = self._search(self.embed_query(query), top_k, mask)
+        return self._valid(sims[0], ids[0])
+
+    def search_many_ids(self, queries: list[str], top_k: int = 20, mask: np.ndarray | None = None):
+        # one encode call and one FAISS search over the whole query matrix
+        if not queries or self._empty(mask):
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        sims, ids = self._search(self.embed_queries(queries), top_k, mask)
+        return [self._valid(sims[r], ids[r]) for r in range(len(queries))]
+
+    def search(self, query: str, top_k: int = 20, mask: np.ndarray | None = None):
+        ids, sims = self.search_ids(query, top_k, mask)
+        return [{"score": float(s), "chunk": self.store[i]} for i, s in zip(ids, sims)]
 
-        vecs = self._embed(texts).astype('float32')
-        self.index = faiss.IndexFlatIP(vecs.shape[1])
-        self.index.add(vecs)
-
-    def search(self, query: str, top_k: int = 20):
-        if self.index is None or len(self.store) == 0:
-            return []
-        q = self._embed([f"query: {query}"]).astype('float32')
-        sims, ids = self.index.search(q, top_k)
-        if sims.shape[0] == 0 or ids.shape[0] == 0:
-            return []
-        results = [
-            {"score": float(sims[0][i]), "chunk": self.store[idx]}
-            for i, idx in enumerate(ids[0]) if idx < len(self.store)
-    ]
-        return results
\ No newline at end of file
+    def search_many(self, queries: list[str], top_k: int = 20, mask: np.ndarray | None = None) -> list[list[dict]]:
+        return [[{"score": float(s), "chunk": self.store[i]} for i, s in zip(ids, sims)]
+                for ids, sims in self.search_many_ids(queries, top_k, mask)]
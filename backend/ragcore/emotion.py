@@ -0,0 +1,166 @@
+# ragcore/emotion.py
+"""Facial emotion recognition for /process-image, on DeepFace's detector and
+emotion model.
+
+`DeepFace.analyze` per request loads both models on first use and runs one
+forward pass per frame on the full-resolution image. EmotionAnalyzer instead
+loads and warms them up front (`load`), shrinks each frame so its longest
+side is `max_side` before face detection (webcam faces stay far larger than
+the model's 48x48 input), and hands frames to a MicroBatcher, so frames from
+concurrent clients share one forward pass of the emotion model. Results
+have the same shape as DeepFace.analyze's, with regions in the caller's
+frame coordinates.
+
+TensorFlow does not survive fork, so nothing is loaded in the constructor:
+under gunicorn --preload every worker calls `load` itself (rag_api.init_worker).
+Both models only ever run on the batcher thread.
+"""
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from ragcore.batching import MicroBatcher
+from ragcore import metrics
+
+log = logging.getLogger(__name__)
+
+# output order of DeepFace's emotion model
+LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+INPUT_SIZE = 48  # the emotion model takes 48x48 grayscale faces
+
+def downscale(img: np.ndarray, max_side: int) -> tuple[np.ndarray, float]:
+    """(frame with its longest side at most `max_side`, factor back to the input)."""
+    h, w = img.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return img, 1.0
+    scale = max_side / max(h, w)
+    small = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    return small, 1 / scale
+
+def _build_emotion_model():
+    from deepface import DeepFace
+
+    try:
+        client = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+    except TypeError:  # deepface < 0.0.90
+        client = DeepFace.build_model("Emotion")
+    # the keras model itself, so a whole batch goes through one predict call
+    return getattr(client, "model", client)
+
+def _set_tf_threads(threads: int):
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:  # runtime already initialized in this process
+        log.warning("TensorFlow already initialized; emotion model thread cap not applied")
+
+class EmotionAnalyzer:
+    def __init__(self, detector_backend: str = "opencv", max_side: int = 320, batching: bool = True,
+                 max_batch_size: int = 16, max_wait_ms: float = 10.0, threads: int | None = None):
+        self.detector_backend, self.max_side, self.threads = detector_backend, max_side, threads
+        self.batching, self.max_batch_size, self.max_wait_ms = batching, max_batch_size, max_wait_ms
+        self.model = None
+        self.batcher = None
+        self._load_lock = threading.Lock()
+        # without batching, frames still run one at a time: the models are not thread-safe
+        self._predict_lock = threading.Lock()
+
+    def load(self, threads: int | None = None):
+        """Load and warm the detector and the emotion model in this process."""
+        with self._load_lock:
+            if self.model is not None:
+                return
+            t0 = time.perf_counter()
+            self.threads = threads or self.threads
+            if self.threads:
+                _set_tf_threads(self.threads)
+            self.model = _build_emotion_model()
+            if self.batching:
+                self.batcher = MicroBatcher(self._predict, max_batch_size=self.max_batch_size,
+                                            max_wait_ms=self.max_wait_ms, length_key=lambda _: 0,
+                                            name="emotion-batcher")
+            # a blank frame initializes the detector and traces the model graph, on
+            # the thread that will run them
+            blank = [np.zeros((self.max_side or 320, self.max_side or 320, 3), dtype=np.uint8)]
+            if self.batcher is not None:
+                self.batcher(blank)
+            else:
+                with self._predict_lock:
+                    self._predict(blank)
+            log.info("Emotion models (%s detector) loaded in %.2fs", self.detector_backend, time.perf_counter() - t0)
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def _faces(self, frame: np.ndarray) -> list[dict]:
+        from deepface import DeepFace
+
+        # enforce_detection=False: no face found yields the whole frame, as in DeepFace.analyze
+        return DeepFace.extract_faces(frame, detector_backend=self.detector_backend,
+                                      enforce_detection=False, align=True)
+
+    @staticmethod
+    def _model_input(face: np.ndarray) -> np.ndarray:
+        """48x48 grayscale model input. Like DeepFace.analyze, the face crop is
+        centered on a black square before resizing, so its aspect ratio is kept;
+        DeepFace pads onto a 224x224 canvas first, which only differs by
+        interpolation (bench/check_emotion_parity.py)."""
+        # DeepFace hands out RGB faces scaled to [0, 1]; the model was trained on grayscale
+        bgr = np.ascontiguousarray(face[:, :, ::-1], dtype=np.float32)
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        h, w = gray.shape
+        side = max(h, w)
+        top, left = (side - h) // 2, (side - w) // 2
+        square = cv2.copyMakeBorder(gray, top, side - h - top, left, side - w - left, cv2.BORDER_CONSTANT, value=0)
+        return cv2.resize(square, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA)
+
+    def _predict(self, frames: list[np.ndarray]) -> list[list[dict]]:
+        """Detect faces in each (already downscaled) frame, then score every face
+        of every frame in one forward pass."""
+        with metrics.timer("emotion_detect"):
+            per_frame = [self._faces(f) for f in frames]
+        faces = [f for found in per_frame for f in found]
+        metrics.count("emotion_frames", len(frames))
+        metrics.count("emotion_faces", len(faces))
+        if not faces:
+            return [[] for _ in frames]
+        batch = np.stack([self._model_input(f["face"]) for f in faces])[..., None]
+        with metrics.timer("emotion_model"):
+            probs = np.asarray(self.model.predict(batch, verbose=0, batch_size=len(batch)), dtype=np.float64)
+        out, i = [], 0
+        for found in per_frame:
+            out.append([{"face": f, "probs": p} for f, p in zip(found, probs[i:i + len(found)])])
+            i += len(found)
+        return out
+
+    def analyze(self, img: np.ndarray) -> list[dict]:
+        """DeepFace.analyze(img, actions=['emotion'], enforce_detection=False)
+        equivalent: one dict per face, largest detection confidence first."""
+        if self.model is None:
+            self.load()
+        small, scale = downscale(img, self.max_side)
+        if self.batcher is not None:
+            found = self.batcher([small])[0]
+        else:
+            with self._predict_lock:
+                found = self._predict([small])[0]
+        out = []
+        for hit in found:
+            pct = 100 * hit["probs"] / (hit["probs"].sum() or 1.0)
+            area = hit["face"].get("facial_area", {})
+            region = {k: round(v * scale) if isinstance(v, (int, float)) else v
+                      for k, v in area.items() if k in ("x", "y", "w", "h")}
+            out.append({"emotion": {label: float(p) for label, p in zip(LABELS, pct)},
+                        "dominant_emotion": LABELS[int(np.argmax(pct))],
+                        "region": region, "face_confidence": float(hit["face"].get("confidence", 0.0))})
+        out.sort(key=lambda r: -r["face_confidence"])
+        return out
+
+    def stats(self) -> dict:
+        return self.batcher.stats() if self.batcher is not None else {}
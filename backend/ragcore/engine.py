@@ -0,0 +1,66 @@
+# ragcore/engine.py
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class Engine:
+    """Shared thread pool for overlapping pipeline stages within a request.
+
+    FAISS, NumPy and the torch models release the GIL, so e.g. the dense and
+    lexical branches of a retrieval genuinely run in parallel. Work submitted
+    here must not itself wait on other engine tasks (leaf tasks only), which
+    rules out pool starvation. Per-stage timing and queue depth are kept for
+    monitoring.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ragcore")
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def after_fork(self):
+        # a forked child inherits the pool's bookkeeping but none of its threads
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ragcore")
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def _stage(self, name: str) -> dict:
+        return self._stages.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                              "queued": 0, "running": 0})
+
+    def _track(self, name: str, fn, args, kwargs, queued: bool = False):
+        with self._lock:
+            st = self._stage(name)
+            if queued:
+                st["queued"] -= 1
+            st["running"] += 1
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                st["running"] -= 1
+                st["calls"] += 1
+                st["seconds"] += dt
+                st["max_seconds"] = max(st["max_seconds"], dt)
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            self._stage(name)["queued"] += 1
+        # run in a copy of the caller's context so a per-request trace (ragcore.metrics) follows
+        ctx = contextvars.copy_context()
+        return self.pool.submit(ctx.run, self._track, name, fn, args, kwargs, True)
+
+    def run(self, name: str, fn, *args, **kwargs):
+        """Run `fn` inline on the calling thread, timed under `name`."""
+        return self._track(name, fn, args, kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: {**st, "mean_seconds": st["seconds"] / st["calls"] if st["calls"] else 0.0}
+                    for name, st in self._stages.items()}
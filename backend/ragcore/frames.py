@@ -0,0 +1,147 @@
+# ragcore/frames.py
+"""Webcam frame ingestion for /process-image and /ws/frames.
+
+Frames arrive as raw JPEG/PNG bytes (a binary request body, a multipart
+file or WebSocket messages); `decode_frame` views them with np.frombuffer
+and hands that straight to cv2.imdecode, so the only copy is the decoded
+image. The base64 data-URL JSON body is still understood (`data_url_bytes`);
+`frame_bytes` picks the payload out of any of these request shapes.
+
+A client that sends faster than inference keeps up should only have its
+newest frame analyzed. LatestFrameGate runs one frame per client at a time
+and drops any frame superseded while it waited; FrameSlot is the same idea
+for a WebSocket connection, a one-frame mailbox a newer frame overwrites.
+"""
+import base64
+import threading
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+DATA_URL_HEADERS = ("data:image/png;base64", "data:image/jpeg;base64")
+
+def decode_frame(buf, reduce: int = 1) -> np.ndarray | None:
+    """BGR image from encoded bytes (bytes, bytearray or memoryview), or None.
+    reduce=2/4/8 decodes JPEGs at 1/n scale, far cheaper than decoding in full
+    and resizing afterwards."""
+    if not buf:
+        return None
+    flags = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+             8: cv2.IMREAD_REDUCED_COLOR_8}.get(reduce, cv2.IMREAD_COLOR)
+    return cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), flags)
+
+def data_url_bytes(data_url: str) -> bytes:
+    """Payload of a base64 image data URL. Only the header is inspected; no
+    regex runs over the multi-megabyte payload."""
+    header, sep, payload = data_url.partition(",")
+    if not sep or header not in DATA_URL_HEADERS:
+        raise ValueError("Invalid image data")
+    return base64.b64decode(payload)
+
+def frame_bytes(request) -> bytes | None:
+    """Encoded image of a Flask frame request: a binary body (image/jpeg,
+    image/png or application/octet-stream), a multipart 'image' file (else the
+    first file), or the legacy JSON {"image": <base64 data URL>}. None if there
+    is none; ValueError if malformed."""
+    mimetype = request.mimetype
+    if mimetype.startswith("image/") or mimetype == "application/octet-stream":
+        return request.get_data(cache=False)
+    if mimetype == "multipart/form-data":
+        file = request.files.get("image") or next(iter(request.files.values()), None)
+        return file.read() if file else None
+    image_data = (request.get_json(silent=True) or {}).get("image")
+    return data_url_bytes(image_data) if image_data else None
+
+class LatestFrameGate:
+    """Per-client "newest frame wins" admission in front of a slow analyzer.
+
+        with gate.newest(client_id) as admitted:
+            if not admitted:
+                ...  # a newer frame from this client replaced this one
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._clients = {}  # client -> {"seq": newest frame, "busy": analyzing, "waiting": n}
+        self.admitted = self.dropped = 0
+
+    def _admit(self, client) -> bool:
+        with self._cond:
+            st = self._clients.setdefault(client, {"seq": 0, "busy": False, "waiting": 0})
+            st["seq"] += 1
+            seq = st["seq"]
+            self._cond.notify_all()  # older frames still waiting are now stale
+            st["waiting"] += 1
+            while st["busy"] and st["seq"] == seq:
+                self._cond.wait()
+            st["waiting"] -= 1
+            if st["seq"] != seq:
+                self.dropped += 1
+                self._forget(client, st)
+                return False
+            st["busy"] = True
+            self.admitted += 1
+            return True
+
+    def _release(self, client):
+        with self._cond:
+            st = self._clients[client]
+            st["busy"] = False
+            self._forget(client, st)
+            self._cond.notify_all()
+
+    def _forget(self, client, st: dict):
+        # idle clients take no memory; sequence numbers only matter between live frames
+        if not st["busy"] and not st["waiting"]:
+            del self._clients[client]
+
+    @contextmanager
+    def newest(self, client):
+        admitted = self._admit(client)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self._release(client)
+
+    def slot(self) -> "FrameSlot":
+        return FrameSlot(self)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"admitted": self.admitted, "dropped": self.dropped, "clients": len(self._clients)}
+
+class FrameSlot:
+    """One-frame mailbox for a streaming connection: `put` overwrites a frame
+    nobody has taken yet (counted as dropped on `gate`), `get` blocks for the
+    next one and returns None once the slot is closed and drained."""
+
+    def __init__(self, gate: LatestFrameGate | None = None):
+        self.gate = gate
+        self._cond = threading.Condition()
+        self._frame = None
+        self._closed = False
+
+    def put(self, frame):
+        with self._cond:
+            if self._frame is not None and self.gate is not None:
+                with self.gate._cond:
+                    self.gate.dropped += 1
+            self._frame = frame
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def get(self):
+        with self._cond:
+            while self._frame is None and not self._closed:
+                self._cond.wait()
+            frame, self._frame = self._frame, None
+        if frame is not None and self.gate is not None:
+            with self.gate._cond:
+                self.gate.admitted += 1
+        return frame
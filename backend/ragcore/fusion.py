@@ -0,0 +1,74 @@
+# ragcore/fusion.py
+"""Rank fusion over (chunk ids, scores) arrays from several retrievers.
+
+Every method merges duplicate ids into one fused score, so a chunk found by
+both dense and lexical search appears once. Methods:
+
+    zscore    max of the per-list z-scores (HybridRetriever's original scoring)
+    weighted  sum of weight * z-score over the lists that found the id
+    convex    sum of weight * min-max score, weights normalized to sum to 1
+              (two lists: alpha * dense + (1 - alpha) * lexical)
+    rrf       Reciprocal Rank Fusion: sum of weight / (rrf_k + rank)
+"""
+import numpy as np
+
+METHODS = ("zscore", "weighted", "convex", "rrf")
+
+def _zscore(s: np.ndarray, n: int = 0) -> np.ndarray:
+    # statistics over `s` padded with zero scores up to `n` entries
+    pad = max(0, n - len(s))
+    if not pad:
+        return (s - s.mean()) / (s.std() + 1e-6)
+    total = len(s) + pad
+    mean = s.sum() / total
+    std = np.sqrt(((s - mean) ** 2).sum() / total + pad * mean ** 2 / total)
+    return (s - mean) / (std + 1e-6)
+
+def _minmax(s: np.ndarray, n: int = 0) -> np.ndarray:
+    lo = min(s.min(), 0.0) if n > len(s) else s.min()
+    span = s.max() - lo
+    return (s - lo) / span if span > 0 else np.ones_like(s)
+
+def fuse(lists: list[tuple[np.ndarray, np.ndarray]], method: str = "zscore", weights=None,
+         rrf_k: int = 60, top_k: int | None = None, pad_to=None) -> tuple[np.ndarray, np.ndarray]:
+    """Fuse ranked lists of (ids, scores), each sorted best first. Returns
+    (unique ids, fused scores), best first, cut to `top_k` when given.
+
+    `pad_to` gives per list the length it is normalized as (None to skip):
+    a list shorter than that is scored as if padded with zero-score entries.
+    BM25 only returns documents that match a query term, and a lone exact
+    match must still stand out rather than normalize to z=0."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown fusion method {method!r}; expected one of {METHODS}")
+    weights = np.ones(len(lists)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if method == "convex":
+        weights = weights / weights.sum()
+    pad_to = [None] * len(lists) if pad_to is None else pad_to
+    ids, parts = [], []
+    for (lid, ls), w, n in zip(lists, weights, pad_to):
+        if not len(lid):
+            continue
+        ls = np.asarray(ls, dtype=np.float64)
+        if method == "rrf":
+            part = w / (rrf_k + np.arange(1, len(lid) + 1))
+        elif method == "convex":
+            part = w * _minmax(ls, n or 0)
+        else:
+            part = w * _zscore(ls, n or 0)
+        ids.append(np.asarray(lid, dtype=np.int64))
+        parts.append(part)
+    if not ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    ids, parts = np.concatenate(ids), np.concatenate(parts)
+    uniq, inv = np.unique(ids, return_inverse=True)
+    if method == "zscore":
+        fused = np.full(len(uniq), -np.inf)
+        np.maximum.at(fused, inv, parts)
+    else:
+        fused = np.bincount(inv, weights=parts, minlength=len(uniq))
+    if top_k is not None and len(uniq) > top_k:
+        part = np.argpartition(-fused, top_k - 1)[:top_k]
+    else:
+        part = np.arange(len(uniq))
+    part = part[np.argsort(-fused[part], kind="stable")]
+    return uniq[part], fused[part]
@@ -1,6 +1,9 @@
 # ragcore/generate.py
 import os
+import threading
+import time
 from openai import OpenAI
+from ragcore import metrics
 
 SYSTEM = """You are a precise assistant. 
 - Use ONLY provided context to answer.
@@ -16,13 +19,49 @@ def build_prompt(query: str, context_chunks: list[  dict]):
     user = f"Question: {query}\n\nContext:\n{ctx_txt}\n\nAnswer with citations like [1], [2]."
     return SYSTEM, user
 
-def call_llm(query: str, context_chunks: list[dict], model="gpt-4o-mini"):
-    client = OpenAI(api_key="OPENAI_API_KEY")
-    system, user = build_prompt(query, context_chunks)
-    resp = client.chat.completions.create(
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> OpenAI:
+    # one pooled client per process: reuses HTTP connections across requests.
+    # OPENAI_BASE_URL points it at any OpenAI-compatible server (e.g. bench/mock_openai.py)
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", "OPENAI_API_KEY"),
+                                 base_url=os.getenv("OPENAI_BASE_URL") or None)
+    return _client
+
+def _messages(query: str, context_chunks: list[dict], prompt=None):
+    system, user = prompt or build_prompt(query, context_chunks)
+    return [{"role":"system","content":system},
+            {"role":"user","content":user}]
+
+@metrics.timed("llm")
+def call_llm(query: str, context_chunks: list[dict], model="gpt-4o-mini", prompt=None):
+    # `prompt` is an already built (system, user) pair for these chunks, if any
+    resp = get_client().chat.completions.create(
         model=model,
-        messages=[{"role":"system","content":system},
-                  {"role":"user","content":user}],
+        messages=_messages(query, context_chunks, prompt),
         temperature=0.2,
     )
     return resp.choices[0].message.content
+
+def stream_llm(query: str, context_chunks: list[dict], model="gpt-4o-mini", prompt=None):
+    """Yield answer text deltas as the model produces them. Records time to the
+    first delta ("llm_first_token") and to the end of the stream ("llm_stream")."""
+    t0, first = time.perf_counter(), True
+    with metrics.timer("llm_stream"):
+        stream = get_client().chat.completions.create(
+            model=model,
+            messages=_messages(query, context_chunks, prompt),
+            temperature=0.2,
+            stream=True,
+        )
+        for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                if first:
+                    metrics.observe("llm_first_token", time.perf_counter() - t0, t0)
+                    first = False
+                yield event.choices[0].delta.content
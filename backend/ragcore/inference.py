@@ -0,0 +1,70 @@
+# ragcore/inference.py
+"""Pluggable CPU inference backends for the embedding and rerank models.
+
+    torch      full-precision PyTorch (the default)
+    onnx       ONNX Runtime, fp32
+    onnx-int8  ONNX Runtime with int8 dynamic quantization
+
+int8 models are exported once into `MODEL_DIR` and reused afterwards. Use
+bench/bench_inference.py to check parity and latency/memory before switching
+production to a non-torch backend.
+"""
+import logging
+import os
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+MODEL_DIR = Path(os.getenv("RAG_MODEL_DIR", Path(__file__).resolve().parents[1] / "data" / "models"))
+
+def model_id(name: str, backend: str = "torch") -> str:
+    # recorded in the snapshot manifest: int8 embeddings are not the fp32 ones
+    return name if backend == "torch" else f"{name}@{backend}"
+
+def set_torch_threads(threads: int):
+    import torch
+
+    torch.set_num_threads(threads)
+
+def _session_options(threads: int | None):
+    import onnxruntime as ort
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+    return opts
+
+def _quantized(cls, name: str, quantization: str) -> tuple[str, str]:
+    """(local model dir, onnx file name) of the int8 export of `name`, exporting on first use."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    local = MODEL_DIR / name.replace("/", "__")
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not (local / file_name).exists():
+        log.info("Exporting int8 (%s) ONNX model for %s to %s", quantization, name, local)
+        model = cls(name, backend="onnx")
+        model.save_pretrained(str(local))
+        export_dynamic_quantized_onnx_model(model, quantization, str(local))
+    return str(local), file_name
+
+def load_model(cls, name: str, backend: str = "torch", threads: int | None = None,
+               quantization: str = "avx2"):
+    """Instantiate `cls` (SentenceTransformer or CrossEncoder) on `backend`.
+
+    `threads` caps intra-op threads: per session for ONNX Runtime, process-wide
+    for torch. `quantization` is the int8 kernel target (avx2, avx512,
+    avx512_vnni or arm64).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+    if backend == "torch":
+        if threads:
+            set_torch_threads(threads)
+        return cls(name)
+    kwargs = {"provider": "CPUExecutionProvider", "session_options": _session_options(threads)}
+    if backend == "onnx-int8":
+        name, kwargs["file_name"] = _quantized(cls, name, quantization)
+    return cls(name, backend="onnx", model_kwargs=kwargs)
@@ -1,6 +1,13 @@
 # ragcore/ingest.py
+import logging
+import re
 from pathlib import Path
 from unstructured.partition.auto import partition
+from ragcore.dedup import NearDupIndex, dedupe_chunks, minhash_hex
+from ragcore.tokens import count_tokens
+
+log = logging.getLogger(__name__)
+
 try:
     from nltk.tokenize import sent_tokenize as _nltk_sent_tokenize
     def sent_tokenize(text: str):
@@ -14,12 +21,44 @@ except Exception:
     def sent_tokenize(text: str):
         return [s.strip() for s in text.replace("\r", "\n").split("\n") if s.strip()]
 
+SUPPORTED_SUFFIXES = {".pdf", ".docx", ".html", ".md", ".txt"}
+
+_WORD_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> list[str]:
+    # lexical tokens for BM25; queries and chunks must go through the same function
+    return _WORD_RE.findall(text.lower())
+
 def clean_text(txt: str) -> str:
     # drop boilerplate, normalize whitespace, fix OCR quirks
     lines = [l.strip() for l in txt.splitlines()]
     txt = "\n".join(l for l in lines if l)
     return txt
 
+def pdf_page_texts(path: Path, start: int = 0, stop: int | None = None) -> list[str]:
+    """Non-empty PyPDF2 page texts for pages [start, stop). Raises ImportError
+    when PyPDF2 is not installed."""
+    import PyPDF2  # type: ignore
+    txt_parts = []
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for page in reader.pages[start:stop]:
+            try:
+                t = page.extract_text() or ""
+            except Exception:
+                t = ""
+            if t:
+                txt_parts.append(t)
+    return txt_parts
+
+def pdf_num_pages(path: Path) -> int:
+    try:
+        import PyPDF2  # type: ignore
+        with open(path, "rb") as f:
+            return len(PyPDF2.PdfReader(f).pages)
+    except Exception:
+        return 0
+
 def parse_to_text(path: Path) -> str:
     """Extract text from common document types.
 
@@ -30,18 +69,7 @@ def parse_to_text(path: Path) -> str:
     if suffix == ".pdf":
         # Try lightweight PyPDF2 first
         try:
-            import PyPDF2  # type: ignore
-            txt_parts = []
-            with open(path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    try:
-                        t = page.extract_text() or ""
-                    except Exception:
-                        t = ""
-                    if t:
-                        txt_parts.append(t)
-            return clean_text("\n".join(txt_parts))
+            return clean_text("\n".join(pdf_page_texts(path)))
         except ImportError:
             # Fall back to unstructured; may raise if poppler not installed
             try:
@@ -76,26 +104,93 @@ def chunk_text(txt: str, max_tokens=500, overlap=80) -> list[dict]:
     # add metadata now; you can enrich later (author, section, dates)
     return [{"text": c, "meta": {}} for c in chunks]
 
-def ingest_dir(raw_dir: str) -> list[dict]:
+def chunk_file(p: Path, txt: str) -> list[dict]:
+    if not txt:
+        log.warning("Skipping %s: no text extracted", p)
+        return []
+    chunks = chunk_text(txt)
+    for ch in chunks:
+        ch["meta"].update({"source_path": str(p), "filename": p.name,
+                           # near-duplicate signature (see ragcore.dedup), computed once here
+                           "minhash": minhash_hex(ch["text"]),
+                           # LLM tokens, for context packing (see ragcore.orchestrate.pack_context)
+                           "n_tokens": count_tokens(ch["text"])})
+    return chunks
+
+def ingest_file(p: Path) -> list[dict]:
+    return chunk_file(p, parse_to_text(p))
+
+# --- parallel ingestion ------------------------------------------------------
+# Worker entry points take plain str paths so they pickle cheaply under spawn.
+
+def _ingest_task(path: str) -> list[dict]:
+    return ingest_file(Path(path))
+
+def _pages_task(path: str, start: int, stop: int) -> list[str]:
+    return pdf_page_texts(Path(path), start, stop)
+
+def iter_ingest_parallel(files: list[Path], workers: int | None = None, pages_per_task: int = 40,
+                         max_pending: int | None = None):
+    """Yield chunks for `files` in the same order as the serial path, parsing
+    and chunking across a process pool. PDFs longer than `pages_per_task` are
+    split into page ranges so one large manual does not serialize the run.
+    At most `max_pending` files (default 2x workers) are in flight, so a slow
+    consumer holds back parsing instead of buffering the corpus."""
+    import os
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+
+    def drain(p, job):
+        if not isinstance(job, list):
+            yield from job.result()
+            return
+        # stitch page ranges back together; chunking is cheap next to PDF parsing
+        parts = []
+        for f in job:
+            parts.extend(f.result())
+        yield from chunk_file(p, clean_text("\n".join(parts)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()  # per file, in input order: a future or a list of page-range futures
+        for p in files:
+            n_pages = pdf_num_pages(p) if p.suffix.lower() == ".pdf" else 0
+            if n_pages > pages_per_task:
+                pending.append((p, [pool.submit(_pages_task, str(p), i, min(i + pages_per_task, n_pages))
+                                    for i in range(0, n_pages, pages_per_task)]))
+            else:
+                pending.append((p, pool.submit(_ingest_task, str(p))))
+            if len(pending) >= max_pending:
+                yield from drain(*pending.popleft())
+        while pending:
+            yield from drain(*pending.popleft())
+
+def ingest_dir(raw_dir: str, workers: int = 1) -> list[dict]:
+    """Parse and chunk every supported file under `raw_dir`.
+
+    workers=1 runs in-process; anything else uses a process pool of that
+    size (<= 0 means one worker per CPU). Output order is identical either way.
+    Near-duplicate chunks (e.g. boilerplate repeated across manuals) are
+    dropped, keeping the first occurrence.
+    """
     docs = []
-    print(raw_dir)
-    print(Path(raw_dir).resolve())
     abs_dir = Path(raw_dir).resolve()
-    print(f"Ingesting from: {abs_dir}")
+    log.info("Ingesting from: %s", abs_dir)
     if not abs_dir.exists():
-        print(f"Directory does not exist: {abs_dir}")
+        log.warning("Directory does not exist: %s", abs_dir)
         return docs
-    files = list(abs_dir.glob("*"))
-    print(f"Files found: {files}")
-    for p in files:
-        print(f"Found file: {p}")
-        if p.suffix.lower() in {".pdf", ".docx", ".html", ".md", ".txt"}:
-            txt = parse_to_text(p)
-            if not txt:
-                print(f"Skipping {p}: no text extracted")
-                continue
-            for ch in chunk_text(txt):
-                ch["meta"].update({"source_path": str(p), "filename": p.name})
-                docs.append(ch)
-    print(f"Total docs ingested: {len(docs)}")
+    files = sorted(abs_dir.glob("*"))
+    log.debug("Files found: %s", files)
+    files = [p for p in files if p.suffix.lower() in SUPPORTED_SUFFIXES]
+    if workers == 1 or len(files) <= 1:
+        for p in files:
+            log.debug("Found file: %s", p)
+            docs.extend(ingest_file(p))
+    else:
+        docs.extend(iter_ingest_parallel(files, workers if workers > 0 else None))
+    n_all = len(docs)
+    docs = list(dedupe_chunks(docs, NearDupIndex()))
+    log.info("Total docs ingested: %d (%d near-duplicates dropped)", len(docs), n_all - len(docs))
     return docs
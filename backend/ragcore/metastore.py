@@ -0,0 +1,124 @@
+# ragcore/metastore.py
+"""Columnar chunk metadata, row-aligned with VectorIndex.store.
+
+Dates are parsed once into int64 epoch seconds; filenames, source paths and
+tags are dictionary-encoded into int32 codes (tags as a CSR list per row).
+Filters evaluate to a boolean row mask with a handful of NumPy ops, so they
+can be applied *before* search (FAISS ID selectors, BM25 candidate masks)
+instead of thinning out an already-cut top-k.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+
+# unparseable dates pass every `after` filter, as the old per-item filter did
+_BAD_DATE = np.iinfo(np.int64).max
+
+def to_epoch(value) -> int:
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+def _epoch_or_bad(value) -> int:
+    try:
+        return to_epoch(value)
+    except Exception:
+        return _BAD_DATE
+
+class _Dictionary:
+    def __init__(self):
+        self.values, self.codes = [], {}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class MetaStore:
+    # persisted by ragcore.chunkstore; updates always build new arrays, so these
+    # may be read-only memory maps
+    ARRAYS = ("date", "filename", "source", "tag_ptr", "tag_codes")
+
+    def __init__(self, chunks: list[dict] = ()):
+        self.filenames, self.sources, self.tags = _Dictionary(), _Dictionary(), _Dictionary()
+        self.date = np.zeros(0, dtype=np.int64)
+        self.filename = np.zeros(0, dtype=np.int32)
+        self.source = np.zeros(0, dtype=np.int32)
+        self.tag_ptr = np.zeros(1, dtype=np.int64)
+        self.tag_codes = np.zeros(0, dtype=np.int32)
+        self.append(list(chunks))
+
+    def __len__(self):
+        return len(self.date)
+
+    def vocab(self) -> dict:
+        return {"filenames": self.filenames.values, "sources": self.sources.values, "tags": self.tags.values}
+
+    @classmethod
+    def restore(cls, arrays: dict, vocab: dict) -> "MetaStore":
+        ms = cls()
+        for name in cls.ARRAYS:
+            setattr(ms, name, arrays[name])
+        for attr, key in (("filenames", "filenames"), ("sources", "sources"), ("tags", "tags")):
+            d = getattr(ms, attr)
+            for v in vocab[key]:
+                d.encode(v)
+        return ms
+
+    def append(self, chunks: list[dict]):
+        if not chunks:
+            return
+        metas = [c.get("meta", {}) for c in chunks]
+        # missing dates count as 1970-01-01, as the old per-item filter assumed
+        self.date = np.concatenate([self.date, np.fromiter(
+            (_epoch_or_bad(m.get("date", "1970-01-01")) for m in metas), dtype=np.int64, count=len(metas))])
+        self.filename = np.concatenate([self.filename, np.fromiter(
+            (self.filenames.encode(m.get("filename", "")) for m in metas), dtype=np.int32, count=len(metas))])
+        self.source = np.concatenate([self.source, np.fromiter(
+            (self.sources.encode(m.get("source_path", "")) for m in metas), dtype=np.int32, count=len(metas))])
+        tags = [[self.tags.encode(t) for t in m.get("tags", ())] for m in metas]
+        sizes = np.fromiter((len(t) for t in tags), dtype=np.int64, count=len(tags))
+        self.tag_ptr = np.concatenate([self.tag_ptr, self.tag_ptr[-1] + np.cumsum(sizes)])
+        self.tag_codes = np.concatenate([self.tag_codes, np.fromiter(
+            (c for t in tags for c in t), dtype=np.int32, count=int(sizes.sum()))])
+
+    def remove(self, ids: list[int]):
+        if not len(ids):
+            return
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(ids, dtype=np.int64)] = False
+        sizes = np.diff(self.tag_ptr)
+        self.tag_codes = self.tag_codes[np.repeat(keep, sizes)]
+        self.tag_ptr = np.concatenate([[0], np.cumsum(sizes[keep])]).astype(np.int64)
+        self.date, self.filename, self.source = self.date[keep], self.filename[keep], self.source[keep]
+
+    def rows_with_filename(self, names) -> np.ndarray:
+        codes = [self.filenames.codes[n] for n in names if n in self.filenames.codes]
+        return np.flatnonzero(np.isin(self.filename, codes))
+
+    def mask(self, after=None, filename_contains=None, source=None, tag=None) -> np.ndarray | None:
+        """Boolean row mask for the given filters, or None when there are none."""
+        if after is None and not filename_contains and source is None and tag is None:
+            return None
+        m = np.ones(len(self), dtype=bool)
+        if after is not None:
+            m &= self.date >= to_epoch(after)
+        if filename_contains:
+            needle = filename_contains.lower()
+            # evaluate on the dictionary (one entry per file), then gather by code
+            hit = np.array([needle in f.lower() for f in self.filenames.values], dtype=bool)
+            m &= hit[self.filename] if len(hit) else False
+        if source is not None:
+            code = self.sources.codes.get(source)
+            m &= self.source == code if code is not None else False
+        if tag is not None:
+            code = self.tags.codes.get(tag)
+            has = np.zeros(len(self), dtype=bool)
+            if code is not None:
+                rows = np.repeat(np.arange(len(self)), np.diff(self.tag_ptr))
+                has[rows[self.tag_codes == code]] = True
+            m &= has
+        return m
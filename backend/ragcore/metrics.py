@@ -0,0 +1,178 @@
+# ragcore/metrics.py
+"""In-process pipeline metrics, rendered in the Prometheus text format.
+
+    with metrics.timer("faiss"):          # rag_stage_seconds{stage="faiss"}
+        ...
+    @metrics.timed("compress")            # same, for a whole function
+    metrics.count("dense", len(ids))      # rag_candidates{source="dense"}
+
+A stage that raises also bumps rag_stage_errors_total. Cache hit/miss
+counters are read from the caches themselves at scrape time (`register`).
+While a trace is active (`start_trace`, e.g. for a request carrying a debug
+header), every timer and count is also appended to it, so a single request
+can report its own breakdown. Metrics are per process: under gunicorn each
+worker keeps and serves its own, like the caches.
+"""
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# seconds; spans a cached FAISS lookup up to a slow LLM call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, esc)) + "}"
+
+def _num(v: float) -> str:
+    return "+Inf" if v == float("inf") else repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                out.append(f"{self.name}{_labels(self.labelnames, key)} {_num(v)}")
+        return out
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._series.items()):
+                cum = 0
+                for le, c in zip(self.buckets + (float("inf"),), counts):
+                    cum += c
+                    out.append(f"{self.name}_bucket{_labels(names, key + (_num(le),))} {cum}")
+                out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}")
+                out.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return out
+
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Latency of RAG pipeline stages.", ("stage",))
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Pipeline stages that raised.", ("stage",))
+CANDIDATES = Histogram("rag_candidates", "Candidates produced or consumed per call, by source.",
+                       ("source",), buckets=COUNT_BUCKETS)
+REQUEST_SECONDS = Histogram("rag_http_request_seconds", "HTTP request latency.", ("endpoint", "method", "status"))
+
+_metrics = [STAGE_SECONDS, STAGE_ERRORS, CANDIDATES, REQUEST_SECONDS]
+_collectors = []  # callables returning [(name, type, help, [(labels dict, value)])]
+
+def register(collector):
+    """Add a scrape-time collector, e.g. one reading cache hit/miss counters."""
+    _collectors.append(collector)
+    return collector
+
+# --- per-request trace --------------------------------------------------------
+
+_trace = contextvars.ContextVar("rag_trace", default=None)
+
+def start_trace():
+    """Begin collecting this context's stages; returns a token for `end_trace`.
+    Work handed to other threads joins the trace if it runs in a copy of this
+    context (ragcore.engine.Engine.submit does that)."""
+    return _trace.set({"t0": time.perf_counter(), "events": []})
+
+def current_trace() -> list[dict] | None:
+    tr = _trace.get()
+    return None if tr is None else list(tr["events"])
+
+def end_trace(token) -> list[dict] | None:
+    events = current_trace()
+    _trace.reset(token)
+    return events
+
+def _record(event: dict, t_start: float | None = None):
+    tr = _trace.get()
+    if tr is not None:
+        if t_start is not None:
+            event["start_ms"] = round((t_start - tr["t0"]) * 1000, 3)
+        tr["events"].append(event)  # list.append is atomic; engine threads share the list
+
+# --- recording ------------------------------------------------------------------
+
+def observe(stage: str, seconds: float, t_start: float | None = None):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    _record({"stage": stage, "ms": round(seconds * 1000, 3)}, t_start)
+
+class timer:
+    """Context manager timing one `stage`."""
+
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.t0, self.t0)
+        # a closed generator (client went away mid-stream) is not a failure
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            STAGE_ERRORS.inc(stage=self.stage)
+        return False
+
+def timed(stage: str):
+    """Decorator form of `timer`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def count(source: str, n: int):
+    CANDIDATES.observe(n, source=source)
+    _record({"count": source, "n": int(n)})
+
+def server_timing(events: list[dict]) -> str:
+    """Server-Timing header value (shown by browser devtools) for a trace."""
+    return ", ".join(f"{e['stage']};dur={e['ms']}" for e in events if "stage" in e)
+
+# --- exposition ---------------------------------------------------------------------
+
+def render() -> str:
+    lines = []
+    for m in _metrics:
+        lines.extend(m.render())
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_num(value)}")
+    return "\n".join(lines) + "\n"
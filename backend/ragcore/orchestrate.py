@@ -1,8 +1,17 @@
 # ragcore/orchestrate.py
-from rapidfuzz import fuzz
+import math
+import re
+from ragcore.dedup import NearDupIndex, signature
+from ragcore.ingest import tokenize
+from ragcore.tokens import chunk_tokens, count_tokens
+from ragcore import metrics
+
+# chunk_text joins sentences with spaces, so split on terminal punctuation
+_SENT_RE = re.compile(r"(?<=[.!?])\s+")
 
 INTENTS = ["fact_lookup", "howto", "summarize", "compare", "reasoning"]
 
+@metrics.timed("intent")
 def detect_intent(q: str) -> str:
     ql = q.lower()
     if any(w in ql for w in ["who", "when", "where", "definition", "what is"]): return "fact_lookup"
@@ -11,6 +20,7 @@ def detect_intent(q: str) -> str:
     if "compare" in ql or "vs" in ql: return "compare"
     return "reasoning"
 
+@metrics.timed("rewrite")
 def rewrite_query(q: str, intent: str) -> str:
     # lightweight heuristic rewrite; swap out for an LLM if you want
     if intent == "fact_lookup":
@@ -19,14 +29,70 @@ def rewrite_query(q: str, intent: str) -> str:
         return f"{q} step-by-step, pitfalls, prerequisites"
     return q
 
+@metrics.timed("compress")
 def compress_context(chunks: list[dict], max_chars=4000) -> list[dict]:
-    # simple extractive compression by removing very similar chunks
+    # simple extractive compression by removing near-duplicate chunks (MinHash LSH, see ragcore.dedup)
     kept, buf = [], 0
+    seen = NearDupIndex()
     for c in chunks:
-        if not kept:
-            kept.append(c); buf += len(c["chunk"]["text"])
+        n = len(c["chunk"]["text"])
+        if kept and buf + n > max_chars:
             continue
-        sim = max(fuzz.token_set_ratio(c["chunk"]["text"], k["chunk"]["text"]) for k in kept)
-        if sim < 85 and buf + len(c["chunk"]["text"]) <= max_chars:
-            kept.append(c); buf += len(c["chunk"]["text"])
+        if seen.add_if_new(signature(c["chunk"])):
+            kept.append(c); buf += n
     return kept
+
+def _value(c: dict, rank: int) -> float:
+    # reranker scores are probabilities; without them fall back to rank order
+    return c["rerank"] if "rerank" in c else 1.0 / (rank + 1)
+
+def trim_to_sentences(text: str, max_tokens: int, query: str | None = None) -> str:
+    """The sentences of `text` most relevant to `query` (by term overlap, or the
+    leading ones without a query) that fit in `max_tokens`, in original order."""
+    sents = [x for x in _SENT_RE.split(text) if x]
+    q = set(tokenize(query)) if query else set()
+    def score(i):
+        toks = tokenize(sents[i])
+        return len(q.intersection(toks)) / math.sqrt(len(toks) or 1) if q else -i
+    picked, used = [], 0
+    for i in sorted(range(len(sents)), key=lambda i: -score(i)):
+        n = count_tokens(sents[i])
+        if used + n <= max_tokens:
+            picked.append(i); used += n
+    return " ".join(sents[i] for i in sorted(picked))
+
+@metrics.timed("compress")
+def pack_context(chunks: list[dict], max_tokens=800, query: str | None = None, trim=True,
+                 min_trim_tokens=40) -> list[dict]:
+    """Choose chunks under an LLM token budget (counted at ingest, see ragcore.tokens).
+
+    Near-duplicates are dropped, then chunks are taken greedily by value per
+    token (value = rerank score, else reciprocal rank), as in fractional
+    knapsack; the single best chunk wins instead when it alone is worth more.
+    With `trim`, leftover budget of at least `min_trim_tokens` is filled with
+    the best sentences of the most valuable chunk that did not fit. The
+    result keeps the input (relevance) order; trimmed chunks are copies.
+    """
+    seen = NearDupIndex()
+    items = [(r, c, chunk_tokens(c["chunk"])) for r, c in enumerate(chunks) if seen.add_if_new(signature(c["chunk"]))]
+    if not items:
+        return []
+    kept, used = [], 0
+    for r, c, n in sorted(items, key=lambda x: -_value(x[1], x[0]) / max(1, x[2])):
+        if used + n <= max_tokens:
+            kept.append((r, c)); used += n
+    best = max((x for x in items if x[2] <= max_tokens), key=lambda x: _value(x[1], x[0]), default=None)
+    if best is not None and _value(best[1], best[0]) > sum(_value(c, r) for r, c in kept):
+        kept, used = [(best[0], best[1])], best[2]
+    left = max_tokens - used
+    if trim and left >= min_trim_tokens:
+        taken = {r for r, _ in kept}
+        rest = [x for x in items if x[0] not in taken]
+        if rest:
+            r, c, _ = max(rest, key=lambda x: _value(x[1], x[0]))
+            text = trim_to_sentences(c["chunk"]["text"], left, query)
+            if text:
+                chunk = {"text": text, "meta": {**c["chunk"]["meta"], "n_tokens": count_tokens(text), "trimmed": True}}
+                chunk["meta"].pop("minhash", None)
+                kept.append((r, {**c, "chunk": chunk}))
+    return [c for _, c in sorted(kept, key=lambda x: x[0])]
@@ -0,0 +1,142 @@
+# ragcore/pipeline.py
+"""Streaming ingest: files -> text -> chunks -> unique chunks -> embedded batches -> index.
+
+Every stage is a generator, so nothing runs ahead of the consumer: at most one
+embedding batch (plus the process-pool window when parsing in parallel) is in
+flight, and peak memory tracks `batch_size` rather than corpus size. The chunk
+texts themselves end up in `VectorIndex.store` (a compact ChunkStore); given a
+BM25Index, each batch's term counts go into it as the batch is indexed, so the
+corpus's token lists never exist at once either.
+"""
+import logging
+import time
+from itertools import islice
+from pathlib import Path
+
+from ragcore.ingest import SUPPORTED_SUFFIXES, chunk_file, iter_ingest_parallel, parse_to_text, tokenize
+from ragcore.dedup import NearDupIndex, signature
+from ragcore.embed import VectorIndex
+from ragcore.retrieve import BM25Index
+
+log = logging.getLogger(__name__)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0  # time spent in this stage's own work, not upstream
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return f"{self.name}: {self.items} items in {self.seconds:.2f}s ({self.rate:.1f}/s)"
+
+
+def iter_files(raw_dir: str):
+    abs_dir = Path(raw_dir).resolve()
+    if not abs_dir.exists():
+        log.warning("Directory does not exist: %s", abs_dir)
+        return
+    for p in sorted(abs_dir.glob("*")):
+        if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES:
+            yield p
+
+
+def iter_parsed(files, stats: StageStats):
+    for p in files:
+        t0 = time.perf_counter()
+        txt = parse_to_text(p)
+        stats.seconds += time.perf_counter() - t0
+        stats.items += 1
+        yield p, txt
+
+
+def iter_chunked(parsed, stats: StageStats):
+    for p, txt in parsed:
+        t0 = time.perf_counter()
+        chunks = chunk_file(p, txt)
+        stats.seconds += time.perf_counter() - t0
+        stats.items += len(chunks)
+        yield from chunks
+
+
+def iter_unique(chunks, stats: StageStats, seen: NearDupIndex | None = None):
+    # drop near-duplicates of any earlier chunk, across documents
+    seen = seen if seen is not None else NearDupIndex()
+    for ch in chunks:
+        t0 = time.perf_counter()
+        new = seen.add_if_new(signature(ch))
+        stats.seconds += time.perf_counter() - t0
+        if new:
+            stats.items += 1
+            yield ch
+
+
+def iter_batches(items, batch_size: int):
+    it = iter(items)
+    while batch := list(islice(it, batch_size)):
+        yield batch
+
+
+def iter_embedded(batches, vec: VectorIndex, stats: StageStats):
+    for batch in batches:
+        t0 = time.perf_counter()
+        vecs = vec.encode_passages(batch)
+        stats.seconds += time.perf_counter() - t0
+        stats.items += len(batch)
+        yield vecs, batch
+
+
+def iter_chunks(raw_dir: str, stats: dict, workers: int = 1):
+    """Chunks for every supported file under `raw_dir`, in sorted file order."""
+    files = iter_files(raw_dir)
+    if workers == 1:
+        stats["parse"] = StageStats("parse")
+        stats["chunk"] = StageStats("chunk")
+        yield from iter_chunked(iter_parsed(files, stats["parse"]), stats["chunk"])
+        return
+    # the pool parses and chunks in one step; time here is wall time waiting on it
+    st = stats["parse+chunk"] = StageStats("parse+chunk")
+    it = iter_ingest_parallel(list(files), workers if workers > 0 else None)
+    while True:
+        t0 = time.perf_counter()
+        ch = next(it, None)
+        st.seconds += time.perf_counter() - t0
+        if ch is None:
+            return
+        st.items += 1
+        yield ch
+
+
+def stream_into_index(raw_dir: str, vec: VectorIndex, batch_size: int = 64, workers: int = 1,
+                      log_every: int = 1024, bm25: BM25Index | None = None) -> dict:
+    """Parse, chunk, embed and add `raw_dir` to `vec` (and `bm25`, if given)
+    batch by batch. Returns the per-stage StageStats."""
+    stats = {}  # parse/chunk entries are filled in lazily by iter_chunks
+    uniq, emb, add = StageStats("dedup"), StageStats("embed"), StageStats("index")
+    chunks = iter_unique(iter_chunks(raw_dir, stats, workers), uniq)
+    embedded = iter_embedded(iter_batches(chunks, batch_size), vec, emb)
+    t_start, next_log = time.perf_counter(), log_every
+    for vecs, batch in embedded:
+        t0 = time.perf_counter()
+        vec.add_vectors(vecs, batch)
+        if bm25 is not None:
+            bm25.add([tokenize(c["text"]) for c in batch], refresh=False)
+        add.seconds += time.perf_counter() - t0
+        add.items += len(batch)
+        if add.items >= next_log:
+            elapsed = time.perf_counter() - t_start
+            log.info("%d chunks indexed (%.1f/s)", add.items, add.items / elapsed)
+            next_log += log_every
+    t0 = time.perf_counter()
+    vec.finalize()  # trains IVF variants on the buffered sample
+    if bm25 is not None:
+        bm25.finalize()
+    add.seconds += time.perf_counter() - t0
+    stats["dedup"], stats["embed"], stats["index"] = uniq, emb, add
+    for st in stats.values():
+        log.info("%s", st)
+    return stats
@@ -1,12 +1,185 @@
 # ragcore/rerank.py
+import hashlib
+import numpy as np
+import torch
 from sentence_transformers import CrossEncoder
+from ragcore.cache import LRUCache, normalize_query
+from ragcore.batching import MicroBatcher
+from ragcore.inference import load_model, set_torch_threads
+from ragcore import metrics
+
+def _pair_len(pair) -> int:
+    # characters as a cheap proxy for tokens when bucketing by length
+    return len(pair[0]) + len(pair[1])
+
+def _truncate_pair(q_ids: list, p_ids, budget: int):
+    """Longest-first pair truncation, as the tokenizer call inside
+    CrossEncoder.predict does: drop tokens from the end of the longer side
+    (the passage on ties) until both fit `budget`."""
+    n_q, n_p = len(q_ids), len(p_ids)
+    if n_q + n_p <= budget:
+        return q_ids, p_ids
+    short = min(n_q, n_p)
+    if short <= budget - short:
+        keep_q, keep_p = (n_q, budget - n_q) if n_q <= n_p else (budget - n_p, n_p)
+    else:
+        keep_q, keep_p = budget - budget // 2, budget // 2
+    return q_ids[:keep_q], p_ids[:keep_p]
+
+def _text_key(text: str) -> bytes:
+    # content-addressed chunk id: survives index rebuilds, changes with the text
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
 
 class Reranker:
-    def __init__(self, model_name="BAAI/bge-reranker-base"):
-        self.model = CrossEncoder(model_name)
+    """CrossEncoder reranker.
+
+    fast=True skips re-tokenizing passages: each chunk is tokenized and
+    truncated to the model's max length once (see `prepare`), and per query
+    only the query is tokenized before the pair inputs are assembled.
+    cascade_keep=N prunes each candidate list to N before the main model runs,
+    using `cascade_model` (a smaller CrossEncoder) if given, else the fused
+    retrieval score.
+    """
+
+    def __init__(self, model_name="BAAI/bge-reranker-base", batching=False, max_batch_size=64, max_wait_ms=5.0,
+                 fast=True, max_query_tokens=None, cascade_keep=None, cascade_model=None,
+                 backend="torch", threads=None):
+        # backend: torch | onnx | onnx-int8 (see ragcore.inference)
+        self.model = load_model(CrossEncoder, model_name, backend, threads)
+        self.model_name, self.cascade_model, self.backend, self.threads = model_name, cascade_model, backend, threads
+        # (query, passage) -> score; a pair's score never goes stale, index
+        # changes only alter which pairs we ask for
+        self.score_cache = LRUCache(maxsize=16384, ttl=3600, name="rerank_score")
+        # passage text -> token ids (no special tokens), truncated once
+        self.passage_tokens = LRUCache(maxsize=100_000, ttl=None, name="rerank_passage_tokens")
+        self.max_query_tokens = max_query_tokens
+        # the fast path drives the torch module directly; ONNX sessions go through predict()
+        self.fast = fast and backend == "torch" and hasattr(self.model, "tokenizer") and hasattr(self.model, "model")
+        self.cascade_keep = cascade_keep
+        self.cascade = load_model(CrossEncoder, cascade_model, backend, threads) if cascade_model else None
+        self.max_batch_size = max_batch_size
+        # with batching, pairs from concurrent requests share forward passes
+        self.batcher = None
+        if batching:
+            self.batcher = MicroBatcher(
+                self._predict, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                length_key=_pair_len, name="rerank-batcher",
+            )
+
+    def after_fork(self, threads: int | None = None):
+        # see VectorIndex.after_fork; also restarts the batcher thread
+        self.threads = threads or self.threads
+        if self.backend == "torch":
+            if threads:
+                set_torch_threads(threads)  # process-wide
+        else:
+            self.model = load_model(CrossEncoder, self.model_name, self.backend, self.threads)
+            if self.cascade_model:
+                self.cascade = load_model(CrossEncoder, self.cascade_model, self.backend, self.threads)
+        if self.batcher is not None:
+            self.batcher.after_fork()
+
+    @staticmethod
+    def _key(query: str, chunk: dict):
+        # keyed on the text, not the ChunkStore id: ids restart at 0 when the
+        # index is rebuilt, so an id can name a different passage after a reload
+        return normalize_query(query), _text_key(chunk["text"])
+
+    @property
+    def max_length(self) -> int:
+        tok = self.model.tokenizer
+        return min(self.model.max_length or tok.model_max_length, tok.model_max_length)
+
+    def prepare(self, chunks, batch_size: int = 256):
+        """Tokenize and truncate passages ahead of time (e.g. right after ingest).
+        `chunks` is a ChunkStore or a list of chunk dicts."""
+        if not self.fast:
+            return
+        texts = chunks.texts() if hasattr(chunks, "texts") else (c["text"] for c in chunks)
+        todo = [t for t in texts if self.passage_tokens.get(_text_key(t)) is None]
+        for i in range(0, len(todo), batch_size):
+            texts = todo[i:i + batch_size]
+            ids = self.model.tokenizer(texts, add_special_tokens=False, truncation=True,
+                                       max_length=self.max_length)["input_ids"]
+            for t, row in zip(texts, ids):
+                self.passage_tokens.put(_text_key(t), np.asarray(row, dtype=np.int32))
+
+    def _passage_ids(self, text: str) -> np.ndarray:
+        key = _text_key(text)
+        ids = self.passage_tokens.get(key)
+        if ids is None:
+            ids = np.asarray(self.model.tokenizer(text, add_special_tokens=False, truncation=True,
+                                                  max_length=self.max_length)["input_ids"], dtype=np.int32)
+            self.passage_tokens.put(key, ids)
+        return ids
+
+    def _predict(self, pairs: list[tuple[str, str]]) -> list[float]:
+        if not self.fast:
+            return self.model.predict(pairs, batch_size=self.max_batch_size).tolist()
+        tok, hf = self.model.tokenizer, self.model.model
+        budget = self.max_length - tok.num_special_tokens_to_add(pair=True)
+        # queries are only cut here when max_query_tokens is set; otherwise the pair
+        # is truncated longest-first like predict(), so scores match it
+        q_kwargs = {"truncation": True, "max_length": self.max_query_tokens} if self.max_query_tokens else {}
+        queries = {q: tok(q, add_special_tokens=False, **q_kwargs)["input_ids"] for q in {q for q, _ in pairs}}
+        with_types = "token_type_ids" in tok.model_input_names
+        activation = getattr(self.model, "activation_fn", None) or getattr(self.model, "default_activation_function")
+        out = []
+        for start in range(0, len(pairs), self.max_batch_size):
+            feats = {"input_ids": []}
+            if with_types:
+                feats["token_type_ids"] = []
+            for q, p in pairs[start:start + self.max_batch_size]:
+                q_ids, p_ids = _truncate_pair(queries[q], self._passage_ids(p), budget)
+                p_ids = p_ids.tolist()
+                feats["input_ids"].append(tok.build_inputs_with_special_tokens(q_ids, p_ids))
+                if with_types:
+                    feats["token_type_ids"].append(tok.create_token_type_ids_from_sequences(q_ids, p_ids))
+            batch = tok.pad(feats, padding=True, return_tensors="pt")
+            with torch.inference_mode():
+                logits = hf(**{k: v.to(hf.device) for k, v in batch.items()}, return_dict=True).logits
+                scores = activation(logits)
+            if scores.dim() > 1 and scores.shape[1] == 1:
+                scores = scores[:, 0]
+            out.extend(scores.float().cpu().tolist())
+        return out
+
+    def _prune(self, query: str, cands: list[dict]) -> list[dict]:
+        if not self.cascade_keep or len(cands) <= self.cascade_keep:
+            return cands
+        if self.cascade is not None:
+            first = self.cascade.predict([(query, c["chunk"]["text"]) for c in cands])
+        else:
+            first = np.array([c.get("fused", c.get("score", 0.0)) for c in cands])
+        keep = np.argsort(-np.asarray(first), kind="stable")[:self.cascade_keep]
+        return [cands[i] for i in sorted(keep)]
 
     def rerank(self, query: str, candidates: list[dict], top_k=8):
-        pairs = [(query, c["chunk"]["text"]) for c in candidates]
-        scores = self.model.predict(pairs).tolist()
-        for s, c in zip(scores, candidates): c["rerank"] = float(s)
-        return sorted(candidates, key=lambda x: -x["rerank"])[:top_k]
+        return self.rerank_many([query], [candidates], top_k=top_k)[0]
+
+    @metrics.timed("rerank")
+    def rerank_many(self, queries: list[str], candidates: list[list[dict]], top_k=8, batch_size=128):
+        """Rerank several candidate lists at once: every uncached (query, chunk)
+        pair across all queries goes through a single batched predict call."""
+        candidates = [self._prune(q, cands) for q, cands in zip(queries, candidates)]
+        keys = [[self._key(q, c["chunk"]) for c in cands] for q, cands in zip(queries, candidates)]
+        scores = [[self.score_cache.get(k) for k in ks] for ks in keys]
+        todo = [(qi, ci) for qi, row in enumerate(scores) for ci, s in enumerate(row) if s is None]
+        metrics.count("rerank", sum(len(c) for c in candidates))
+        metrics.count("rerank_model", len(todo))  # the rest came from score_cache
+        if todo:
+            pairs = [(queries[qi], candidates[qi][ci]["chunk"]["text"]) for qi, ci in todo]
+            if self.batcher is not None:
+                preds = self.batcher(pairs)
+            elif self.fast:
+                preds = self._predict(pairs)
+            else:
+                preds = self.model.predict(pairs, batch_size=batch_size).tolist()
+            for (qi, ci), s in zip(todo, preds):
+                scores[qi][ci] = float(s)
+                self.score_cache.put(keys[qi][ci], scores[qi][ci])
+        out = []
+        for row, cands in zip(scores, candidates):
+            for s, c in zip(row, cands): c["rerank"] = float(s)
+            out.append(sorted(cands, key=lambda x: -x["rerank"])[:top_k])
+        return out
@@ -1,60 +1,274 @@
 # ragcore/retrieve.py
-from rank_bm25 import BM25Okapi
-from datetime import datetime
+from collections import Counter
+from itertools import islice
 from ragcore.embed import VectorIndex
+from ragcore.ingest import tokenize
+from ragcore.locks import RWLock
+from ragcore.cache import LRUCache, normalize_query
+from ragcore.dedup import NearDupIndex
+from ragcore.chunkstore import ChunkStore
+from ragcore.fusion import fuse
+from ragcore import metrics
 import numpy as np
 
+class BM25Index:
+    """Okapi BM25 (same formula and idf floor as rank_bm25.BM25Okapi) over a CSR
+    inverted index, so a query only touches the postings of its own terms.
+
+    A forward CSR (doc -> term ids/tfs) is kept as well; it makes appends and
+    deletions plain array edits, after which the inverted side is re-derived
+    with one vectorized sort. Bulk loads call `add(..., refresh=False)` per
+    batch and `finalize()` once, so only the compact per-batch arrays are held
+    until then, never the corpus's token lists.
+    """
+
+    def __init__(self, corpus: list[list[str]] = (), k1=1.5, b=0.75, epsilon=0.25):
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.vocab = {}  # term -> term id
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        # forward index
+        self.doc_ptr = np.zeros(1, dtype=np.int64)
+        self.doc_terms = np.zeros(0, dtype=np.int32)
+        self.doc_tfs = np.zeros(0, dtype=np.float32)
+        self._pending = []  # (doc lens, doc sizes, term ids, tfs) of unmerged batches
+        self.add(list(corpus))
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self.doc_len)
+
+    def _term_id(self, term: str) -> int:
+        tid = self.vocab.get(term)
+        if tid is None:
+            tid = self.vocab[term] = len(self.vocab)
+        return tid
+
+    def add(self, corpus: list[list[str]], refresh: bool = True):
+        """Append documents (token lists). With refresh=False they are not
+        searchable until `finalize()`."""
+        if not corpus:
+            return
+        lens, terms, tfs = [], [], []
+        for doc in corpus:
+            freqs = Counter(doc)
+            lens.append(len(doc))
+            terms.append(np.fromiter((self._term_id(t) for t in freqs), dtype=np.int32, count=len(freqs)))
+            tfs.append(np.fromiter(freqs.values(), dtype=np.float32, count=len(freqs)))
+        sizes = np.fromiter((len(t) for t in terms), dtype=np.int64, count=len(terms))
+        self._pending.append((np.asarray(lens, dtype=np.int32), sizes, np.concatenate(terms), np.concatenate(tfs)))
+        if refresh:
+            self.finalize()
+
+    def _merge(self):
+        # one concatenation for all pending batches instead of one per batch
+        if not self._pending:
+            return
+        lens, sizes, terms, tfs = zip(*self._pending)
+        self._pending = []
+        self.doc_ptr = np.concatenate([self.doc_ptr, self.doc_ptr[-1] + np.cumsum(np.concatenate(sizes))])
+        self.doc_terms = np.concatenate([self.doc_terms, *terms])
+        self.doc_tfs = np.concatenate([self.doc_tfs, *tfs])
+        self.doc_len = np.concatenate([self.doc_len, *lens])
+
+    def finalize(self):
+        """Merge pending batches and re-derive the inverted index and corpus stats."""
+        self._merge()
+        self._refresh()
+
+    def remove(self, ids: list[int]):
+        if not len(ids):
+            return
+        self._merge()
+        keep_doc = np.ones(self.corpus_size, dtype=bool)
+        keep_doc[np.asarray(ids, dtype=np.int64)] = False
+        sizes = np.diff(self.doc_ptr)
+        keep_nnz = np.repeat(keep_doc, sizes)
+        self.doc_terms = self.doc_terms[keep_nnz]
+        self.doc_tfs = self.doc_tfs[keep_nnz]
+        self.doc_ptr = np.concatenate([[0], np.cumsum(sizes[keep_doc])]).astype(np.int64)
+        self.doc_len = self.doc_len[keep_doc]
+        self._refresh()
+
+    def _refresh(self):
+        n_docs, n_terms = self.corpus_size, len(self.vocab)
+        # inverted index: postings sorted by term, doc ids ascending within a term
+        doc_ids = np.repeat(np.arange(n_docs, dtype=np.int32), np.diff(self.doc_ptr))
+        order = np.argsort(self.doc_terms, kind="stable")
+        self.post_docs = doc_ids[order]
+        self.post_tfs = self.doc_tfs[order]
+        df = np.bincount(self.doc_terms, minlength=n_terms)
+        self.term_ptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        avgdl = (self.doc_len.mean() if n_docs else 0.0) or 1.0
+        self.norm = (self.k1 * (1 - self.b + self.b * self.doc_len / avgdl)).astype(np.float32) if n_docs \
+            else np.zeros(0, dtype=np.float32)
+        idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+        present = df > 0
+        avg_idf = idf[present].mean() if present.any() else 0.0
+        idf[present & (idf < 0)] = self.epsilon * avg_idf
+        self.idf = idf.astype(np.float32)
+
+    def _query_ids(self, query_tokens: list[str]):
+        ids = [self.vocab[t] for t in query_tokens if t in self.vocab]
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        tids, counts = np.unique(np.asarray(ids, dtype=np.int64), return_counts=True)
+        return tids, counts.astype(np.float32)
+
+    def _postings(self, query_tokens: list[str]):
+        """(doc ids, per-posting score contribution) for the query's terms."""
+        tids, counts = self._query_ids(query_tokens)
+        if not len(tids):
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        starts, stops = self.term_ptr[tids], self.term_ptr[tids + 1]
+        sel = np.concatenate([np.arange(a, z) for a, z in zip(starts, stops)])
+        docs, tf = self.post_docs[sel], self.post_tfs[sel]
+        # repeated query terms count once per occurrence, as in rank_bm25
+        w = np.repeat(self.idf[tids] * counts, stops - starts)
+        return docs, w * tf * (self.k1 + 1) / (tf + self.norm[docs])
+
+    def get_scores(self, query_tokens: list[str]) -> np.ndarray:
+        docs, contrib = self._postings(query_tokens)
+        return np.bincount(docs, weights=contrib, minlength=self.corpus_size)
+
+    def top_k(self, query_tokens: list[str], k: int, mask: np.ndarray | None = None):
+        """(doc ids, scores) of the k best documents that match at least one term
+        (and, given a boolean row `mask`, are selected by it)."""
+        docs, contrib = self._postings(query_tokens)
+        if mask is not None and len(docs):
+            keep = mask[docs]
+            docs, contrib = docs[keep], contrib[keep]
+        if not len(docs):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        cand, inv = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inv, weights=contrib)
+        if len(cand) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+        else:
+            part = np.arange(len(cand))
+        part = part[np.argsort(-scores[part], kind="stable")]
+        return cand[part].astype(np.int64), scores[part]
+
 class HybridRetriever:
-    def __init__(self, chunks: list[dict], vec: VectorIndex):
+    def __init__(self, chunks: list[dict], vec: VectorIndex, bm25: BM25Index | None = None):
         self.vec = vec
-        self.chunks = chunks
-        self.corpus_tokens = [c["text"].split() for c in chunks]
-        if not self.corpus_tokens:
+        if not chunks:
             raise ValueError("No tokens found for BM25. Check your data and ingest logic.")
-        self.bm25 = BM25Okapi(self.corpus_tokens)
-
-    def _metadata_filter(self, items, *, after=None, filename_contains=None):
-        def ok(meta):
-            a = True
-            if after:
-                # requires you to put ISO date in meta["date"]
-                try:
-                    a &= datetime.fromisoformat(meta.get("date", "1970-01-01")) >= after
-                except Exception:
-                    a &= True
-            if filename_contains:
-                a &= filename_contains.lower() in meta.get("filename", "").lower()
-            return a
-        return [x for x in items if ok(x["chunk"]["meta"])]
+        # a persisted BM25 (see ragcore.snapshot) skips recomputing corpus stats
+        if bm25 is None:
+            texts = chunks.texts() if hasattr(chunks, "texts") else (c["text"] for c in chunks)
+            bm25 = BM25Index()
+            while batch := list(islice(texts, 1024)):
+                bm25.add([tokenize(t) for t in batch], refresh=False)
+            bm25.finalize()
+        self.bm25 = bm25
+        # source filename -> sha256 of what is currently indexed (see ragcore.snapshot)
+        self.manifest = {}
+        # mtime_ns of the snapshot manifest this retriever matches; another process
+        # re-saving the snapshot changes it (see ragcore.snapshot.reload_snapshot)
+        self.snapshot_mtime = None
+        # queries share the lock, incremental updates take it exclusively
+        self.lock = RWLock()
+        # fused hits keyed on (index version, normalized query, params)
+        self.cache = LRUCache(maxsize=512, ttl=600, name="retrieval")
+        # optional ragcore.engine.Engine; when set, dense and lexical search overlap
+        self.engine = None
+        # rank fusion of the dense and lexical lists (see ragcore.fusion)
+        self.fusion = "zscore"
+        self.fusion_weights = (1.0, 1.0)  # dense, lexical
+        self.rrf_k = 60
+
+    @property
+    def chunks(self) -> ChunkStore:
+        # single source of truth; VectorIndex labels FAISS vectors with its ids
+        return self.vec.store
+
+    def replace_sources(self, filenames: set[str], new_chunks: list[dict]):
+        """Drop every chunk whose meta["filename"] is in `filenames`, then append
+        `new_chunks`. Embedding happens before the write lock is taken, so
+        queries are only held back for the in-memory commit."""
+        vecs = self.vec.encode_passages(new_chunks) if new_chunks else None
+        tokens = [tokenize(c["text"]) for c in new_chunks]
+        with self.lock.write():
+            if filenames:
+                ids = self.chunks.rows_with_filename(filenames).tolist()
+                self.bm25.remove(ids)
+                self.vec.remove(ids)
+            if new_chunks:
+                self.bm25.add(tokens)
+                self.vec.add_vectors(vecs, new_chunks)
+                self.vec.finalize()
+        # rebuilding HNSW without its tombstones is O(corpus); only the swap is locked
+        compacted = self.vec.compacted()
+        if compacted is not None:
+            with self.lock.write():
+                self.vec.swap_index(*compacted)
 
+    def _cache_key(self, query: str, k_vec, k_bm25, top_k, filters: dict):
+        # the index version in the key retires entries as soon as the corpus changes
+        return (self.vec.version, normalize_query(query), k_vec, k_bm25, top_k,
+                tuple(sorted(filters.items())), self.fusion, tuple(self.fusion_weights), self.rrf_k)
+
+    @metrics.timed("retrieve")
     def retrieve(self, query: str, k_vec=30, k_bm25=30, top_k=20, **filters):
-        # semantic
-        vec_hits = self.vec.search(query, k_vec)
-        # lexical
-        scores = self.bm25.get_scores(query.split())
-        top_ids = np.argsort(scores)[::-1][:k_bm25]
-        bm25_hits = [{"score": float(scores[i]), "chunk": self.chunks[i]} for i in top_ids]
-
-        # fuse (simple sum after z-score; you can use Reciprocal Rank Fusion)
-        def zscore(xs):
-            xs = np.array(xs); return (xs - xs.mean()) / (xs.std() + 1e-6)
-        all_items = vec_hits + bm25_hits
-        # normalize per source
-        vs = zscore([h["score"] for h in vec_hits]) if vec_hits else []
-        bs = zscore([h["score"] for h in bm25_hits]) if bm25_hits else []
-        for i, h in enumerate(vec_hits): h["fused"] = float(vs[i])
-        for i, h in enumerate(bm25_hits): h["fused"] = float(bs[i])
-        fused = sorted(all_items, key=lambda x: -x["fused"])
-
-        # filters
-        fused = self._metadata_filter(fused, **filters)
-
-        # dedupe by near-duplicate text
-        seen, out = set(), []
-        for h in fused:
-            sig = h["chunk"]["text"][:200]
-            if sig not in seen:
-                out.append(h)
-                seen.add(sig)
-            if len(out) >= top_k: break
+        """Fused top_k. Filters (after=datetime, filename_contains, source, tag;
+        see MetaStore.mask) are applied before search, so they never thin out
+        the result below top_k while enough matching chunks exist."""
+        with self.lock.read():
+            key = self._cache_key(query, k_vec, k_bm25, top_k, filters)
+            hits = self.cache.get(key)
+            if hits is None:
+                mask = self.vec.columns.mask(**filters)
+                dense, lexical = self._search_both(query, k_vec, k_bm25, mask)
+                hits = self._fuse(dense, lexical, top_k, k_bm25)
+                self.cache.put(key, hits)
+        # callers annotate hits (e.g. "rerank"), so never hand out the cached dicts
+        return [dict(h) for h in hits]
+
+    @metrics.timed("retrieve_many")
+    def retrieve_many(self, queries: list[str], k_vec=30, k_bm25=30, top_k=20, **filters) -> list[list[dict]]:
+        """Batched `retrieve`: cache misses share one query-encode call and one
+        FAISS search over the query matrix."""
+        with self.lock.read():
+            keys = [self._cache_key(q, k_vec, k_bm25, top_k, filters) for q in queries]
+            results = [self.cache.get(k) for k in keys]
+            todo = [i for i, r in enumerate(results) if r is None]
+            mask = self.vec.columns.mask(**filters) if todo else None
+            dense = self.vec.search_many_ids([queries[i] for i in todo], k_vec, mask)
+            for i, d in zip(todo, dense):
+                results[i] = self._fuse(d, self._bm25_ids(queries[i], k_bm25, mask), top_k, k_bm25)
+                self.cache.put(keys[i], results[i])
+        return [[dict(h) for h in hits] for hits in results]
+
+    def _search_both(self, query: str, k_vec: int, k_bm25: int, mask=None):
+        """((ids, scores) dense, (ids, scores) lexical)."""
+        if self.engine is None:
+            return self.vec.search_ids(query, k_vec, mask), self._bm25_ids(query, k_bm25, mask)
+        # BM25 runs on the pool while this thread encodes the query and searches FAISS
+        lexical = self.engine.submit("bm25", self._bm25_ids, query, k_bm25, mask)
+        dense = self.engine.run("dense", self.vec.search_ids, query, k_vec, mask)
+        return dense, lexical.result()
+
+    @metrics.timed("bm25")
+    def _bm25_ids(self, query: str, k_bm25: int, mask=None):
+        return self.bm25.top_k(tokenize(query), k_bm25, mask)
+
+    def _fuse(self, dense, lexical, top_k: int, k_bm25: int) -> list[dict]:
+        metrics.count("dense", len(dense[0]))
+        metrics.count("lexical", len(lexical[0]))
+        with metrics.timer("fusion"):
+            # fusion works on ids; chunk payloads are only touched for the hits we return
+            # BM25 lists only hold matching docs; normalize them as k_bm25 long, the
+            # rest at score 0, so a rare term's only exact match keeps a high z-score
+            pad = min(k_bm25, self.bm25.corpus_size)
+            ids, scores = fuse([dense, lexical], self.fusion, self.fusion_weights, self.rrf_k,
+                               pad_to=[None, pad])
+            # dedupe near-duplicate text (repeated boilerplate under different ids)
+            seen, out = NearDupIndex(), []
+            for i, f in zip(ids, scores):
+                if seen.add_if_new(self.chunks.signature(i)):
+                    chunk = self.chunks[i]
+                    out.append({"id": chunk["id"], "fused": float(f), "chunk": chunk})
+                    if len(out) >= top_k: break
+        metrics.count("fused", len(out))
         return out
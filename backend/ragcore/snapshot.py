@@ -0,0 +1,260 @@
+# ragcore/snapshot.py
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the single-process dev server is supported there
+    fcntl = None
+
+import faiss
+import numpy as np
+
+from ragcore.ingest import SUPPORTED_SUFFIXES, ingest_file
+from ragcore.embed import VectorIndex
+from ragcore.retrieve import BM25Index, HybridRetriever
+from ragcore.pipeline import stream_into_index
+from ragcore.dedup import NearDupIndex, dedupe_chunks
+from ragcore.chunkstore import ChunkStore
+
+log = logging.getLogger(__name__)
+
+# bump when the on-disk layout or chunking/tokenization changes
+SNAPSHOT_VERSION = 7
+
+MANIFEST = "manifest.json"
+INDEX_FILE = "index.faiss"
+CHUNKS_DIR = "chunks"  # ChunkStore.save layout
+BM25_FILE = "bm25.pkl"
+LOCK_FILE = ".lock"
+
+# serializes incremental updates (and the snapshot writes that follow them)
+_update_lock = threading.Lock()
+
+
+@contextmanager
+def _writer_lock(index_dir: str):
+    """Exclusive across processes: gunicorn workers share one `index_dir`."""
+    if fcntl is None:
+        yield
+        return
+    Path(index_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(index_dir) / LOCK_FILE, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def snapshot_mtime(index_dir: str) -> int | None:
+    # the manifest is written last, so its mtime identifies a complete snapshot
+    try:
+        return (Path(index_dir) / MANIFEST).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def file_sha256(path: Path, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_manifest(raw_dir: str, embed_model: str, index_spec: str = "flat") -> dict:
+    """Describe what an index built from `raw_dir` with `embed_model` contains."""
+    abs_dir = Path(raw_dir).resolve()
+    files = {}
+    if abs_dir.exists():
+        for p in sorted(abs_dir.glob("*")):
+            if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES:
+                files[p.name] = file_sha256(p)
+    return {"version": SNAPSHOT_VERSION, "embed_model": embed_model, "index": index_spec, "files": files}
+
+
+def _atomic_write(path: Path, data: bytes):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def save_snapshot(index_dir: str, manifest: dict, retriever: HybridRetriever):
+    out = Path(index_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    # drop the manifest first so a crash mid-save never leaves a "valid" snapshot
+    (out / MANIFEST).unlink(missing_ok=True)
+
+    tmp_index = out / (INDEX_FILE + ".tmp")
+    faiss.write_index(retriever.vec.index, str(tmp_index))
+    os.replace(tmp_index, out / INDEX_FILE)
+
+    # a live mmapped store keeps reading the old (unlinked) files until it is dropped
+    tmp_chunks = out / (CHUNKS_DIR + ".tmp")
+    shutil.rmtree(tmp_chunks, ignore_errors=True)
+    retriever.chunks.save(str(tmp_chunks))
+    shutil.rmtree(out / CHUNKS_DIR, ignore_errors=True)
+    os.replace(tmp_chunks, out / CHUNKS_DIR)
+    tmp_bm25 = out / (BM25_FILE + ".tmp")
+    with open(tmp_bm25, "wb") as f:
+        # streamed to the file: pickle.dumps would hold a second copy of the index
+        pickle.dump(retriever.bm25, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_bm25, out / BM25_FILE)
+    # manifest is written last and acts as the commit marker
+    _atomic_write(out / MANIFEST, json.dumps(manifest, indent=2).encode("utf-8"))
+    retriever.snapshot_mtime = snapshot_mtime(index_dir)
+
+
+def _read_index(path: Path):
+    """Return (index, mmapped). mmap keeps IVF lists in the page cache instead of
+    the heap; not every index type supports it, so fall back to a regular read."""
+    try:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY), True
+    except RuntimeError:
+        return faiss.read_index(str(path)), False
+
+
+def load_snapshot(index_dir: str, manifest: dict):
+    """Return (stored_manifest, chunks, faiss_index, mmapped, bm25) if the snapshot
+    was built with the same layout version, embedding model and index spec as
+    `manifest`, else None. The stored file hashes may differ; see `update_files`."""
+    src = Path(index_dir)
+    try:
+        stored = json.loads((src / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if any(stored.get(k) != manifest[k] for k in ("version", "embed_model", "index")):
+        return None
+    try:
+        index, mmapped = _read_index(src / INDEX_FILE)
+        chunks = ChunkStore.load(str(src / CHUNKS_DIR), mmap=True)
+        with open(src / BM25_FILE, "rb") as f:
+            bm25 = pickle.load(f)
+    except Exception as e:
+        log.warning("Unreadable snapshot in %s: %s", src, e)
+        return None
+    if index.ntotal < len(chunks):  # HNSW may also hold tombstones
+        log.warning("Index/chunk count mismatch (%d vs %d)", index.ntotal, len(chunks))
+        return None
+    return stored, chunks, index, mmapped, bm25
+
+
+def reload_snapshot(retriever: HybridRetriever, index_dir: str) -> bool:
+    """Swap in the snapshot another process saved under `index_dir`, keeping the
+    retriever's models. Returns False when there is no complete snapshot right
+    now (e.g. a save is in progress); callers retry on a later request."""
+    mtime = snapshot_mtime(index_dir)
+    vec = retriever.vec
+    snap = load_snapshot(index_dir, {"version": SNAPSHOT_VERSION, "embed_model": vec.model_id, "index": vec.spec})
+    if snap is None:
+        return False
+    stored, chunks, index, mmapped, bm25 = snap
+    with retriever.lock.write():
+        vec.attach(index, chunks, mmapped=mmapped)  # bumps the version, so result caches miss
+        retriever.bm25 = bm25
+        retriever.manifest = stored
+        retriever.snapshot_mtime = mtime
+    log.info("Reloaded %d chunks from %s", len(chunks), index_dir)
+    return True
+
+
+def update_files(retriever: HybridRetriever, raw_dir: str, index_dir: str, names=None) -> dict:
+    """Re-index only the files under `raw_dir` whose content hash changed.
+
+    `names` limits the check to those filenames (e.g. a fresh upload); by
+    default every indexed or present file is checked. Files that disappeared
+    are removed from the index. The snapshot is re-saved when anything changed.
+    """
+    abs_dir = Path(raw_dir).resolve()
+    with _update_lock, _writer_lock(index_dir):
+        # start from whatever another worker last saved, or its changes are lost
+        if snapshot_mtime(index_dir) not in (None, retriever.snapshot_mtime):
+            reload_snapshot(retriever, index_dir)
+        files = retriever.manifest.setdefault("files", {})
+        if names is None:
+            names = set(files) | {p.name for p in abs_dir.glob("*") if p.suffix.lower() in SUPPORTED_SUFFIXES}
+        changed, removed = {}, []
+        for name in sorted(names):
+            p = abs_dir / name
+            if not p.is_file() or p.suffix.lower() not in SUPPORTED_SUFFIXES:
+                if name in files:
+                    removed.append(name)
+                continue
+            sha = file_sha256(p)
+            if files.get(name) != sha:
+                changed[name] = sha
+
+        stats = {"added": [n for n in changed if n not in files],
+                 "updated": [n for n in changed if n in files],
+                 "removed": removed, "chunks": 0}
+        if not changed and not removed:
+            return stats
+
+        # new chunks must not duplicate what stays indexed (or each other)
+        replaced = set(stats["updated"]) | set(removed)
+        seen = NearDupIndex()
+        store = retriever.chunks
+        for row in np.setdiff1d(np.arange(len(store)), store.rows_with_filename(replaced)):
+            seen.add(store.signature(row))
+        new_chunks = []
+        for name in changed:
+            new_chunks.extend(dedupe_chunks(ingest_file(abs_dir / name), seen))
+        retriever.replace_sources(replaced, new_chunks)
+
+        for name in removed:
+            files.pop(name, None)
+        files.update(changed)
+        stats["chunks"] = len(new_chunks)
+        save_snapshot(index_dir, retriever.manifest, retriever)
+        log.info("+%d ~%d -%d files, %d new chunks", len(stats["added"]), len(stats["updated"]),
+                 len(removed), len(new_chunks))
+        return stats
+
+
+def load_or_build(raw_dir: str, index_dir: str, embed_model: str = "intfloat/e5-base", workers: int = 1,
+                  index_params: dict | None = None):
+    """Load the persisted index for `raw_dir`. Only files whose hash differs from
+    the stored manifest are re-ingested; a full rebuild happens only when there
+    is no compatible snapshot (different layout version or embedding model).
+
+    Full rebuilds stream through ragcore.pipeline using `workers` parse processes.
+    `index_params` go to VectorIndex (index_type, nlist, nprobe, ef_search, backend, ...).
+    Returns a HybridRetriever, or None when there is nothing to index.
+    """
+    vec = VectorIndex(embed_model, **(index_params or {}))
+    manifest = build_manifest(raw_dir, vec.model_id, vec.spec)
+    mtime = snapshot_mtime(index_dir)
+    snap = load_snapshot(index_dir, manifest)
+    if snap is not None:
+        stored, chunks, index, mmapped, bm25 = snap
+        vec.attach(index, chunks, mmapped=mmapped)
+        log.info("Loaded %d chunks from %s", len(chunks), index_dir)
+        if chunks:
+            retriever = HybridRetriever(chunks, vec, bm25=bm25)
+            retriever.manifest, retriever.snapshot_mtime = stored, mtime
+            stale = {n for n in set(stored["files"]) | set(manifest["files"])
+                     if stored["files"].get(n) != manifest["files"].get(n)}
+            if stale:
+                update_files(retriever, raw_dir, index_dir, names=stale)
+            return retriever if retriever.chunks else None
+
+    log.info("No matching snapshot in %s; rebuilding", index_dir)
+    vec.attach(None, [])
+    bm25 = BM25Index()
+    stream_into_index(raw_dir, vec, workers=workers, bm25=bm25)
+    if not vec.store:
+        return None
+    retriever = HybridRetriever(vec.store, vec, bm25=bm25)
+    retriever.manifest = manifest
+    with _writer_lock(index_dir):
+        save_snapshot(index_dir, manifest, retriever)
+    return retriever
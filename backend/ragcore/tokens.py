@@ -0,0 +1,36 @@
+# ragcore/tokens.py
+"""LLM token counting for context budgets.
+
+Uses tiktoken when it is installed (RAG_TOKENIZER picks the encoding;
+o200k_base is what gpt-4o-mini bills with) and otherwise falls back to
+~4 characters per token, which is close for English prose.
+"""
+import os
+
+_encoding = None
+_loaded = False
+
+def get_encoding():
+    global _encoding, _loaded
+    if not _loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(os.getenv("RAG_TOKENIZER", "o200k_base"))
+        except Exception:
+            _encoding = None
+        _loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    enc = get_encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return max(1, round(len(text) / 4)) if text else 0
+
+def chunk_tokens(chunk: dict) -> int:
+    # counted once at ingest (meta["n_tokens"]); older snapshots are counted on first use
+    meta = chunk.setdefault("meta", {})
+    n = meta.get("n_tokens")
+    if n is None:
+        n = meta["n_tokens"] = count_tokens(chunk["text"])
+    return n
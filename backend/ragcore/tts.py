@@ -0,0 +1,204 @@
+# ragcore/tts.py
+"""Text-to-speech with a content-addressed audio cache.
+
+A clip is keyed by a hash of (synthesizer, language, voice, text), so the
+same sentence is synthesized once and then served from an in-memory LRU, or
+from `cache_dir` (size-bounded) after a restart and across gunicorn workers. Concurrent
+misses for one key share a single synthesis call. Audio is returned as bytes
+(nothing is written to a shared working file), and `pregenerate` fills the
+cache with known phrases ahead of the first request.
+
+    gtts   Google Translate TTS via gTTS (network round trip per miss)
+    stub   local, deterministic WAV tones; for benchmarks and offline runs
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from ragcore.cache import LRUCache
+from ragcore import metrics
+
+log = logging.getLogger(__name__)
+
+class GTTSSynthesizer:
+    name, mimetype, suffix = "gtts", "audio/mpeg", ".mp3"
+    # request parameters are checked against these: `voice` picks the Google host
+    # (translate.google.<tld>), so it must never be free-form
+    langs = ("en", "zh-CN", "zh-TW", "ms", "ta", "hi", "id", "th", "vi", "ja", "ko", "fr", "de", "es")
+    voices = ("com", "us", "co.uk", "com.au", "ca", "co.in", "ie", "co.za")
+
+    def synthesize(self, text: str, lang: str = "en", voice: str = "com") -> bytes:
+        from gtts import gTTS
+
+        # voice is gTTS's tld: the regional accent (com, co.uk, com.au, ...)
+        buf = io.BytesIO()
+        gTTS(text, lang=lang, tld=voice).write_to_fp(buf)
+        return buf.getvalue()
+
+class StubSynthesizer:
+    """Stands in for a remote TTS service: a short sine tone per word after
+    `delay_ms` of simulated round trip."""
+
+    name, mimetype, suffix = "stub", "audio/wav", ".wav"
+    langs, voices = GTTSSynthesizer.langs, GTTSSynthesizer.voices
+
+    def __init__(self, delay_ms: float = 0.0, rate: int = 8000):
+        self.delay, self.rate = delay_ms / 1000, rate
+        self.calls = 0
+
+    def synthesize(self, text: str, lang: str = "en", voice: str = "com") -> bytes:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        n = int(self.rate * 0.05) * max(1, len(text.split()))
+        pitch = 200 + int(hashlib.blake2b(f"{lang}\0{voice}".encode(), digest_size=1).hexdigest(), 16)
+        samples = bytes(int(128 + 60 * math.sin(2 * math.pi * pitch * i / self.rate)) for i in range(n))
+        header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + n, b"WAVE", b"fmt ", 16, 1, 1,
+                             self.rate, self.rate, 1, 8, b"data", n)
+        return header + samples
+
+SYNTHESIZERS = {"gtts": GTTSSynthesizer, "stub": StubSynthesizer}
+
+def normalize_text(text: str) -> str:
+    # whitespace never changes the audio; case and punctuation can
+    return " ".join(text.split())
+
+class TTSCache:
+    """`max_disk_bytes` bounds `cache_dir`: past it, the least recently used
+    clips (by mtime, refreshed on every disk hit) are deleted."""
+
+    def __init__(self, synthesizer, cache_dir: str | None = None, max_entries: int = 256,
+                 max_chars: int = 1000, max_disk_bytes: int = 256 * 2**20):
+        self.synth = synthesizer
+        self.dir = Path(cache_dir) if cache_dir else None
+        self.max_chars, self.max_disk_bytes = max_chars, max_disk_bytes
+        self._disk_bytes = None  # estimate, rescanned when it crosses the limit
+        self.memory = LRUCache(maxsize=max_entries, ttl=None, name="tts_audio")
+        self._inflight = {}  # key -> Future of the running synthesis
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self.disk_hits = self.synthesized = 0
+
+    @property
+    def mimetype(self) -> str:
+        return self.synth.mimetype
+
+    def key(self, text: str, lang: str = "en", voice: str = "com") -> str:
+        raw = "\0".join((self.synth.name, lang, voice, normalize_text(text)))
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / (key + self.synth.suffix)
+
+    def _read_disk(self, key: str) -> bytes | None:
+        if self.dir is None:
+            return None
+        path = self._path(key)
+        try:
+            audio = path.read_bytes()
+            os.utime(path)  # mtime doubles as last use for pruning
+            return audio
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, audio: bytes):
+        if self.dir is None:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write-then-rename: other workers never see a partial clip
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(audio)
+        os.replace(tmp, path)
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(audio)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._prune()
+
+    def _disk_files(self) -> list[tuple[float, int, Path]]:
+        out = []
+        for p in self.dir.glob("*/*" + self.synth.suffix):
+            try:
+                st = p.stat()
+            except OSError:  # pruned by another worker meanwhile
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _prune(self):
+        """Delete least recently used clips down to 80% of max_disk_bytes."""
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_disk_bytes * 0.8)
+        for _, size, p in files:
+            if total <= target:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._disk_bytes = total
+
+    def get(self, text: str, lang: str = "en", voice: str = "com") -> tuple[str, bytes]:
+        """(key, audio bytes), synthesizing at most once per key."""
+        text = normalize_text(text)
+        if not text:
+            raise ValueError("No text provided")
+        if len(text) > self.max_chars:
+            raise ValueError(f"Text longer than {self.max_chars} characters")
+        if lang not in self.synth.langs:
+            raise ValueError(f"Unsupported lang {lang!r}")
+        if voice not in self.synth.voices:
+            raise ValueError(f"Unsupported voice {voice!r}")
+        key = self.key(text, lang, voice)
+        audio = self.memory.get(key)
+        if audio is not None:
+            return key, audio
+        with self._lock:
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[key] = Future()
+        if not owner:
+            return key, fut.result()
+        try:
+            audio = self._read_disk(key)
+            if audio is not None:
+                self.disk_hits += 1
+            else:
+                with metrics.timer("tts_synthesize"):
+                    audio = self.synth.synthesize(text, lang, voice)
+                self.synthesized += 1
+                self._write_disk(key, audio)
+            self.memory.put(key, audio)
+            fut.set_result(audio)
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return key, audio
+
+    def pregenerate(self, phrases, lang: str = "en", voice: str = "com") -> int:
+        """Cache `phrases` ahead of time; returns how many were synthesized now.
+        Failures are logged, not raised (e.g. no network at startup)."""
+        before = self.synthesized
+        for text in phrases:
+            try:
+                self.get(text, lang, voice)
+            except Exception:
+                log.exception("TTS pre-generation failed for %r", text[:60])
+        return self.synthesized - before
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "disk_hits": self.disk_hits, "synthesized": self.synthesized,
+                "synthesizer": self.synth.name}
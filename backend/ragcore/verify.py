@@ -1,9 +1,13 @@
 # ragcore/verify.py
 import re
+from ragcore import metrics
+
+_CITATION_RE = re.compile(r"\[\d+\]")
 
 def has_citations(answer: str) -> bool:
-    return bool(re.search(r"\[\d+\]", answer))
+    return bool(_CITATION_RE.search(answer))
 
+@metrics.timed("self_check")
 def self_check(answer: str, query: str) -> list[str]:
     issues = []
     if not has_citations(answer):
@@ -13,3 +17,29 @@ def self_check(answer: str, query: str) -> list[str]:
         issues.append("Model reported insufficient context.")
     # add domain-specific regex checks if needed
     return issues
+
+class StreamingCheck:
+    """self_check for streamed answers: each delta is scanned once as it
+    arrives (plus a short overlap for markers split across deltas), so the
+    verdict is ready as soon as the last token is. finish() matches self_check."""
+
+    _OVERLAP = 16
+
+    def __init__(self):
+        self._tail = ""
+        self.cited = False
+        self.insufficient = False
+
+    def feed(self, delta: str):
+        window = self._tail + delta
+        self.cited = self.cited or has_citations(window)
+        self.insufficient = self.insufficient or "I don’t know" in window or "insufficient" in window.lower()
+        self._tail = window[-self._OVERLAP:]
+
+    def finish(self) -> list[str]:
+        issues = []
+        if not self.cited:
+            issues.append("Missing citations.")
+        if self.insufficient:
+            issues.append("Model reported insufficient context.")
+        return issues
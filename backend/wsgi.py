@@ -0,0 +1,14 @@
+# wsgi.py
+"""WSGI entry point for production serving (see gunicorn.conf.py).
+
+    python wsgi.py                          build or refresh the index snapshot, then exit
+    gunicorn -c gunicorn.conf.py wsgi:app   serve with preloaded, shared index
+"""
+import rag_api
+
+rag_api.bootstrap_index()  # uses backend/data/raw by default
+app = rag_api.app
+
+if __name__ == "__main__":
+    n = len(rag_api.retriever.chunks) if rag_api.retriever is not None else 0
+    print(f"[wsgi] Snapshot in {rag_api.INDEX_DIR} is up to date ({n} chunks)")
@@ -1,59 +1,46 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import base64
-import re
-import re
-import numpy as np
-import cv2
-from deepface import DeepFace
+import os
+import sys
+from pathlib import Path
+
+# shared with backend/rag_api.py: preloaded models, downscaled frames, batched forward passes
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+from ragcore.emotion import EmotionAnalyzer
+from ragcore.frames import decode_frame, frame_bytes
 
 app = Flask(__name__)
 CORS(app)
+emotion_analyzer = EmotionAnalyzer(max_side=int(os.getenv("RAG_EMOTION_MAX_SIDE", "320")))
 
 @app.route('/api/process_webcam', methods=['POST'])
 def process_webcam():
-    data = request.get_json()
-    image_data = data.get('image')
-    if not image_data:
-        return jsonify({'error': 'No image data provided'}), 400
-
-    # Remove the header of the data URL
-    match = re.match(r'data:image/(png|jpeg);base64,(.*)', image_data)
-    if not match:
-        return jsonify({'error': 'Invalid image data'}), 400
-
-    image_b64 = match.group(2)
     try:
-        image_bytes = base64.b64decode(image_b64)
-        # Process image_bytes as needed
-        result = f"Received image of size: {len(image_bytes)} bytes"
-        return jsonify({'result': result})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        image_bytes = frame_bytes(request)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not image_bytes:
+        return jsonify({'error': 'No image data provided'}), 400
+    return jsonify({'result': f"Received image of size: {len(image_bytes)} bytes"})
 
 @app.route('/process-image', methods=['POST'])
 def process_image():
-    data = request.get_json()
-    image_data = data.get('image')
-    if not image_data:
+    try:
+        image_bytes = frame_bytes(request)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not image_bytes:
         return jsonify({'error': 'No image data provided'}), 400
 
-    # Remove the header of the data URL
-    match = re.match(r'data:image/(png|jpeg);base64,(.*)', image_data)
-    if not match:
-        return jsonify({'error': 'Invalid image data'}), 400
-
-    image_b64 = match.group(2)
     try:
-        image_bytes = base64.b64decode(image_b64)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = decode_frame(image_bytes)
+        if img is None:
+            return jsonify({'error': 'Could not decode image'}), 400
 
-        # Use DeepFace to analyze emotion
-        result = DeepFace.analyze(img, actions=['emotion'], enforce_detection=False)
-        if isinstance(result, list):
-            result = result[0]
-        emotion = result['dominant_emotion']
+        faces = emotion_analyzer.analyze(img)
+        if not faces:
+            return jsonify({'result': 'No face detected'})
+        emotion = faces[0]['dominant_emotion']
 
         return jsonify({'result': f'Detected emotion: {emotion}'})
     except Exception as e:
@@ -69,4 +56,5 @@ def process_audio():
     return jsonify({'result': f'Received transcript: {transcript}'})
 
 if __name__ == '__main__':
+    emotion_analyzer.load()  # load and warm before the first frame arrives
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -8,6 +8,9 @@ export default function Webcam({ onEmotion }) {
 
   useEffect(() => {
     let intervalId;
+    let inFlight = false;
+    // lets the server keep only this tab's newest frame (see backend ragcore/frames.py)
+    const clientId = Math.random().toString(36).slice(2);
 
     async function enableWebcam() {
       try {
@@ -27,20 +30,25 @@ export default function Webcam({ onEmotion }) {
       intervalId = setInterval(async () => {
         const video = videoRef.current;
         const canvas = canvasRef.current;
-        if (video && canvas && video.videoWidth && video.videoHeight) {
+        // skip this tick while the previous frame is still being analyzed
+        if (!inFlight && video && canvas && video.videoWidth && video.videoHeight) {
           canvas.width = video.videoWidth;
           canvas.height = video.videoHeight;
           const ctx = canvas.getContext("2d");
           ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-          const dataUrl = canvas.toDataURL("image/png");
-          // Send to backend and get result
+          inFlight = true;
           try {
+            // raw JPEG body: no base64 inflation, no JSON parse or data-URL decode on the server
+            const blob = await new Promise((resolve) => canvas.toBlob(resolve, "image/jpeg", 0.85));
+            if (!blob) return;
+            // Send to backend and get result
             const response = await fetch("http://localhost:5000/process-image", {
               method: "POST",
-              headers: { "Content-Type": "application/json" },
-              body: JSON.stringify({ image: dataUrl }),
+              headers: { "Content-Type": "image/jpeg", "X-Client-Id": clientId },
+              body: blob,
             });
             const data = await response.json();
+            if (data.dropped) return; // superseded by a newer frame
             setResult(data.result || JSON.stringify(data));
             if (data.result && data.result.startsWith("Detected emotion: ")) {
               const emotion = data.result.replace("Detected emotion: ", "").trim();
@@ -49,6 +57,8 @@ export default function Webcam({ onEmotion }) {
             }
           } catch (err) {
             setResult("Error contacting backend");
+          } finally {
+            inFlight = false;
           }
         }
       }, 1000); // every second